@@ -2,7 +2,10 @@
 Attendance admin configuration
 """
 from django.contrib import admin
-from .models import Shift, EmployeeShift, Attendance, AttendanceRequest, WorkFromHome
+from .models import (
+    Shift, EmployeeShift, Attendance, AttendanceRequest, WorkFromHome,
+    AttendanceMonthlySummary, OvertimeRollup
+)
 
 @admin.register(Shift)
 class ShiftAdmin(admin.ModelAdmin):
@@ -20,6 +23,18 @@ class AttendanceAdmin(admin.ModelAdmin):
     list_filter = ['status', 'date', 'is_manual_entry']
     search_fields = ['employee__user__first_name', 'employee__user__last_name']
 
+@admin.register(AttendanceMonthlySummary)
+class AttendanceMonthlySummaryAdmin(admin.ModelAdmin):
+    list_display = ['employee', 'year', 'month', 'present_days', 'absent_days', 'leave_days', 'total_hours']
+    list_filter = ['year', 'month']
+    search_fields = ['employee__user__first_name', 'employee__user__last_name']
+
+@admin.register(OvertimeRollup)
+class OvertimeRollupAdmin(admin.ModelAdmin):
+    list_display = ['employee', 'period', 'period_start', 'shift', 'days_worked', 'overtime_hours']
+    list_filter = ['period', 'shift']
+    search_fields = ['employee__user__first_name', 'employee__user__last_name']
+
 @admin.register(AttendanceRequest)
 class AttendanceRequestAdmin(admin.ModelAdmin):
     list_display = ['employee', 'date', 'status', 'approved_by']
@@ -0,0 +1,530 @@
+"""
+Columnar archive for closed attendance months
+Each archived month is a directory of fixed-width .npy columns that readers
+memory-map, so historical queries never load a whole month into memory.
+"""
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Attendance
+
+STATUSES = [status for status, _ in Attendance.STATUS_CHOICES]
+STATUS_INDEX = {status: index for index, status in enumerate(STATUSES)}
+
+# Column name -> dtype. Rows are sorted by (date, id) descending, like the
+# keyset ordering of the hot table.
+COLUMNS = {
+    'id': 'V16',                  # UUID bytes
+    'employee': np.uint32,        # index into employees.npy
+    'day': np.uint8,              # day of month
+    'status': np.uint8,           # index into STATUSES
+    'total_hours': np.int16,      # hundredths of an hour
+    'overtime_hours': np.int16,   # hundredths of an hour
+    'check_in': 'datetime64[us]',   # UTC, NaT when missing
+    'check_out': 'datetime64[us]',  # UTC, NaT when missing
+    'manual': np.bool_,
+    'shift': 'V16',               # UUID bytes, zeros when missing
+    'break_time': 'timedelta64[us]',  # NaT when missing
+    'approved_by': 'V16',         # user UUID bytes, zeros when missing
+    'reason': np.uint32,          # index into reasons.json, 0 for none
+}
+# Version 1 months have no shift, break, approver or reason columns and
+# read them back as empty
+FORMAT_VERSION = 2
+NO_UUID = bytes(16)
+STAGING_PREFIX = '.staging-'
+# Written into a staged month before the hot rows are deleted; names one
+# of those rows, so a leftover staging directory tells whether the delete
+# committed
+PENDING_MARKER = 'pending.json'
+
+# Only the created/updated timestamps of hot rows are not kept
+ARCHIVE_FIELDS = [
+    'id', 'employee_id', 'date', 'status', 'total_hours', 'overtime_hours',
+    'check_in_time', 'check_out_time', 'is_manual_entry', 'shift_id',
+    'break_time', 'approved_by_id', 'manual_entry_reason',
+]
+
+
+def archive_root():
+    return settings.ATTENDANCE_ARCHIVE_DIR
+
+
+def month_path(year, month):
+    return os.path.join(archive_root(), f'{year:04d}', f'{year:04d}-{month:02d}')
+
+
+def archived_months():
+    """(year, month) pairs present in the archive, newest first"""
+    months = []
+    root = archive_root()
+    if not os.path.isdir(root):
+        return months
+    for year_dir in os.listdir(root):
+        if not os.path.isdir(os.path.join(root, year_dir)):
+            continue
+        for name in os.listdir(os.path.join(root, year_dir)):
+            # Staged and replaced month directories start with a dot
+            if not name.startswith('.') and os.path.exists(os.path.join(root, year_dir, name, 'meta.json')):
+                year, month = name.split('-')
+                months.append((int(year), int(month)))
+    return sorted(months, reverse=True)
+
+
+def _to_utc64(value):
+    if value is None:
+        return np.datetime64('NaT')
+    return np.datetime64(value.astimezone(dt_timezone.utc).replace(tzinfo=None), 'us')
+
+
+def _hundredths(value):
+    return int((Decimal(value or 0) * 100).to_integral_value())
+
+
+def _stage_month(year, month, rows):
+    """
+    Write `rows` (dicts with ARCHIVE_FIELDS) as a month directory next to
+    its final place, where readers do not look; returns its path
+    """
+    rows.sort(key=lambda row: (row['date'], row['id'].hex), reverse=True)
+    employees = sorted({row['employee_id'] for row in rows}, key=lambda value: value.hex)
+    employee_index = {employee_id: index for index, employee_id in enumerate(employees)}
+    reasons = ['']
+    reason_index = {'': 0}
+
+    columns = {name: np.empty(len(rows), dtype=dtype) for name, dtype in COLUMNS.items()}
+    for i, row in enumerate(rows):
+        columns['id'][i] = np.void(row['id'].bytes)
+        columns['employee'][i] = employee_index[row['employee_id']]
+        columns['day'][i] = row['date'].day
+        columns['status'][i] = STATUS_INDEX[row['status']]
+        columns['total_hours'][i] = _hundredths(row['total_hours'])
+        columns['overtime_hours'][i] = _hundredths(row['overtime_hours'])
+        columns['check_in'][i] = _to_utc64(row['check_in_time'])
+        columns['check_out'][i] = _to_utc64(row['check_out_time'])
+        columns['manual'][i] = row['is_manual_entry']
+        columns['shift'][i] = np.void(row['shift_id'].bytes if row['shift_id'] else NO_UUID)
+        columns['break_time'][i] = (
+            np.timedelta64(row['break_time'], 'us') if row['break_time'] is not None else np.timedelta64('NaT')
+        )
+        columns['approved_by'][i] = np.void(row['approved_by_id'].bytes if row['approved_by_id'] else NO_UUID)
+        reason = row['manual_entry_reason'] or ''
+        if reason not in reason_index:
+            reason_index[reason] = len(reasons)
+            reasons.append(reason)
+        columns['reason'][i] = reason_index[reason]
+
+    target = month_path(year, month)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=os.path.dirname(target))
+    try:
+        for name, values in columns.items():
+            np.save(os.path.join(staging, f'{name}.npy'), values)
+        np.save(
+            os.path.join(staging, 'employees.npy'),
+            np.array([employee_id.bytes for employee_id in employees], dtype='V16').reshape(-1)
+        )
+        with open(os.path.join(staging, 'reasons.json'), 'w') as handle:
+            json.dump(reasons, handle)
+        with open(os.path.join(staging, 'meta.json'), 'w') as handle:
+            json.dump({
+                'version': FORMAT_VERSION,
+                'year': year,
+                'month': month,
+                'rows': len(rows),
+                'statuses': STATUSES,
+                'archived_at': timezone.now().isoformat(),
+            }, handle)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return staging
+
+
+def _mark_pending(staging, hot_id):
+    """Durably record that `staging` replaces hot rows, one of which is `hot_id`"""
+    with open(os.path.join(staging, PENDING_MARKER), 'w') as handle:
+        json.dump({'hot_id': str(hot_id)}, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def _promote(year, month, staging):
+    """Swap a staged month directory into place"""
+    target = month_path(year, month)
+    previous = None
+    if os.path.exists(target):
+        previous = f'{staging}-old'
+        os.rename(target, previous)
+    os.rename(staging, target)
+    os.remove(os.path.join(target, PENDING_MARKER))
+    if previous:
+        shutil.rmtree(previous)
+    _month_cache.pop((year, month), None)
+
+
+@contextmanager
+def _archive_lock():
+    """Serialise archive runs across processes; the OS drops the lock of a dead one"""
+    root = archive_root()
+    os.makedirs(root, exist_ok=True)
+    descriptor = os.open(root, os.O_RDONLY)
+    try:
+        fcntl.flock(descriptor, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(descriptor)
+
+
+def _read_json(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _recover():
+    promoted = []
+    root = archive_root()
+    for year_dir in os.listdir(root):
+        parent = os.path.join(root, year_dir)
+        if not os.path.isdir(parent):
+            continue
+        leftovers = sorted(name for name in os.listdir(parent) if name.startswith(STAGING_PREFIX))
+        # A month moved aside by an interrupted swap goes back in place
+        # unless its replacement already got there
+        for name in leftovers:
+            if not name.endswith('-old'):
+                continue
+            path = os.path.join(parent, name)
+            meta = _read_json(os.path.join(path, 'meta.json'))
+            target = meta and month_path(meta['year'], meta['month'])
+            if target and not os.path.exists(target):
+                os.rename(path, target)
+            else:
+                shutil.rmtree(path)
+        for name in leftovers:
+            path = os.path.join(parent, name)
+            if name.endswith('-old') or not os.path.exists(path):
+                continue
+            meta = _read_json(os.path.join(path, 'meta.json'))
+            pending = _read_json(os.path.join(path, PENDING_MARKER))
+            # Unmarked, the run died before deleting; marked with its hot row
+            # still there, the delete rolled back
+            if meta is None or pending is None or Attendance.objects.filter(id=pending['hot_id']).exists():
+                shutil.rmtree(path)
+            else:
+                _promote(meta['year'], meta['month'], path)
+                promoted.append((meta['year'], meta['month']))
+    return promoted
+
+
+def recover_staged_months():
+    """
+    Finish or roll back months left staged by an archive run that died
+    (or failed to swap the files) around its commit. Returns the
+    (year, month) pairs that were promoted.
+    """
+    with _archive_lock():
+        return _recover()
+
+
+def archive_month(year, month):
+    """
+    Move a closed month from attendance_attendance into the archive.
+
+    Rows already archived for the month are merged with any rows that were
+    added to the hot table since (the hot row wins for the same employee and
+    day). The hot rows are removed without signals: monthly summaries keep
+    the archived months. The month is staged and marked pending inside the
+    transaction and swapped into place once the delete commits, so readers
+    never see rows both archived and hot; a run that dies in between is
+    finished or rolled back by the next one. Returns the number of rows moved.
+    """
+    hot = Attendance.objects.filter(date__year=year, date__month=month)
+    with _archive_lock():
+        _recover()
+        with transaction.atomic():
+            rows = list(hot.select_for_update().values(*ARCHIVE_FIELDS))
+            moved = len(rows)
+            if not rows:
+                return 0
+            hot_id = rows[0]['id']
+
+            archived = open_month(year, month)
+            if archived is not None:
+                replaced = {(row['employee_id'], row['date'].day) for row in rows}
+                rows.extend(
+                    row for row in archived.rows(range(len(archived)))
+                    if (row['employee_id'], row['date'].day) not in replaced
+                )
+
+            staging = _stage_month(year, month, rows)
+            try:
+                _mark_pending(staging, hot_id)
+                hot._raw_delete(hot.db)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            transaction.on_commit(lambda: _promote(year, month, staging))
+    return moved
+
+
+class ArchivedMonth:
+    """
+    Memory-mapped columns of one archived month.
+    """
+
+    def __init__(self, year, month):
+        self.year, self.month = year, month
+        path = month_path(year, month)
+        self.columns = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in COLUMNS if os.path.exists(os.path.join(path, f'{name}.npy'))
+        }
+        self.employees = np.load(os.path.join(path, 'employees.npy'), mmap_mode='r')
+        self.reasons = ['']
+        if os.path.exists(os.path.join(path, 'reasons.json')):
+            with open(os.path.join(path, 'reasons.json')) as handle:
+                self.reasons = json.load(handle)
+        self._employee_index = None
+
+    def __len__(self):
+        return len(self.columns['day'])
+
+    @property
+    def employee_index(self):
+        if self._employee_index is None:
+            self._employee_index = {
+                uuid.UUID(bytes=bytes(value)): index for index, value in enumerate(self.employees)
+            }
+        return self._employee_index
+
+    def select(self, employee_ids=None, start_date=None, end_date=None, exclude=()):
+        """
+        Row positions matching the filters, in stored (date desc) order.
+        `exclude` holds (employee_id, day) pairs to leave out.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if employee_ids is not None:
+            wanted = [self.employee_index[e] for e in employee_ids if e in self.employee_index]
+            mask &= np.isin(self.columns['employee'], np.array(wanted, dtype=np.uint32))
+        days = self.columns['day']
+        if start_date and (start_date.year, start_date.month) == (self.year, self.month):
+            mask &= days >= start_date.day
+        if end_date and (end_date.year, end_date.month) == (self.year, self.month):
+            mask &= days <= end_date.day
+        if exclude:
+            # Encode (employee index, day) as one integer key
+            skip = np.array([
+                self.employee_index[employee_id] * 32 + day
+                for employee_id, day in exclude if employee_id in self.employee_index
+            ], dtype=np.int64)
+            mask &= ~np.isin(self.columns['employee'].astype(np.int64) * 32 + days, skip)
+        return np.flatnonzero(mask)
+
+    def rows(self, positions):
+        """Materialise rows at `positions` as dicts shaped like Attendance values"""
+        columns = self.columns
+        for i in positions:
+            yield {
+                'id': uuid.UUID(bytes=bytes(columns['id'][i])),
+                'employee_id': uuid.UUID(bytes=bytes(self.employees[columns['employee'][i]])),
+                'date': date(self.year, self.month, int(columns['day'][i])),
+                'status': STATUSES[columns['status'][i]],
+                'total_hours': Decimal(int(columns['total_hours'][i])) / 100,
+                'overtime_hours': Decimal(int(columns['overtime_hours'][i])) / 100,
+                'check_in_time': _from_utc64(columns['check_in'][i]),
+                'check_out_time': _from_utc64(columns['check_out'][i]),
+                'is_manual_entry': bool(columns['manual'][i]),
+                'shift_id': _uuid_or_none(columns, 'shift', i),
+                'break_time': _duration_or_none(columns, i),
+                'approved_by_id': _uuid_or_none(columns, 'approved_by', i),
+                'manual_entry_reason': self.reasons[columns['reason'][i]] if 'reason' in columns else '',
+            }
+
+    def totals(self, employee_ids=None, exclude=()):
+        """
+        Per-employee status counts and hour sums, as
+        {employee_id: {'status_counts': {...}, 'total_hours': ..., 'overtime_hours': ...}}.
+        `exclude` holds (employee_id, day) pairs to leave out.
+        """
+        positions = self.select(employee_ids, exclude=exclude)
+        employee = self.columns['employee'][positions]
+        size = len(self.employees)
+        status = self.columns['status'][positions]
+        status_counts = {
+            name: np.bincount(employee[status == index], minlength=size)
+            for index, name in enumerate(STATUSES)
+        }
+        total = np.bincount(employee, weights=self.columns['total_hours'][positions], minlength=size)
+        overtime = np.bincount(employee, weights=self.columns['overtime_hours'][positions], minlength=size)
+        present = np.bincount(employee, minlength=size)
+
+        result = {}
+        for index in np.flatnonzero(present):
+            result[uuid.UUID(bytes=bytes(self.employees[index]))] = {
+                'status_counts': {name: int(counts[index]) for name, counts in status_counts.items()},
+                'total_hours': Decimal(int(total[index])) / 100,
+                'overtime_hours': Decimal(int(overtime[index])) / 100,
+            }
+        return result
+
+
+def _uuid_or_none(columns, name, i):
+    if name not in columns or bytes(columns[name][i]) == NO_UUID:
+        return None
+    return uuid.UUID(bytes=bytes(columns[name][i]))
+
+
+def _duration_or_none(columns, i):
+    if 'break_time' not in columns or np.isnat(columns['break_time'][i]):
+        return None
+    return timedelta(microseconds=int(columns['break_time'][i].astype(np.int64)))
+
+
+def _from_utc64(value):
+    if np.isnat(value):
+        return None
+    return datetime.fromisoformat(str(value.astype('datetime64[us]'))).replace(tzinfo=dt_timezone.utc)
+
+
+_month_cache = {}
+_month_cache_lock = threading.Lock()
+
+
+def open_month(year, month):
+    """The ArchivedMonth for (year, month), or None if it is not archived"""
+    meta = os.path.join(month_path(year, month), 'meta.json')
+    try:
+        mtime = os.stat(meta).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _month_cache_lock:
+        cached = _month_cache.get((year, month))
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, ArchivedMonth(year, month))
+            _month_cache[(year, month)] = cached
+        return cached[1]
+
+
+def months_in_range(start_date=None, end_date=None):
+    """Archived months overlapping [start_date, end_date], newest first"""
+    return [
+        (year, month) for year, month in archived_months()
+        if (not start_date or (year, month) >= (start_date.year, start_date.month))
+        and (not end_date or (year, month) <= (end_date.year, end_date.month))
+    ]
+
+
+class ArchivedRows:
+    """
+    Lazy, sliceable sequence of archived rows across months (newest first),
+    so paginators only materialise the rows of the requested page. Days
+    with a late hot row are left out, as in the monthly summaries.
+    """
+
+    def __init__(self, employee_ids=None, start_date=None, end_date=None):
+        self.parts = []
+        hot = Attendance.objects.all()
+        if employee_ids is not None:
+            hot = hot.filter(employee_id__in=employee_ids)
+        for year, month in months_in_range(start_date, end_date):
+            archived = open_month(year, month)
+            if archived is not None:
+                positions = archived.select(
+                    employee_ids, start_date, end_date, exclude=hot_keys(year, month, hot)
+                )
+                if len(positions):
+                    self.parts.append((archived, positions))
+
+    def __len__(self):
+        return sum(len(positions) for _, positions in self.parts)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(len(self))
+        rows = []
+        offset = 0
+        for archived, positions in self.parts:
+            lo, hi = max(start - offset, 0), min(stop - offset, len(positions))
+            if lo < hi:
+                rows.extend(archived.rows(positions[lo:hi]))
+            offset += len(positions)
+            if offset >= stop:
+                break
+        return rows
+
+
+def closed_months(before):
+    """(year, month) pairs in the hot table strictly before the month of `before`"""
+    dates = Attendance.objects.filter(
+        date__lt=date(before.year, before.month, 1)
+    ).dates('date', 'month')
+    return [(day.year, day.month) for day in dates]
+
+
+def hot_keys(year, month, attendance=None):
+    """
+    (employee_id, day) pairs of hot rows in an archived month. A late hot
+    row replaces the archived row for its employee and day, both when
+    listing and when counting.
+    """
+    attendance = Attendance.objects.all() if attendance is None else attendance
+    return {
+        (employee_id, day.day) for employee_id, day in
+        attendance.filter(date__year=year, date__month=month).values_list('employee_id', 'date')
+    }
+
+
+def month_totals(year, month, employee_ids=None, exclude=()):
+    """Archived per-employee totals for a month, empty if it is not archived"""
+    archived = open_month(year, month)
+    if archived is None:
+        return {}
+    return archived.totals(employee_ids, exclude)
+
+
+class HistoryRows:
+    """
+    Hot-table rows followed by archived rows, as one sliceable sequence
+    for page-number pagination.
+    """
+
+    def __init__(self, queryset, archived):
+        self.queryset = queryset
+        self.archived = archived
+        self._hot_count = None
+
+    @property
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.queryset.count()
+        return self._hot_count
+
+    def __len__(self):
+        return self.hot_count + len(self.archived)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(len(self))
+        rows = []
+        if start < self.hot_count:
+            rows.extend(self.queryset[start:min(stop, self.hot_count)])
+        if stop > self.hot_count:
+            rows.extend(self.archived[max(start - self.hot_count, 0):stop - self.hot_count])
+        return rows
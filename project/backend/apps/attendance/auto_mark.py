@@ -0,0 +1,73 @@
+"""
+Nightly auto-marking of attendance
+Creates ABSENT / ON_LEAVE rows for active employees with no record for a day.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from apps.core.utils import chunked
+from apps.employees.models import Employee
+from apps.leaves.models import LeaveRequest
+from apps.leaves.working_days import is_working_day
+from .models import Attendance, WorkFromHome
+from .services import LOOKUP_CHUNK_SIZE, send_attendance_changed
+
+AUTO_MARK_BATCH_SIZE = 5000
+
+
+def auto_mark_attendance(day):
+    """
+    Insert ABSENT or ON_LEAVE rows for every active employee without an
+    Attendance record on `day`. Employees on approved leave are marked
+    ON_LEAVE; approved WFH days and non-working days are left alone.
+
+    Uses a fixed number of lookups regardless of headcount and is safe to
+    rerun: employees who already have a row for the day are skipped.
+    Returns a dict of counts.
+    """
+    stats = {'date': day.isoformat(), 'absent': 0, 'on_leave': 0, 'skipped_wfh': 0}
+    if not is_working_day(day):
+        stats['non_working_day'] = True
+        return stats
+
+    has_record = Attendance.objects.filter(employee=OuterRef('pk'), date=day)
+    missing = set(
+        Employee.objects.filter(
+            Q(date_of_leaving__isnull=True) | Q(date_of_leaving__gte=day),
+            employment_status='ACTIVE',
+            date_of_joining__lte=day,
+        ).exclude(Exists(has_record)).values_list('id', flat=True).iterator(chunk_size=AUTO_MARK_BATCH_SIZE)
+    )
+    if not missing:
+        return stats
+
+    on_leave = set(LeaveRequest.objects.filter(
+        status='APPROVED', start_date__lte=day, end_date__gte=day,
+    ).values_list('employee_id', flat=True))
+    wfh = set(WorkFromHome.objects.filter(
+        status='APPROVED', date=day,
+    ).values_list('employee_id', flat=True))
+
+    rows = []
+    for employee_id in missing:
+        if employee_id in on_leave:
+            status = 'ON_LEAVE'
+        elif employee_id in wfh:
+            stats['skipped_wfh'] += 1
+            continue
+        else:
+            status = 'ABSENT'
+        rows.append(Attendance(employee_id=employee_id, date=day, status=status))
+
+    with transaction.atomic():
+        # A check-in racing with the job wins; its row is left untouched.
+        # Only the rows this run wrote carry the ids it generated
+        Attendance.objects.bulk_create(rows, batch_size=AUTO_MARK_BATCH_SIZE, ignore_conflicts=True)
+        inserted = set()
+        for ids in chunked([attendance.id for attendance in rows], LOOKUP_CHUNK_SIZE):
+            inserted.update(Attendance.objects.filter(pk__in=ids).values_list('id', flat=True))
+        rows = [attendance for attendance in rows if attendance.id in inserted]
+        send_attendance_changed([(None, attendance.snapshot()) for attendance in rows])
+
+    for attendance in rows:
+        stats['on_leave' if attendance.status == 'ON_LEAVE' else 'absent'] += 1
+    return stats
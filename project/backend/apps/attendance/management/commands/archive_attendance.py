@@ -0,0 +1,54 @@
+"""
+Management command to move closed attendance months into the columnar archive
+"""
+import time
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.attendance.archive import archive_month, closed_months, recover_staged_months
+
+
+class Command(BaseCommand):
+    help = (
+        'Archive attendance months older than ATTENDANCE_HOT_MONTHS (or --before); '
+        'archived rows keep every column except their created/updated timestamps'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Archive months strictly before this month (YYYY-MM)')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List the months that would be archived'
+        )
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                year, month = [int(part) for part in options['before'].split('-')]
+                before = date(year, month, 1)
+            except ValueError:
+                raise CommandError('--before must be in YYYY-MM format')
+        else:
+            today = date.today()
+            index = today.year * 12 + today.month - 1 - settings.ATTENDANCE_HOT_MONTHS
+            before = date(index // 12, index % 12 + 1, 1)
+
+        if not options['dry_run']:
+            # Finish (or roll back) months a previous run left staged
+            for year, month in recover_staged_months():
+                self.stdout.write(self.style.WARNING(f"Recovered staged archive for {year:04d}-{month:02d}"))
+
+        months = closed_months(before)
+        if not months:
+            self.stdout.write(f"Nothing to archive before {before:%Y-%m}")
+            return
+
+        for year, month in months:
+            if options['dry_run']:
+                self.stdout.write(f"Would archive {year:04d}-{month:02d}")
+                continue
+            started = time.monotonic()
+            moved = archive_month(year, month)
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {moved} rows for {year:04d}-{month:02d} in {time.monotonic() - started:.2f}s"
+            ))
@@ -0,0 +1,72 @@
+"""
+Management command to benchmark the check-in/check-out endpoints
+"""
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from apps.accounts.models import User
+from apps.attendance.views import AttendanceViewSet
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = 'Measure queries and latency per check-in/check-out call (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=200, help='Employees per round')
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        users = list(User.objects.filter(
+            employee_profile__employment_status='ACTIVE'
+        ).order_by('email')[:options['employees']])
+        if not users:
+            raise CommandError('No active employees to benchmark with')
+
+        factory = APIRequestFactory()
+        views = {
+            'check_in': AttendanceViewSet.as_view({'post': 'check_in'}),
+            'check_out': AttendanceViewSet.as_view({'post': 'check_out'}),
+        }
+        samples = {name: {'ms': [], 'queries': [], 'errors': 0} for name in views}
+
+        # Everything runs in one transaction that is rolled back at the end;
+        # SAVEPOINT statements only exist because of that and are not counted
+        with transaction.atomic():
+            for _ in range(options['rounds']):
+                savepoint = transaction.savepoint()
+                for name, view in views.items():
+                    for user in users:
+                        # A fresh user per call, as the JWT authentication would load it
+                        user = User.objects.get(pk=user.pk)
+                        request = factory.post(f'/api/v1/attendance/records/{name}/')
+                        force_authenticate(request, user=user)
+                        with CaptureQueriesContext(connection) as queries:
+                            started = time.perf_counter()
+                            response = view(request)
+                            elapsed = time.perf_counter() - started
+                        samples[name]['ms'].append(elapsed * 1000)
+                        samples[name]['queries'].append(
+                            sum('SAVEPOINT' not in query['sql'] for query in queries)
+                        )
+                        if response.status_code != 200:
+                            samples[name]['errors'] += 1
+                transaction.savepoint_rollback(savepoint)
+            transaction.set_rollback(True)
+
+        for name, sample in samples.items():
+            self.stdout.write(
+                f"{name}: {len(sample['ms'])} calls, {sample['errors']} errors, "
+                f"queries/call min {min(sample['queries'])} max {max(sample['queries'])} "
+                f"mean {statistics.mean(sample['queries']):.2f}, "
+                f"p50 {percentile(sample['ms'], 0.5):.2f}ms "
+                f"p99 {percentile(sample['ms'], 0.99):.2f}ms "
+                f"max {max(sample['ms']):.2f}ms"
+            )
@@ -0,0 +1,149 @@
+"""
+Management command to import device attendance logs (CSV or NDJSON)
+"""
+import csv
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.attendance.services import PUNCH_IN, PUNCH_OUT, ingest_punches
+
+REQUIRED_COLUMNS = ('employee_id', 'timestamp', 'direction')
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV/NDJSON punch log into Attendance in transactional chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the CSV or NDJSON log file')
+        parser.add_argument(
+            '--format', choices=['csv', 'ndjson'],
+            help='File format (defaults to the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Number of punches written per transaction'
+        )
+        parser.add_argument(
+            '--offset', type=int, default=0,
+            help='Byte offset to resume from (as reported by a previous run)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File where the last committed byte offset is recorded; '
+                 'an existing checkpoint is resumed from automatically'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+
+        file_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        chunk_size = options['chunk_size']
+        checkpoint = options['checkpoint']
+        offset = options['offset']
+        if checkpoint and not offset and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                offset = int(f.read().strip() or 0)
+            self.stdout.write(f"Resuming from checkpoint at byte {offset}")
+
+        stats = {'rows': 0, 'created': 0, 'updated': 0, 'duplicate': 0, 'skipped': 0}
+        started = time.monotonic()
+
+        with open(path, 'rb') as log_file:
+            columns = self.read_header(log_file) if file_format == 'csv' else None
+            if offset:
+                log_file.seek(offset)
+
+            chunk, committed_offset = [], offset
+            for end_offset, event in self.iter_events(log_file, columns):
+                stats['rows'] += 1
+                if event is None:
+                    stats['skipped'] += 1
+                else:
+                    chunk.append(event)
+
+                if len(chunk) >= chunk_size:
+                    self.write_chunk(chunk, stats)
+                    chunk, committed_offset = [], end_offset
+                    self.save_checkpoint(checkpoint, committed_offset)
+                    self.report(stats, started, committed_offset)
+                elif not chunk:
+                    committed_offset = end_offset
+
+            if chunk:
+                self.write_chunk(chunk, stats)
+            committed_offset = log_file.tell()
+            self.save_checkpoint(checkpoint, committed_offset)
+
+        self.report(stats, started, committed_offset)
+        self.stdout.write(self.style.SUCCESS('Attendance log import finished'))
+
+    def read_header(self, log_file):
+        """Read the CSV header row and validate the required columns"""
+        header = log_file.readline().decode('utf-8-sig')
+        columns = [column.strip().lower() for column in next(csv.reader([header]))]
+        missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            raise CommandError(f"Missing CSV columns: {', '.join(missing)}")
+        return columns
+
+    def iter_events(self, log_file, columns=None):
+        """
+        Yield (byte offset after the line, event) for every non-blank line.
+        Unparseable lines yield None as the event so they can be counted.
+        """
+        for line in iter(log_file.readline, b''):
+            end_offset = log_file.tell()
+            text = line.decode('utf-8', errors='replace').strip()
+            if not text:
+                continue
+            try:
+                if columns:
+                    record = dict(zip(columns, next(csv.reader([text]))))
+                else:
+                    record = json.loads(text)
+                yield end_offset, self.parse_event(record)
+            except (ValueError, TypeError, KeyError, AttributeError):
+                yield end_offset, None
+
+    def parse_event(self, record):
+        """Normalise a raw record into the dict accepted by ingest_punches"""
+        direction = str(record['direction']).strip().upper()
+        timestamp = parse_datetime(str(record['timestamp']).strip())
+        if direction not in (PUNCH_IN, PUNCH_OUT) or timestamp is None:
+            return None
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        return {
+            'employee_id': str(record['employee_id']).strip(),
+            'timestamp': timestamp,
+            'direction': direction,
+        }
+
+    def write_chunk(self, chunk, stats):
+        for result in ingest_punches(chunk):
+            if result['status'] == 'error':
+                stats['skipped'] += 1
+            else:
+                stats[result['status']] += 1
+
+    def save_checkpoint(self, checkpoint, offset):
+        if not checkpoint:
+            return
+        tmp_path = f"{checkpoint}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(offset))
+        os.replace(tmp_path, checkpoint)
+
+    def report(self, stats, started, offset):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f"{stats['rows']} rows ({stats['rows'] / elapsed:.0f}/s) - "
+            f"created: {stats['created']}, updated: {stats['updated']}, "
+            f"duplicates: {stats['duplicate']}, skipped: {stats['skipped']} - "
+            f"offset: {offset}"
+        )
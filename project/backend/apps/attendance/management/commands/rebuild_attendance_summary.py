@@ -0,0 +1,24 @@
+"""
+Management command to rebuild monthly attendance summaries from scratch
+"""
+from django.core.management.base import BaseCommand, CommandError
+from apps.attendance.summary import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recount AttendanceMonthlySummary rows from Attendance (backfills and repairs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Only rebuild this year')
+        parser.add_argument('--month', type=int, help='Only rebuild this month (requires --year)')
+
+    def handle(self, *args, **options):
+        year, month = options['year'], options['month']
+        if month and not year:
+            raise CommandError('--month requires --year')
+        if month and not 1 <= month <= 12:
+            raise CommandError('--month must be between 1 and 12')
+
+        written = rebuild_summaries(year=year, month=month)
+        scope = f"{month}/{year}" if month else (str(year) if year else 'all periods')
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} monthly summaries for {scope}"))
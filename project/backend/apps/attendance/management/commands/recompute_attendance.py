@@ -0,0 +1,41 @@
+"""
+Management command to recompute attendance hours and status in bulk
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from apps.attendance.recompute import recompute_attendance
+
+
+class Command(BaseCommand):
+    help = 'Recompute total hours, overtime and status for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('start_date', help='First date to recompute (YYYY-MM-DD)')
+        parser.add_argument('end_date', help='Last date to recompute (YYYY-MM-DD)')
+        parser.add_argument('--shift', help='Only recompute rows assigned to this shift id')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report how many rows would change without writing them'
+        )
+
+    def handle(self, *args, **options):
+        start_date = parse_date(options['start_date'])
+        end_date = parse_date(options['end_date'])
+        if not start_date or not end_date or start_date > end_date:
+            raise CommandError('Provide a valid start_date <= end_date (YYYY-MM-DD)')
+
+        started = time.monotonic()
+        stats = recompute_attendance(
+            start_date, end_date,
+            shift_id=options['shift'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        elapsed = time.monotonic() - started
+
+        verb = 'would update' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {stats['scanned']} rows, {verb} {stats['updated']} in {elapsed:.2f}s"
+        ))
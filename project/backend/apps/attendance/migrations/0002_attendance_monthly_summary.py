@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("employees", "0002_employee_work_mode"),
+        ("attendance", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttendanceMonthlySummary",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("year", models.IntegerField()),
+                ("month", models.IntegerField()),
+                ("present_days", models.IntegerField(default=0)),
+                ("absent_days", models.IntegerField(default=0)),
+                ("half_days", models.IntegerField(default=0)),
+                ("late_days", models.IntegerField(default=0)),
+                ("leave_days", models.IntegerField(default=0)),
+                (
+                    "total_hours",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=7),
+                ),
+                (
+                    "overtime_hours",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=7),
+                ),
+                (
+                    "employee",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attendance_summaries",
+                        to="employees.employee",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "attendance_monthly_summary",
+                "indexes": [
+                    models.Index(
+                        fields=["year", "month"], name="attendance_summary_period_idx"
+                    )
+                ],
+                "unique_together": {("employee", "year", "month")},
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("attendance", "0002_attendance_monthly_summary"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="attendance",
+            index=models.Index(fields=["date", "id"], name="attendance_date_id_idx"),
+        ),
+    ]
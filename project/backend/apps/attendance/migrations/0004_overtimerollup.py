@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("employees", "0002_employee_work_mode"),
+        ("attendance", "0003_attendance_attendance_date_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OvertimeRollup",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("WEEK", "Week"), ("MONTH", "Month")], max_length=5
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("days_worked", models.IntegerField(default=0)),
+                ("compliant_days", models.IntegerField(default=0)),
+                ("short_days", models.IntegerField(default=0)),
+                ("overtime_days", models.IntegerField(default=0)),
+                (
+                    "total_hours",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=9),
+                ),
+                (
+                    "overtime_hours",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=9),
+                ),
+                (
+                    "employee",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="overtime_rollups",
+                        to="employees.employee",
+                    ),
+                ),
+                (
+                    "shift",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="attendance.shift",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "attendance_overtime_rollup",
+                "indexes": [
+                    models.Index(
+                        fields=["period", "period_start"],
+                        name="overtime_rollup_period_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+STATUS_FIELDS = {
+    "PRESENT": "present_days",
+    "ABSENT": "absent_days",
+    "HALF_DAY": "half_days",
+    "LATE": "late_days",
+    "ON_LEAVE": "leave_days",
+}
+
+
+def backfill_summaries(apps, schema_editor):
+    """Count every month that has attendance but no summary row yet"""
+    Attendance = apps.get_model("attendance", "Attendance")
+    AttendanceMonthlySummary = apps.get_model("attendance", "AttendanceMonthlySummary")
+    existing = set(AttendanceMonthlySummary.objects.values_list("employee_id", "year", "month"))
+    counts = {
+        field: Count("id", filter=Q(status=status)) for status, field in STATUS_FIELDS.items()
+    }
+    rows = (
+        Attendance.objects.annotate(year=ExtractYear("date"), month=ExtractMonth("date"))
+        .values("employee_id", "year", "month")
+        .annotate(total_hours_sum=Sum("total_hours"), overtime_hours_sum=Sum("overtime_hours"), **counts)
+        .order_by()
+    )
+    AttendanceMonthlySummary.objects.bulk_create(
+        [
+            AttendanceMonthlySummary(
+                employee_id=row["employee_id"],
+                year=row["year"],
+                month=row["month"],
+                total_hours=row["total_hours_sum"] or 0,
+                overtime_hours=row["overtime_hours_sum"] or 0,
+                **{field: row[field] for field in STATUS_FIELDS.values()},
+            )
+            for row in rows.iterator()
+            if (row["employee_id"], row["year"], row["month"]) not in existing
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("attendance", "0004_overtimerollup"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
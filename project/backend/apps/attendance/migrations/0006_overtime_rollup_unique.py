@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:51
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def drop_duplicate_rollups(apps, schema_editor):
+    """Keep the newest rollup per employee, shift and period; the rest were doubled by concurrent rebuilds"""
+    OvertimeRollup = apps.get_model("attendance", "OvertimeRollup")
+    key = ("employee_id", "shift_id", "period", "period_start")
+    duplicated = (
+        OvertimeRollup.objects.values(*key).annotate(rows=Count("id")).filter(rows__gt=1).order_by()
+    )
+    for row in duplicated.iterator():
+        rollups = OvertimeRollup.objects.filter(
+            employee_id=row["employee_id"], period=row["period"], period_start=row["period_start"]
+        )
+        if row["shift_id"] is None:
+            rollups = rollups.filter(shift__isnull=True)
+        else:
+            rollups = rollups.filter(shift_id=row["shift_id"])
+        keep = rollups.order_by("-created_at").values_list("id", flat=True).first()
+        rollups.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("attendance", "0005_backfill_monthly_summary"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="overtimerollup",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("shift__isnull", False)),
+                fields=("employee", "shift", "period", "period_start"),
+                name="overtime_rollup_unique",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="overtimerollup",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("shift__isnull", True)),
+                fields=("employee", "period", "period_start"),
+                name="overtime_rollup_unique_no_shift",
+            ),
+        ),
+    ]
@@ -4,12 +4,20 @@ Attendance and shift management models
 from django.db import models
 from django.contrib.auth import get_user_model
 from apps.core.models import TimeStampedModel
+from apps.core.utils import to_stored_decimal
 from apps.employees.models import Employee
 from datetime import datetime, time
+from collections import namedtuple
 import uuid
 
 User = get_user_model()
 
+# Values of an Attendance row that feed derived tables such as the monthly summary
+AttendanceSnapshot = namedtuple(
+    'AttendanceSnapshot',
+    ['employee_id', 'date', 'status', 'total_hours', 'overtime_hours']
+)
+
 class Shift(TimeStampedModel):
     """
     Work shift definitions
@@ -74,6 +82,24 @@ class Attendance(TimeStampedModel):
     def __str__(self):
         return f"{self.employee.full_name} - {self.date} ({self.status})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored state so changes can be applied as deltas
+        if not instance.get_deferred_fields().intersection(AttendanceSnapshot._fields + ('employee',)):
+            instance._loaded_snapshot = instance.snapshot()
+        return instance
+    
+    def snapshot(self):
+        """Current values as they are (or will be) stored in the database"""
+        return AttendanceSnapshot(
+            employee_id=self._meta.get_field('employee').to_python(self.employee_id),
+            date=self._meta.get_field('date').to_python(self.date),
+            status=self.status,
+            total_hours=to_stored_decimal(Attendance, 'total_hours', self.total_hours),
+            overtime_hours=to_stored_decimal(Attendance, 'overtime_hours', self.overtime_hours),
+        )
+    
     def calculate_total_hours(self):
         """Calculate total working hours"""
         if self.check_in_time and self.check_out_time:
@@ -90,7 +116,8 @@ class Attendance(TimeStampedModel):
             if self.shift and self.total_hours > float(self.shift.total_hours):
                 self.overtime_hours = self.total_hours - float(self.shift.total_hours)
     
-    def save(self, *args, **kwargs):
+    def refresh_computed_fields(self):
+        """Recompute hours and status from check-in/out times (no save)"""
         if self.check_in_time and self.check_out_time:
             self.calculate_total_hours()
             
@@ -103,12 +130,88 @@ class Attendance(TimeStampedModel):
                     self.status = 'HALF_DAY'
                 else:
                     self.status = 'LATE' if self.total_hours > 0 else 'ABSENT'
-        
+    
+    def save(self, *args, **kwargs):
+        self.refresh_computed_fields()
         super().save(*args, **kwargs)
     
     class Meta:
         db_table = 'attendance_attendance'
         unique_together = ['employee', 'date']
+        indexes = [
+            # Keyset pagination on (date, id)
+            models.Index(fields=['date', 'id'], name='attendance_date_id_idx'),
+        ]
+
+class AttendanceMonthlySummary(TimeStampedModel):
+    """
+    Per-employee monthly attendance counts
+    Maintained incrementally from Attendance changes (see summary.py)
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendance_summaries')
+    year = models.IntegerField()
+    month = models.IntegerField()
+    
+    present_days = models.IntegerField(default=0)
+    absent_days = models.IntegerField(default=0)
+    half_days = models.IntegerField(default=0)
+    late_days = models.IntegerField(default=0)
+    leave_days = models.IntegerField(default=0)
+    
+    total_hours = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    overtime_hours = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    
+    def __str__(self):
+        return f"{self.employee.full_name} - {self.month}/{self.year}"
+    
+    class Meta:
+        db_table = 'attendance_monthly_summary'
+        unique_together = ['employee', 'year', 'month']
+        indexes = [
+            models.Index(fields=['year', 'month'], name='attendance_summary_period_idx'),
+        ]
+
+class OvertimeRollup(TimeStampedModel):
+    """
+    Precomputed overtime and shift-compliance totals for a closed week or month
+    One row per employee, shift and period (see overtime.py)
+    """
+    PERIOD_CHOICES = [
+        ('WEEK', 'Week'),
+        ('MONTH', 'Month'),
+    ]
+    
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='overtime_rollups')
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE, null=True, blank=True)
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    
+    days_worked = models.IntegerField(default=0)
+    compliant_days = models.IntegerField(default=0)
+    short_days = models.IntegerField(default=0)
+    overtime_days = models.IntegerField(default=0)
+    total_hours = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    overtime_hours = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    
+    def __str__(self):
+        return f"{self.employee.full_name} - {self.period} {self.period_start}"
+    
+    class Meta:
+        db_table = 'attendance_overtime_rollup'
+        indexes = [
+            models.Index(fields=['period', 'period_start'], name='overtime_rollup_period_idx'),
+        ]
+        # NULL shifts never conflict, so rows without a shift get a key of their own
+        constraints = [
+            models.UniqueConstraint(
+                fields=['employee', 'shift', 'period', 'period_start'],
+                condition=models.Q(shift__isnull=False), name='overtime_rollup_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['employee', 'period', 'period_start'],
+                condition=models.Q(shift__isnull=True), name='overtime_rollup_unique_no_shift',
+            ),
+        ]
 
 class AttendanceRequest(TimeStampedModel):
     """
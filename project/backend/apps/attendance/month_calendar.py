@@ -0,0 +1,95 @@
+"""
+Compact month calendars for team views
+One 4-bit status code per day, two days per byte.
+"""
+import base64
+import calendar
+from datetime import date, timedelta
+from apps.core.reference_data import reference_rows
+from apps.core.utils import chunked
+from apps.leaves.models import LeaveRequest, Holiday
+from .models import Attendance, WorkFromHome
+
+NO_RECORD = 0
+DAY_CODES = {
+    'PRESENT': 1,
+    'ABSENT': 2,
+    'HALF_DAY': 3,
+    'LATE': 4,
+    'ON_LEAVE': 5,
+    'APPROVED_LEAVE': 6,
+    'WORK_FROM_HOME': 7,
+    'HOLIDAY': 8,
+}
+LEGEND = dict([(NO_RECORD, 'NO_RECORD')] + [(code, name) for name, code in DAY_CODES.items()])
+
+LOOKUP_CHUNK_SIZE = 500
+
+
+def pack_nibbles(codes):
+    """Pack a list of 0-15 codes into bytes, first day in the high nibble"""
+    if len(codes) % 2:
+        codes = codes + [NO_RECORD]
+    return bytes((codes[i] << 4) | codes[i + 1] for i in range(0, len(codes), 2))
+
+
+def unpack_nibbles(data, days):
+    codes = []
+    for byte in data:
+        codes.extend((byte >> 4, byte & 0x0F))
+    return codes[:days]
+
+
+def build_month_calendar(employee_ids, year, month):
+    """
+    Day codes for each employee for a month, as {employee_id: [code, ...]}.
+    Attendance status wins over approved leave, WFH and holidays; a PRESENT
+    day on an approved WFH date is reported as WORK_FROM_HOME.
+    """
+    days = calendar.monthrange(year, month)[1]
+    first_day, last_day = date(year, month, 1), date(year, month, days)
+    codes = {employee_id: [NO_RECORD] * days for employee_id in employee_ids}
+
+    holidays = [
+        holiday.date for holiday in reference_rows(Holiday, is_optional=False)
+        if first_day <= holiday.date <= last_day
+    ]
+    for holiday in holidays:
+        for employee_codes in codes.values():
+            employee_codes[holiday.day - 1] = DAY_CODES['HOLIDAY']
+
+    for ids in chunked(employee_ids, LOOKUP_CHUNK_SIZE):
+        leaves = LeaveRequest.objects.filter(
+            employee_id__in=ids, status='APPROVED',
+            start_date__lte=last_day, end_date__gte=first_day,
+        ).values_list('employee_id', 'start_date', 'end_date')
+        for employee_id, start_date, end_date in leaves:
+            day = max(start_date, first_day)
+            while day <= min(end_date, last_day):
+                codes[employee_id][day.day - 1] = DAY_CODES['APPROVED_LEAVE']
+                day += timedelta(days=1)
+
+        wfh_days = set(WorkFromHome.objects.filter(
+            employee_id__in=ids, status='APPROVED', date__range=(first_day, last_day),
+        ).values_list('employee_id', 'date'))
+        for employee_id, day in wfh_days:
+            if codes[employee_id][day.day - 1] != DAY_CODES['APPROVED_LEAVE']:
+                codes[employee_id][day.day - 1] = DAY_CODES['WORK_FROM_HOME']
+
+        records = Attendance.objects.filter(
+            employee_id__in=ids, date__range=(first_day, last_day),
+        ).values_list('employee_id', 'date', 'status')
+        for employee_id, day, status in records:
+            if status == 'PRESENT' and (employee_id, day) in wfh_days:
+                continue
+            codes[employee_id][day.day - 1] = DAY_CODES.get(status, NO_RECORD)
+
+    return codes
+
+
+def encode_month_calendar(employee_ids, year, month):
+    """Base64 of the packed day codes for each employee"""
+    return {
+        employee_id: base64.b64encode(pack_nibbles(day_codes)).decode('ascii')
+        for employee_id, day_codes in build_month_calendar(employee_ids, year, month).items()
+    }
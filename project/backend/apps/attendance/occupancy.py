@@ -0,0 +1,94 @@
+"""
+Live office occupancy
+Per-department check-in/check-out counts for today, pushed to dashboards
+through the event hub whenever attendance changes.
+"""
+import threading
+from datetime import date, timedelta
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import Token
+from apps.core.events import get_hub
+from .models import Attendance
+
+OCCUPANCY_CHANNEL = 'attendance.occupancy'
+
+# Changes arriving within this many seconds are coalesced into one update
+PUBLISH_DELAY = 1.0
+
+STREAM_TOKEN_LIFETIME = timedelta(minutes=5)
+
+
+class StreamToken(Token):
+    """
+    JWT that only opens the occupancy stream. EventSource cannot send an
+    Authorization header, so the token travels in the query string and ends
+    up in server and proxy logs: it is rejected by the API and expires
+    shortly, so clients fetch a new one whenever they reconnect.
+    """
+    token_type = 'stream'
+    lifetime = STREAM_TOKEN_LIFETIME
+
+
+def compute_occupancy(day=None):
+    """Checked-in (not yet out) and checked-out counts per department"""
+    day = day or date.today()
+    rows = Attendance.objects.filter(date=day).values(
+        'employee__department_id', 'employee__department__name'
+    ).annotate(
+        checked_in=Count('id', filter=Q(check_in_time__isnull=False, check_out_time__isnull=True)),
+        checked_out=Count('id', filter=Q(check_out_time__isnull=False)),
+    ).order_by('employee__department__name')
+
+    departments = [
+        {
+            'department_id': str(row['employee__department_id']) if row['employee__department_id'] else None,
+            'department': row['employee__department__name'] or 'Unassigned',
+            'checked_in': row['checked_in'],
+            'checked_out': row['checked_out'],
+        }
+        for row in rows
+    ]
+    return {
+        'date': day.isoformat(),
+        'departments': departments,
+        'totals': {
+            'checked_in': sum(row['checked_in'] for row in departments),
+            'checked_out': sum(row['checked_out'] for row in departments),
+        },
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+class OccupancyPublisher:
+    """
+    Debounces attendance changes into at most one occupancy query per
+    PUBLISH_DELAY, and only while someone is subscribed.
+    """
+
+    def __init__(self, delay=PUBLISH_DELAY):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def notify(self):
+        if not get_hub().has_subscribers(OCCUPANCY_CHANNEL):
+            return
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._timer = None
+        try:
+            get_hub().publish(OCCUPANCY_CHANNEL, compute_occupancy())
+        finally:
+            connection.close()
+
+
+occupancy_publisher = OccupancyPublisher()
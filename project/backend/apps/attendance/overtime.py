@@ -0,0 +1,273 @@
+"""
+Overtime and shift-compliance aggregation
+Grouped by week/month and employee, department or shift in the database;
+closed periods are served from precomputed OvertimeRollup rows.
+"""
+from datetime import date, timedelta
+from functools import reduce
+from operator import and_, or_
+from django.db import transaction
+from django.db.models import Case, Count, DateField, Q, Sum, Value, When
+from .archive import archived_months
+from .models import Attendance, OvertimeRollup
+
+# API name -> OvertimeRollup.period
+PERIODS = {
+    'week': 'WEEK',
+    'month': 'MONTH',
+}
+
+GROUP_FIELDS = {
+    'employee': ['employee_id', 'employee__employee_id', 'employee__user__first_name', 'employee__user__last_name'],
+    'department': ['employee__department_id', 'employee__department__name'],
+    'shift': ['shift_id', 'shift__name'],
+}
+
+METRICS = ['days_worked', 'compliant_days', 'short_days', 'overtime_days', 'total_hours', 'overtime_hours']
+
+# Periods ending within this many days before the cutoff are rolled up nightly
+ROLLUP_LOOKBACK_DAYS = 62
+
+
+class ArchivedPeriodsMissing(Exception):
+    """A report reaches into archived months that have no rollups to read from"""
+
+    def __init__(self, months):
+        self.months = months
+        super().__init__(
+            f"Attendance for {', '.join(f'{year:04d}-{month:02d}' for year, month in months)} is archived; "
+            "overtime for it is only available for whole periods that were rolled up before archiving"
+        )
+
+
+def closed_before(today=None):
+    """Periods ending before this date (the first of the current month) are closed"""
+    today = today or date.today()
+    return today.replace(day=1)
+
+
+def period_start(period, day):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def period_end(period, start):
+    if period == 'week':
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def period_starts(period, start_date, end_date):
+    """Starts of the periods overlapping [start_date, end_date]"""
+    starts = []
+    current = period_start(period, start_date)
+    while current <= end_date:
+        starts.append(current)
+        current = period_end(period, current) + timedelta(days=1)
+    return starts
+
+
+def _is_archived(period, start, archived):
+    end = period_end(period, start)
+    return (start.year, start.month) in archived or (end.year, end.month) in archived
+
+
+def _live_metrics():
+    return {
+        'days_worked_sum': Count('id', filter=Q(check_in_time__isnull=False)),
+        'compliant_days_sum': Count(
+            'id', filter=Q(shift__isnull=False, status='PRESENT', check_out_time__isnull=False)
+        ),
+        'short_days_sum': Count('id', filter=Q(shift__isnull=False, status__in=['HALF_DAY', 'LATE'])),
+        'overtime_days_sum': Count('id', filter=Q(overtime_hours__gt=0)),
+        'total_hours_sum': Sum('total_hours'),
+        'overtime_hours_sum': Sum('overtime_hours'),
+    }
+
+
+def _rollup_metrics():
+    return {f'{metric}_sum': Sum(metric) for metric in METRICS}
+
+
+def period_case(period, starts):
+    """
+    Period start of each row's date as a plain CASE over the known
+    boundaries; date truncation functions run per row in Python on SQLite.
+    """
+    return Case(
+        *[When(date__range=(start, period_end(period, start)), then=Value(start)) for start in starts],
+        output_field=DateField()
+    )
+
+
+def aggregate_live(queryset, period, fields, starts):
+    """Attendance rows in the periods `starts`, grouped by period start and `fields`"""
+    return queryset.annotate(period_start=period_case(period, starts)).values(
+        'period_start', *fields
+    ).annotate(**_live_metrics()).order_by()
+
+
+def aggregate_rollups(queryset, fields):
+    return queryset.values('period_start', *fields).annotate(**_rollup_metrics()).order_by()
+
+
+def _result(row, group_by):
+    result = {'period_start': row['period_start']}
+    if 'employee' in group_by:
+        result['employee_id'] = row['employee_id']
+        result['employee_code'] = row['employee__employee_id']
+        result['employee_name'] = f"{row['employee__user__first_name']} {row['employee__user__last_name']}".strip()
+    if 'department' in group_by:
+        result['department_id'] = row['employee__department_id']
+        result['department'] = row['employee__department__name']
+    if 'shift' in group_by:
+        result['shift_id'] = row['shift_id']
+        result['shift'] = row['shift__name']
+    for metric in METRICS:
+        result[metric] = row[f'{metric}_sum'] or 0
+    return result
+
+
+def overtime_report(start_date, end_date, period='month', group_by=('employee',), scope=None):
+    """
+    Overtime and compliance totals per period and group.
+
+    `scope` is an optional Q on `employee__...` / `shift` lookups that
+    applies to both Attendance and OvertimeRollup. Periods that are closed,
+    lie fully inside the range and have been rolled up are read from
+    OvertimeRollup; everything else is aggregated from Attendance. Raises
+    ArchivedPeriodsMissing when anything else falls in an archived month.
+    """
+    scope = scope or Q()
+    fields = [field for group in group_by for field in GROUP_FIELDS[group]]
+    period_code = PERIODS[period]
+    cutoff = closed_before()
+    starts = period_starts(period, start_date, end_date)
+
+    candidates = [
+        start for start in starts
+        if start >= start_date and period_end(period, start) <= end_date
+        and period_end(period, start) < cutoff
+    ]
+    rolled = set(OvertimeRollup.objects.filter(
+        period=period_code, period_start__in=candidates
+    ).values_list('period_start', flat=True).distinct()) if candidates else set()
+
+    # Archived rows have left Attendance; without a rollup they would be
+    # silently missing from the totals
+    archived = set(archived_months())
+    missing = sorted({
+        (month.year, month.month)
+        for start in starts if start not in rolled
+        for month in period_starts('month', max(start, start_date), min(period_end(period, start), end_date))
+        if (month.year, month.month) in archived
+    })
+    if missing:
+        raise ArchivedPeriodsMissing(missing)
+
+    live = Attendance.objects.filter(scope, date__range=(start_date, end_date))
+    if rolled:
+        live = live.filter(reduce(and_, (
+            ~Q(date__range=(start, period_end(period, start))) for start in rolled
+        )))
+    rows = list(aggregate_live(live, period, fields, [start for start in starts if start not in rolled]))
+    if rolled:
+        rollups = OvertimeRollup.objects.filter(scope, period=period_code, period_start__in=rolled)
+        rows += list(aggregate_rollups(rollups, fields))
+
+    results = [_result(row, group_by) for row in rows]
+    results.sort(key=lambda row: (row['period_start'],) + tuple(
+        str(row.get(key) or '') for key in ('department', 'shift', 'employee_code')
+    ))
+    return results
+
+
+def build_rollups(period, starts):
+    """(Re)build rollups for the given closed period starts; returns rows written"""
+    period_code = PERIODS[period]
+    archived = set(archived_months())
+    cutoff = closed_before()
+    starts = [
+        start for start in starts
+        if period_end(period, start) < cutoff and not _is_archived(period, start, archived)
+    ]
+    if not starts:
+        return 0
+
+    ranges = reduce(or_, (Q(date__range=(start, period_end(period, start))) for start in starts))
+    rows = [
+        OvertimeRollup(
+            employee_id=row['employee_id'],
+            shift_id=row['shift_id'],
+            period=period_code,
+            period_start=row['period_start'],
+            **{metric: row[f'{metric}_sum'] or 0 for metric in METRICS}
+        )
+        for row in aggregate_live(
+            Attendance.objects.filter(ranges), period, ['employee_id', 'shift_id'], starts
+        ).iterator()
+    ]
+    with transaction.atomic():
+        OvertimeRollup.objects.filter(period=period_code, period_start__in=starts).delete()
+        # A concurrent rebuild of the same periods already wrote these keys
+        OvertimeRollup.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def build_missing_rollups(today=None):
+    """Roll up recently closed weeks and months that have no rollups yet"""
+    cutoff = closed_before(today)
+    written = {}
+    for period, period_code in PERIODS.items():
+        starts = [
+            start for start in period_starts(period, cutoff - timedelta(days=ROLLUP_LOOKBACK_DAYS), cutoff)
+            if period_end(period, start) < cutoff
+        ]
+        done = set(OvertimeRollup.objects.filter(
+            period=period_code, period_start__in=starts
+        ).values_list('period_start', flat=True).distinct())
+        written[period] = build_rollups(period, [start for start in starts if start not in done])
+    return written
+
+
+def refresh_rollups(keys):
+    """
+    Recompute existing rollups touched by late changes to closed periods.
+    `keys` are (employee_id, date) pairs.
+    """
+    cutoff = closed_before()
+    archived = set(archived_months())
+    for period, period_code in PERIODS.items():
+        employees_by_start = {}
+        for employee_id, day in keys:
+            start = period_start(period, day)
+            if period_end(period, start) < cutoff and not _is_archived(period, start, archived):
+                employees_by_start.setdefault(start, set()).add(employee_id)
+        if not employees_by_start:
+            continue
+
+        rolled = set(OvertimeRollup.objects.filter(
+            period=period_code, period_start__in=list(employees_by_start)
+        ).values_list('period_start', flat=True).distinct())
+        for start in rolled:
+            employee_ids = employees_by_start[start]
+            live = Attendance.objects.filter(
+                employee_id__in=employee_ids, date__range=(start, period_end(period, start))
+            )
+            rows = [
+                OvertimeRollup(
+                    employee_id=row['employee_id'],
+                    shift_id=row['shift_id'],
+                    period=period_code,
+                    period_start=start,
+                    **{metric: row[f'{metric}_sum'] or 0 for metric in METRICS}
+                )
+                for row in aggregate_live(live, period, ['employee_id', 'shift_id'], [start])
+            ]
+            with transaction.atomic():
+                OvertimeRollup.objects.filter(
+                    period=period_code, period_start=start, employee_id__in=employee_ids
+                ).delete()
+                OvertimeRollup.objects.bulk_create(rows, ignore_conflicts=True)
@@ -0,0 +1,116 @@
+"""
+Batch recomputation of attendance hours and status
+Vectorised equivalent of Attendance.refresh_computed_fields()
+"""
+from datetime import timezone as dt_timezone
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from apps.core.utils import chunked, to_stored_decimal
+from .models import Attendance, AttendanceSnapshot
+from .services import WRITE_BATCH_SIZE, send_attendance_changed
+
+STATUS_CODES = ['PRESENT', 'HALF_DAY', 'LATE', 'ABSENT']
+
+RECOMPUTE_FIELDS = ['total_hours', 'overtime_hours', 'status', 'updated_at']
+
+
+def _naive_utc(value):
+    return value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+
+
+def compute_batch(rows):
+    """
+    Compute total hours, overtime and status for a batch of rows.
+
+    `rows` are tuples of (id, check_in_time, check_out_time, break_time,
+    shift_total_hours, total_hours, overtime_hours, status, employee_id,
+    date) for records with both check-in and check-out set. Returns
+    Attendance instances (pk plus recomputed fields) for the rows whose
+    stored values would change, and the matching (before, after) snapshots.
+    """
+    if not rows:
+        return [], []
+
+    check_in = np.array([_naive_utc(row[1]) for row in rows], dtype='datetime64[us]')
+    check_out = np.array([_naive_utc(row[2]) for row in rows], dtype='datetime64[us]')
+    break_seconds = np.array(
+        [row[3].total_seconds() if row[3] else 0.0 for row in rows], dtype=np.float64
+    )
+    shift_hours = np.array(
+        [float(row[4]) if row[4] is not None else np.nan for row in rows], dtype=np.float64
+    )
+    has_shift = ~np.isnan(shift_hours)
+    has_break = np.array([bool(row[3]) for row in rows])
+
+    # Same float operations, in the same order, as calculate_total_hours()
+    worked_seconds = (check_out - check_in).astype(np.int64).astype(np.float64) / 1e6
+    worked_seconds = np.where(has_break, worked_seconds - break_seconds, worked_seconds)
+    total_hours = worked_seconds / 3600
+
+    with np.errstate(invalid='ignore'):
+        has_overtime = has_shift & (total_hours > shift_hours)
+        overtime_hours = np.where(has_overtime, total_hours - shift_hours, 0.0)
+
+        status_index = np.select(
+            [total_hours >= shift_hours, total_hours >= shift_hours / 2, total_hours > 0],
+            [0, 1, 2],
+            default=3,
+        )
+
+    now = timezone.now()
+
+    changed, changes = [], []
+    for i, row in enumerate(rows):
+        new_total = to_stored_decimal(Attendance, 'total_hours', float(total_hours[i]))
+        # Without overtime or a shift the stored values are left untouched
+        new_overtime = (
+            to_stored_decimal(Attendance, 'overtime_hours', float(overtime_hours[i]))
+            if has_overtime[i] else row[6]
+        )
+        new_status = STATUS_CODES[status_index[i]] if has_shift[i] else row[7]
+
+        if (new_total, new_overtime, new_status) != (row[5], row[6], row[7]):
+            changed.append(Attendance(
+                id=row[0],
+                total_hours=new_total,
+                overtime_hours=new_overtime,
+                status=new_status,
+                updated_at=now,
+            ))
+            changes.append((
+                AttendanceSnapshot(row[8], row[9], row[7], row[5], row[6]),
+                AttendanceSnapshot(row[8], row[9], new_status, new_total, new_overtime),
+            ))
+    return changed, changes
+
+
+def recompute_attendance(start_date, end_date, shift_id=None, batch_size=5000, dry_run=False):
+    """
+    Recompute stored hours/status for all attendance between two dates.
+    Returns a dict with the number of rows scanned and updated.
+    """
+    queryset = Attendance.objects.filter(
+        date__range=(start_date, end_date),
+        check_in_time__isnull=False,
+        check_out_time__isnull=False,
+    )
+    if shift_id:
+        queryset = queryset.filter(shift_id=shift_id)
+
+    rows = queryset.order_by('date', 'id').values_list(
+        'id', 'check_in_time', 'check_out_time', 'break_time',
+        'shift__total_hours', 'total_hours', 'overtime_hours', 'status',
+        'employee_id', 'date',
+    ).iterator(chunk_size=batch_size)
+
+    stats = {'scanned': 0, 'updated': 0}
+    for batch in chunked(rows, batch_size):
+        changed, changes = compute_batch(batch)
+        stats['scanned'] += len(batch)
+        stats['updated'] += len(changed)
+        if changed and not dry_run:
+            with transaction.atomic():
+                Attendance.objects.bulk_update(changed, RECOMPUTE_FIELDS, batch_size=WRITE_BATCH_SIZE)
+                send_attendance_changed(changes)
+    return stats
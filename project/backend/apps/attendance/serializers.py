@@ -4,7 +4,12 @@ Attendance serializers
 from rest_framework import serializers
 from django.utils import timezone
 from datetime import datetime
-from .models import Shift, EmployeeShift, Attendance, AttendanceRequest, WorkFromHome
+from .models import (
+    Shift, EmployeeShift, Attendance, AttendanceRequest, WorkFromHome,
+    AttendanceMonthlySummary
+)
+from .services import PUNCH_DIRECTIONS
+from apps.core.reference_data import ReferenceField
 
 class ShiftSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,7 +19,7 @@ class ShiftSerializer(serializers.ModelSerializer):
 
 class EmployeeShiftSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
-    shift_name = serializers.CharField(source='shift.name', read_only=True)
+    shift_name = ReferenceField(Shift, 'name', source='shift_id')
     
     class Meta:
         model = EmployeeShift
@@ -23,7 +28,7 @@ class EmployeeShiftSerializer(serializers.ModelSerializer):
 
 class AttendanceSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
-    shift_name = serializers.CharField(source='shift.name', read_only=True)
+    shift_name = ReferenceField(Shift, 'name', source='shift_id')
     approved_by_name = serializers.CharField(source='approved_by.get_full_name', read_only=True)
     
     class Meta:
@@ -34,6 +39,33 @@ class AttendanceSerializer(serializers.ModelSerializer):
             'overtime_hours', 'status'
         ]
 
+class ArchivedAttendanceSerializer(serializers.Serializer):
+    """Read-only view of an attendance row served from the columnar archive"""
+    id = serializers.UUIDField()
+    employee = serializers.UUIDField(source='employee_id')
+    employee_name = serializers.CharField(default='')
+    date = serializers.DateField()
+    status = serializers.CharField()
+    check_in_time = serializers.DateTimeField(allow_null=True)
+    check_out_time = serializers.DateTimeField(allow_null=True)
+    total_hours = serializers.DecimalField(max_digits=4, decimal_places=2)
+    overtime_hours = serializers.DecimalField(max_digits=4, decimal_places=2)
+    is_manual_entry = serializers.BooleanField()
+    shift = serializers.UUIDField(source='shift_id', allow_null=True)
+    shift_name = ReferenceField(Shift, 'name', source='shift_id')
+    break_time = serializers.DurationField(allow_null=True)
+    approved_by = serializers.UUIDField(source='approved_by_id', allow_null=True)
+    manual_entry_reason = serializers.CharField()
+    archived = serializers.BooleanField(default=True)
+
+class AttendanceMonthlySummarySerializer(serializers.ModelSerializer):
+    employee_code = serializers.CharField(source='employee.employee_id', read_only=True)
+    
+    class Meta:
+        model = AttendanceMonthlySummary
+        fields = '__all__'
+        read_only_fields = [f.name for f in AttendanceMonthlySummary._meta.fields]
+
 class AttendanceCheckInSerializer(serializers.Serializer):
     """Serializer for check-in action"""
     check_in_time = serializers.DateTimeField(required=False, default=timezone.now)
@@ -52,6 +84,19 @@ class AttendanceCheckOutSerializer(serializers.Serializer):
             raise serializers.ValidationError("Can only check out for today")
         return value or timezone.now()
 
+class PunchEventSerializer(serializers.Serializer):
+    """Single punch from a biometric terminal or turnstile controller"""
+    employee_id = serializers.CharField(max_length=20)
+    timestamp = serializers.DateTimeField()
+    direction = serializers.ChoiceField(choices=PUNCH_DIRECTIONS)
+
+class BulkReviewSerializer(serializers.Serializer):
+    """Ids of requests to approve or reject in one call"""
+    ids = serializers.ListField(
+        child=serializers.UUIDField(), allow_empty=False, max_length=1000
+    )
+    rejection_reason = serializers.CharField(required=False, allow_blank=True, default='')
+
 class AttendanceRequestSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
     approved_by_name = serializers.CharField(source='approved_by.get_full_name', read_only=True)
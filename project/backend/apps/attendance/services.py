@@ -0,0 +1,431 @@
+"""
+Attendance services
+Set-based helpers shared by views, management commands and background tasks
+"""
+import uuid
+from collections import defaultdict
+from django.db import connection, transaction
+from django.utils import timezone
+from apps.core.utils import chunked
+from apps.employees.models import Employee
+from .models import Attendance
+from .shift_index import get_shift_index, get_shift_for
+from .signals import attendance_changed
+
+PUNCH_IN = 'IN'
+PUNCH_OUT = 'OUT'
+PUNCH_DIRECTIONS = [
+    (PUNCH_IN, 'Check In'),
+    (PUNCH_OUT, 'Check Out'),
+]
+
+# Keep IN (...) lists well below the SQLite bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+WRITE_BATCH_SIZE = 1000
+
+ATTENDANCE_UPSERT_FIELDS = [
+    'shift', 'check_in_time', 'check_out_time', 'total_hours',
+    'overtime_hours', 'status', 'updated_at',
+]
+
+CHECK_IN_INSERT_FIELDS = [
+    'id', 'created_at', 'updated_at', 'employee', 'date', 'shift', 'check_in_time',
+    'total_hours', 'overtime_hours', 'status', 'is_manual_entry', 'manual_entry_reason',
+]
+CHECK_IN_UPDATE_FIELDS = ['check_in_time', 'shift', 'status', 'updated_at']
+CORRECTION_FIELDS = ['is_manual_entry', 'manual_entry_reason', 'approved_by']
+REVIEW_FIELDS = ['status', 'approved_by', 'approved_date', 'rejection_reason', 'updated_at']
+CHECK_OUT_UPDATE_FIELDS = ['check_out_time', 'total_hours', 'overtime_hours', 'status', 'updated_at']
+
+
+class PunchRejected(Exception):
+    """A check-in/check-out that conflicts with the stored record"""
+
+
+def resolve_shifts(keys):
+    """
+    Resolve the active shift for many (employee_id, date) pairs at once.
+    Returns a dict mapping each pair to a Shift (or None).
+    """
+    index = get_shift_index()
+    return {key: index.shift_for(*key) for key in set(keys)}
+
+
+def fetch_attendance(keys, lock=False):
+    """Load existing Attendance rows for (employee_id, date) pairs, keyed by pair"""
+    keys = set(keys)
+    if not keys:
+        return {}
+
+    dates_by_employee = defaultdict(set)
+    for employee_id, day in keys:
+        dates_by_employee[employee_id].add(day)
+
+    existing = {}
+    for ids in chunked(dates_by_employee, LOOKUP_CHUNK_SIZE):
+        dates = set().union(*(dates_by_employee[employee_id] for employee_id in ids))
+        queryset = Attendance.objects.select_related('shift').filter(
+            employee_id__in=ids,
+            date__range=(min(dates), max(dates)),
+        )
+        if lock:
+            queryset = queryset.select_for_update(of=('self',))
+        for attendance in queryset:
+            key = (attendance.employee_id, attendance.date)
+            if key in keys:
+                existing[key] = attendance
+    return existing
+
+
+def save_attendance_rows(created, updated, fields=ATTENDANCE_UPSERT_FIELDS):
+    """
+    Persist new and changed Attendance instances with bulk statements and
+    notify attendance_changed listeners, which bulk writes otherwise bypass.
+    `fields` are the columns written for updated rows. New rows whose
+    (employee, date) another transaction inserted first are not written;
+    they are returned so callers can retry them against the stored row.
+    """
+    now = timezone.now()
+    for attendance in created:
+        attendance.refresh_computed_fields()
+    for attendance in updated:
+        attendance.refresh_computed_fields()
+        attendance.updated_at = now
+
+    lost = []
+    if created:
+        Attendance.objects.bulk_create(created, batch_size=WRITE_BATCH_SIZE, ignore_conflicts=True)
+        written = set()
+        for ids in chunked([attendance.pk for attendance in created], LOOKUP_CHUNK_SIZE):
+            written.update(Attendance.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        lost = [attendance for attendance in created if attendance.pk not in written]
+        created = [attendance for attendance in created if attendance.pk in written]
+    if updated:
+        Attendance.objects.bulk_update(updated, fields, batch_size=WRITE_BATCH_SIZE)
+
+    changes, stale = [(None, attendance.snapshot()) for attendance in created], []
+    for attendance in updated:
+        before = getattr(attendance, '_loaded_snapshot', None)
+        if before is None:
+            stale.append((attendance.employee_id, attendance.date))
+        else:
+            changes.append((before, attendance.snapshot()))
+    for attendance in created + updated:
+        attendance._loaded_snapshot = attendance.snapshot()
+
+    send_attendance_changed(changes, stale)
+    return lost
+
+
+def send_attendance_changed(changes, stale=()):
+    """
+    Tell listeners which rows changed. `changes` holds (before, after)
+    AttendanceSnapshot pairs (None for a missing side); `stale` lists
+    (employee_id, date) pairs whose previous state is unknown.
+    """
+    if changes or stale:
+        attendance_changed.send(sender=Attendance, changes=list(changes), stale=list(stale))
+
+
+def ingest_punches(events):
+    """
+    Upsert Attendance rows from a batch of device punches.
+
+    Each event is a dict with `employee_id` (the employee code), an aware
+    `timestamp` and a `direction` of IN or OUT. Punches are grouped per
+    (employee, date): the earliest IN becomes the check-in and the latest
+    OUT the check-out, merged with whatever is already stored; a check-out
+    for a day without a check-in is an error. Days another batch creates
+    concurrently are merged with its row instead of failing the batch.
+    Returns one result dict per event, in input order.
+    """
+    events = list(events)
+    results = [{'index': index, 'status': None} for index in range(len(events))]
+
+    codes = {event['employee_id'] for event in events}
+    employees = {}
+    for chunk in chunked(codes, LOOKUP_CHUNK_SIZE):
+        employees.update(
+            Employee.objects.filter(employee_id__in=chunk).values_list('employee_id', 'id')
+        )
+
+    # Pick the winning IN/OUT punch per (employee, date)
+    groups = defaultdict(lambda: {PUNCH_IN: None, PUNCH_OUT: None})
+    for index, event in enumerate(events):
+        employee_pk = employees.get(event['employee_id'])
+        if employee_pk is None:
+            results[index].update(status='error', error='Unknown employee')
+            continue
+
+        timestamp = event['timestamp']
+        direction = event['direction']
+        group = groups[(employee_pk, timezone.localdate(timestamp))]
+        best = group[direction]
+        if best is None:
+            group[direction] = index
+            continue
+
+        better = (
+            timestamp < events[best]['timestamp'] if direction == PUNCH_IN
+            else timestamp > events[best]['timestamp']
+        )
+        if better:
+            results[best]['status'] = 'duplicate'
+            group[direction] = index
+        else:
+            results[index]['status'] = 'duplicate'
+
+    with transaction.atomic():
+        keys = list(groups)
+        while keys:
+            existing = fetch_attendance(keys, lock=True)
+            missing_shift = [key for key in keys if key not in existing or existing[key].shift_id is None]
+            shifts = resolve_shifts(missing_shift)
+
+            created, updated = [], []
+            for key in keys:
+                in_index, out_index = groups[key][PUNCH_IN], groups[key][PUNCH_OUT]
+                for index in (in_index, out_index):
+                    if index is not None:
+                        results[index] = {'index': index, 'status': None}
+
+                attendance = existing.get(key)
+                is_new = attendance is None
+                if is_new:
+                    employee_pk, day = key
+                    attendance = Attendance(employee_id=employee_pk, date=day, status='PRESENT')
+                if attendance.shift_id is None and shifts.get(key):
+                    attendance.shift = shifts[key]
+
+                changed = []
+                if in_index is not None:
+                    check_in = events[in_index]['timestamp']
+                    if attendance.check_in_time is None or check_in < attendance.check_in_time:
+                        attendance.check_in_time = check_in
+                        if not attendance.check_out_time and attendance.status == 'ABSENT':
+                            attendance.status = 'PRESENT'
+                        changed.append(in_index)
+                    else:
+                        results[in_index]['status'] = 'duplicate'
+
+                if out_index is not None:
+                    check_out = events[out_index]['timestamp']
+                    if attendance.check_in_time is None:
+                        results[out_index].update(status='error', error='Check-out without a check-in')
+                    elif check_out < attendance.check_in_time:
+                        results[out_index].update(status='error', error='Check-out precedes check-in')
+                    elif attendance.check_out_time is None or check_out > attendance.check_out_time:
+                        attendance.check_out_time = check_out
+                        changed.append(out_index)
+                    else:
+                        results[out_index]['status'] = 'duplicate'
+
+                if not changed:
+                    continue
+                (created if is_new else updated).append(attendance)
+                for index in changed:
+                    results[index]['status'] = 'created' if is_new else 'updated'
+                    results[index]['attendance_id'] = attendance.id
+
+            # Days another batch created meanwhile are merged again with its row
+            lost = save_attendance_rows(created, updated)
+            keys = [(attendance.employee_id, attendance.date) for attendance in lost]
+
+    return results
+
+
+def _check_in_sql():
+    table = connection.ops.quote_name(Attendance._meta.db_table)
+    column = lambda name: connection.ops.quote_name(Attendance._meta.get_field(name).column)
+    columns = [column(name) for name in CHECK_IN_INSERT_FIELDS]
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({column('employee')}, {column('date')}) DO NOTHING "
+        f"RETURNING {column('id')}"
+    )
+
+
+def record_check_in(employee, day, check_in_time):
+    """
+    Record a check-in with a single INSERT ... ON CONFLICT DO NOTHING.
+
+    When the day already has a row, it is locked and read: a row without a
+    check-in (e.g. auto-marked ABSENT) is updated with a conditional UPDATE
+    and its stored state gives the summary delta; if the employee has
+    already checked in PunchRejected is raised, so concurrent duplicate taps
+    cannot fail on the unique constraint.
+    """
+    now = timezone.now()
+    shift = get_shift_for(employee.id, day)
+    attendance = Attendance(
+        id=uuid.uuid4(), created_at=now, updated_at=now, employee=employee, date=day,
+        shift=shift, check_in_time=check_in_time, status='PRESENT',
+    )
+    params = [
+        Attendance._meta.get_field(name).get_db_prep_save(
+            getattr(attendance, Attendance._meta.get_field(name).attname), connection
+        )
+        for name in CHECK_IN_INSERT_FIELDS
+    ]
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(_check_in_sql(), params)
+            inserted = cursor.fetchone() is not None
+        if inserted:
+            attendance._loaded_snapshot = attendance.snapshot()
+            send_attendance_changed([(None, attendance._loaded_snapshot)])
+            return attendance
+
+        attendance = Attendance.objects.select_for_update(of=('self',)).select_related('shift').filter(
+            employee=employee, date=day
+        ).first()
+        if attendance is None or attendance.check_in_time:
+            raise PunchRejected('Already checked in for today')
+
+        attendance.check_in_time = check_in_time
+        attendance.shift = attendance.shift or shift
+        if attendance.status == 'ABSENT':
+            attendance.status = 'PRESENT'
+        attendance.updated_at = now
+        updated = Attendance.objects.filter(
+            pk=attendance.pk, check_in_time__isnull=True
+        ).update(**{name: getattr(attendance, name) for name in CHECK_IN_UPDATE_FIELDS})
+        if not updated:
+            raise PunchRejected('Already checked in for today')
+
+        before, after = attendance._loaded_snapshot, attendance.snapshot()
+        attendance._loaded_snapshot = after
+        send_attendance_changed([(before, after)])
+    return attendance
+
+
+def record_check_out(employee, day, check_out_time):
+    """
+    Record a check-out. The row is read (and locked where supported) once,
+    hours are computed in Python and written with a conditional UPDATE so a
+    second concurrent check-out is rejected instead of overwriting the first.
+    """
+    with transaction.atomic():
+        attendance = Attendance.objects.select_for_update(of=('self',)).select_related('shift').filter(
+            employee=employee, date=day
+        ).first()
+        if attendance is None:
+            raise PunchRejected('No check-in record found for today')
+        if not attendance.check_in_time:
+            raise PunchRejected('Must check in first')
+        if attendance.check_out_time:
+            raise PunchRejected('Already checked out for today')
+
+        attendance.check_out_time = check_out_time
+        attendance.updated_at = timezone.now()
+        attendance.refresh_computed_fields()
+        updated = Attendance.objects.filter(
+            pk=attendance.pk, check_out_time__isnull=True
+        ).update(**{name: getattr(attendance, name) for name in CHECK_OUT_UPDATE_FIELDS})
+        if not updated:
+            raise PunchRejected('Already checked out for today')
+
+        before, after = attendance._loaded_snapshot, attendance.snapshot()
+        attendance._loaded_snapshot = after
+        send_attendance_changed([(before, after)])
+    return attendance
+
+
+def review_requests(queryset, ids, reviewer, approve, rejection_reason=''):
+    """
+    Approve or reject pending requests (AttendanceRequest, WorkFromHome) by id.
+
+    Rows are taken from `queryset`, so callers pass the reviewer's scoped
+    queryset, and locked for the surrounding transaction. Returns a result
+    dict per distinct id, in input order, and the reviewed instances.
+    """
+    ids = list(dict.fromkeys(ids))
+    found = {}
+    for chunk in chunked(ids, LOOKUP_CHUNK_SIZE):
+        found.update(
+            (instance.id, instance)
+            for instance in queryset.select_for_update(of=('self',)).filter(id__in=chunk)
+        )
+
+    # WorkFromHome has no rejection_reason column
+    fields = [
+        name for name in REVIEW_FIELDS
+        if name != 'rejection_reason' or hasattr(queryset.model, 'rejection_reason')
+    ]
+    now = timezone.now()
+    results, reviewed = [], []
+    for request_id in ids:
+        instance = found.get(request_id)
+        if instance is None:
+            results.append({'id': request_id, 'status': 'not_found'})
+            continue
+        if instance.status != 'PENDING':
+            results.append({
+                'id': request_id, 'status': 'skipped',
+                'detail': f'Request is already {instance.status.lower()}',
+            })
+            continue
+
+        instance.status = 'APPROVED' if approve else 'REJECTED'
+        instance.approved_by = reviewer
+        instance.approved_date = now
+        if not approve and 'rejection_reason' in fields:
+            instance.rejection_reason = rejection_reason
+        instance.updated_at = now
+        reviewed.append(instance)
+        results.append({'id': request_id, 'status': instance.status.lower()})
+
+    if reviewed:
+        queryset.model.objects.bulk_update(reviewed, fields, batch_size=WRITE_BATCH_SIZE)
+    return results, reviewed
+
+
+def apply_attendance_corrections(corrections, reviewer):
+    """
+    Upsert the Attendance rows for approved AttendanceRequests in bulk.
+    Where several corrections hit the same day the last one wins.
+    Returns a dict mapping correction id to the Attendance row.
+    """
+    latest = {}
+    for correction in corrections:
+        latest[(correction.employee_id, correction.date)] = correction
+
+    rows = {}
+    keys = list(latest)
+    while keys:
+        existing = fetch_attendance(keys, lock=True)
+        missing_shift = [key for key in keys if key not in existing or existing[key].shift_id is None]
+        shifts = resolve_shifts(missing_shift)
+
+        created, updated = [], []
+        for key in keys:
+            correction = latest[key]
+            attendance = existing.get(key)
+            if attendance is None:
+                employee_pk, day = key
+                attendance = Attendance(
+                    employee_id=employee_pk, date=day,
+                    status='PRESENT' if correction.requested_check_in else 'ABSENT',
+                )
+                created.append(attendance)
+            else:
+                updated.append(attendance)
+            if attendance.shift_id is None and shifts.get(key):
+                attendance.shift = shifts[key]
+
+            attendance.check_in_time = correction.requested_check_in
+            attendance.check_out_time = correction.requested_check_out
+            attendance.is_manual_entry = True
+            attendance.manual_entry_reason = correction.reason
+            attendance.approved_by = reviewer
+            rows[key] = attendance
+
+        # Days created meanwhile by another transaction are corrected in place
+        lost = save_attendance_rows(created, updated, fields=ATTENDANCE_UPSERT_FIELDS + CORRECTION_FIELDS)
+        keys = [(attendance.employee_id, attendance.date) for attendance in lost]
+    return {
+        correction.id: rows[(correction.employee_id, correction.date)]
+        for correction in corrections
+    }
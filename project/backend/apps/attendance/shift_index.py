@@ -0,0 +1,101 @@
+"""
+In-memory index of active shift assignments
+Answers "which shift does employee E work on date D" without a query.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from apps.core.cache import VersionedLocalCache
+from .models import Shift, EmployeeShift
+
+
+def build_segments(assignments):
+    """
+    Flatten possibly overlapping (effective_from, effective_to, shift_id)
+    assignments into disjoint (start, end, shift_id) segments sorted by start.
+    Where assignments overlap the most recently started one wins; an end of
+    None means open-ended.
+    """
+    assignments = sorted(assignments, key=lambda item: item[0])
+    boundaries = set()
+    for start, end, _ in assignments:
+        boundaries.add(start)
+        if end is not None:
+            boundaries.add(end + timedelta(days=1))
+    boundaries = sorted(boundaries)
+
+    segments = []
+    for i, start in enumerate(boundaries):
+        next_start = boundaries[i + 1] if i + 1 < len(boundaries) else None
+        covering = [
+            shift_id for assign_start, assign_end, shift_id in assignments
+            if assign_start <= start and (assign_end is None or assign_end >= start)
+        ]
+        if not covering:
+            continue
+        shift_id = covering[-1]
+        end = next_start - timedelta(days=1) if next_start else None
+        previous = segments[-1] if segments else None
+        if previous and previous[2] == shift_id and previous[1] is not None \
+                and previous[1] + timedelta(days=1) == start:
+            segments[-1] = (previous[0], end, shift_id)
+        else:
+            segments.append((start, end, shift_id))
+    return segments
+
+
+class ShiftIndex:
+    """
+    Maps employee id -> sorted shift segments; lookups are a bisect.
+    """
+
+    def __init__(self, assignments, shifts):
+        self.shifts = shifts
+        self.starts = {}
+        self.segments = {}
+        for employee_id, rows in assignments.items():
+            segments = build_segments(rows)
+            self.segments[employee_id] = segments
+            self.starts[employee_id] = [segment[0] for segment in segments]
+
+    @classmethod
+    def build(cls):
+        shifts = {shift.id: shift for shift in Shift.objects.all()}
+        assignments = defaultdict(list)
+        rows = EmployeeShift.objects.filter(is_active=True).values_list(
+            'employee_id', 'effective_from', 'effective_to', 'shift_id'
+        )
+        for employee_id, effective_from, effective_to, shift_id in rows.iterator():
+            assignments[employee_id].append((effective_from, effective_to, shift_id))
+        return cls(assignments, shifts)
+
+    def shift_id_for(self, employee_id, day):
+        starts = self.starts.get(employee_id)
+        if not starts:
+            return None
+        position = bisect_right(starts, day) - 1
+        if position < 0:
+            return None
+        _, end, shift_id = self.segments[employee_id][position]
+        if end is not None and day > end:
+            return None
+        return shift_id
+
+    def shift_for(self, employee_id, day):
+        return self.shifts.get(self.shift_id_for(employee_id, day))
+
+
+_shift_index = VersionedLocalCache('attendance.shift_index', ShiftIndex.build)
+
+
+def get_shift_index():
+    return _shift_index.get()
+
+
+def get_shift_for(employee_id, day):
+    """Active Shift for an employee on a date, or None"""
+    return get_shift_index().shift_for(employee_id, day)
+
+
+def invalidate_shift_index():
+    _shift_index.invalidate()
@@ -0,0 +1,69 @@
+"""
+Attendance signal handlers
+"""
+from datetime import date
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+from .models import Shift, EmployeeShift, Attendance
+from .occupancy import occupancy_publisher
+from .overtime import closed_before, refresh_rollups
+from .shift_index import invalidate_shift_index
+from .summary import apply_changes
+
+# Sent for single saves/deletes and for bulk writes alike, with
+# `changes` = [(before, after)] AttendanceSnapshot pairs and
+# `stale` = [(employee_id, date)] rows whose previous state is unknown
+attendance_changed = Signal()
+
+
+@receiver([post_save, post_delete], sender=Shift)
+@receiver([post_save, post_delete], sender=EmployeeShift)
+def shift_assignment_changed(sender, **kwargs):
+    invalidate_shift_index()
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, '_loaded_snapshot', None)
+    after = instance.snapshot()
+    instance._loaded_snapshot = after
+    if created or before is not None:
+        attendance_changed.send(sender=Attendance, changes=[(before, after)], stale=[])
+    else:
+        attendance_changed.send(sender=Attendance, changes=[], stale=[(after.employee_id, after.date)])
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, **kwargs):
+    before = getattr(instance, '_loaded_snapshot', None) or instance.snapshot()
+    attendance_changed.send(sender=Attendance, changes=[(before, None)], stale=[])
+
+
+@receiver(attendance_changed)
+def update_monthly_summary(sender, changes, stale, **kwargs):
+    apply_changes(changes, stale)
+
+
+@receiver(attendance_changed)
+def publish_occupancy(sender, changes, stale, **kwargs):
+    today = date.today()
+    touched = [snapshot.date for pair in changes for snapshot in pair if snapshot is not None]
+    touched += [day for _, day in stale]
+    if today in touched:
+        transaction.on_commit(occupancy_publisher.notify)
+
+
+@receiver(attendance_changed)
+def refresh_overtime_rollups(sender, changes, stale, **kwargs):
+    cutoff = closed_before()
+    keys = {
+        (snapshot.employee_id, snapshot.date)
+        for pair in changes for snapshot in pair
+        if snapshot is not None and snapshot.date < cutoff
+    }
+    keys.update((employee_id, day) for employee_id, day in stale if day < cutoff)
+    if keys:
+        transaction.on_commit(lambda: refresh_rollups(keys))
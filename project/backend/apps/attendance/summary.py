@@ -0,0 +1,235 @@
+"""
+Incremental maintenance of AttendanceMonthlySummary
+Attendance changes are applied as deltas instead of recounting the month.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+from apps.core.utils import chunked
+from .archive import archived_months, hot_keys, month_totals
+from .models import Attendance, AttendanceMonthlySummary
+
+STATUS_FIELDS = {
+    'PRESENT': 'present_days',
+    'ABSENT': 'absent_days',
+    'HALF_DAY': 'half_days',
+    'LATE': 'late_days',
+    'ON_LEAVE': 'leave_days',
+}
+COUNTER_FIELDS = list(STATUS_FIELDS.values()) + ['total_hours', 'overtime_hours']
+
+# Above this many touched months, deltas are applied with bulk statements
+BULK_THRESHOLD = 20
+LOOKUP_CHUNK_SIZE = 500
+
+
+def summary_key(snapshot):
+    return (snapshot.employee_id, snapshot.date.year, snapshot.date.month)
+
+
+def collect_deltas(changes):
+    """Net per-(employee, year, month) deltas for (before, after) snapshot pairs"""
+    deltas = defaultdict(Counter)
+    for before, after in changes:
+        for snapshot, sign in ((before, -1), (after, 1)):
+            if snapshot is None:
+                continue
+            delta = deltas[summary_key(snapshot)]
+            field = STATUS_FIELDS.get(snapshot.status)
+            if field:
+                delta[field] += sign
+            delta['total_hours'] += sign * (snapshot.total_hours or Decimal('0'))
+            delta['overtime_hours'] += sign * (snapshot.overtime_hours or Decimal('0'))
+    return {
+        key: {field: value for field, value in delta.items() if value}
+        for key, delta in deltas.items()
+    }
+
+
+def apply_changes(changes, stale=()):
+    """Apply Attendance changes to the monthly summary table"""
+    deltas = {key: delta for key, delta in collect_deltas(changes).items() if delta}
+    with transaction.atomic():
+        if len(deltas) > BULK_THRESHOLD:
+            _apply_bulk(deltas)
+        else:
+            for key, delta in deltas.items():
+                _apply_one(key, delta)
+        stale_keys = {(employee_id, day.year, day.month) for employee_id, day in stale}
+        if stale_keys:
+            rebuild_summaries(keys=stale_keys)
+
+
+def _update(key, delta):
+    """Add a delta to an existing summary row; returns whether there was one"""
+    employee_id, year, month = key
+    updates = {field: F(field) + value for field, value in delta.items()}
+    return AttendanceMonthlySummary.objects.filter(
+        employee_id=employee_id, year=year, month=month
+    ).update(updated_at=timezone.now(), **updates)
+
+
+def _apply_one(key, delta):
+    if not _update(key, delta):
+        _create_missing({key: delta})
+
+
+def _apply_bulk(deltas):
+    existing = {}
+    keys_by_period = defaultdict(list)
+    for employee_id, year, month in deltas:
+        keys_by_period[(year, month)].append(employee_id)
+
+    for (year, month), employee_ids in keys_by_period.items():
+        for ids in chunked(employee_ids, LOOKUP_CHUNK_SIZE):
+            rows = AttendanceMonthlySummary.objects.select_for_update().filter(
+                year=year, month=month, employee_id__in=ids
+            )
+            for row in rows:
+                existing[(row.employee_id, year, month)] = row
+
+    now = timezone.now()
+    missing, to_update = {}, []
+    for key, delta in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            missing[key] = delta
+            continue
+        for field, value in delta.items():
+            setattr(row, field, getattr(row, field) + value)
+        row.updated_at = now
+        to_update.append(row)
+
+    if to_update:
+        AttendanceMonthlySummary.objects.bulk_update(
+            to_update, COUNTER_FIELDS + ['updated_at'], batch_size=1000
+        )
+    if missing:
+        _create_missing(missing)
+
+
+def _create_missing(deltas):
+    """
+    Create the summaries that deltas found missing by counting their months,
+    which already include this change: attendance from before the summary
+    existed would be lost if the row were seeded with the delta. Rows that
+    another transaction created in the meantime get the delta instead.
+    """
+    counted = count_summaries(keys=set(deltas))
+    rows = [counted[key] for key in deltas if key in counted]
+    AttendanceMonthlySummary.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    created = set()
+    for ids in chunked([row.pk for row in rows], LOOKUP_CHUNK_SIZE):
+        created.update(AttendanceMonthlySummary.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    for key, delta in deltas.items():
+        row = counted.get(key)
+        if row is None or row.pk not in created:
+            _update(key, delta)
+
+
+def aggregate_attendance(queryset):
+    """Per (employee, year, month) counts computed from Attendance rows"""
+    counts = {
+        field: Count('id', filter=Q(status=status))
+        for status, field in STATUS_FIELDS.items()
+    }
+    return queryset.annotate(
+        year=ExtractYear('date'), month=ExtractMonth('date')
+    ).values('employee_id', 'year', 'month').annotate(
+        total_hours_sum=Sum('total_hours'),
+        overtime_hours_sum=Sum('overtime_hours'),
+        **counts
+    ).order_by()
+
+
+def _scope(year=None, month=None, keys=None):
+    """Attendance and summary querysets for a year/month or a set of keys"""
+    attendance = Attendance.objects.all()
+    summaries = AttendanceMonthlySummary.objects.all()
+    if keys is not None:
+        # Every employee x period combination touched by the keys
+        employee_ids = {employee_id for employee_id, _, _ in keys}
+        periods = {(y, m) for _, y, m in keys}
+        attendance = attendance.filter(employee_id__in=employee_ids).filter(
+            reduce(or_, (Q(date__year=y, date__month=m) for y, m in periods))
+        )
+        summaries = summaries.filter(employee_id__in=employee_ids).filter(
+            reduce(or_, (Q(year=y, month=m) for y, m in periods))
+        )
+    else:
+        if year:
+            attendance = attendance.filter(date__year=year)
+            summaries = summaries.filter(year=year)
+        if month:
+            attendance = attendance.filter(date__month=month)
+            summaries = summaries.filter(month=month)
+    return attendance, summaries
+
+
+def count_summaries(year=None, month=None, keys=None):
+    """
+    Unsaved summaries counted from Attendance and the archive, keyed by
+    (employee_id, year, month), for a year/month or a set of keys
+    """
+    attendance, _ = _scope(year, month, keys)
+    if keys is not None:
+        employee_ids = {employee_id for employee_id, _, _ in keys}
+        periods = {(y, m) for _, y, m in keys}
+
+    rows = {}
+    for row in aggregate_attendance(attendance).iterator():
+        rows[(row['employee_id'], row['year'], row['month'])] = AttendanceMonthlySummary(
+            employee_id=row['employee_id'],
+            year=row['year'],
+            month=row['month'],
+            total_hours=row['total_hours_sum'] or 0,
+            overtime_hours=row['overtime_hours_sum'] or 0,
+            **{field: row[field] for field in STATUS_FIELDS.values()}
+        )
+
+    # Archived months are counted from the archive plus any late hot rows
+    for year_, month_ in archived_months():
+        if keys is not None:
+            if (year_, month_) not in periods:
+                continue
+        elif (year and year_ != year) or (month and month_ != month):
+            continue
+        totals = month_totals(
+            year_, month_, employee_ids if keys is not None else None,
+            exclude=hot_keys(year_, month_, attendance)
+        )
+        for employee_id, total in totals.items():
+            summary = rows.setdefault(
+                (employee_id, year_, month_),
+                AttendanceMonthlySummary(employee_id=employee_id, year=year_, month=month_)
+            )
+            for status, field in STATUS_FIELDS.items():
+                setattr(summary, field, getattr(summary, field) + total['status_counts'][status])
+            summary.total_hours = Decimal(summary.total_hours) + total['total_hours']
+            summary.overtime_hours = Decimal(summary.overtime_hours) + total['overtime_hours']
+    return rows
+
+
+def rebuild_summaries(year=None, month=None, keys=None):
+    """
+    Recount summaries from Attendance, either for a year/month or for a set of
+    (employee_id, year, month) keys. Returns the number of rows written.
+    """
+    _, summaries = _scope(year, month, keys)
+    with transaction.atomic():
+        # Deltas for these summaries wait until the recount is written, and
+        # ones committed before the lock are already counted
+        list(summaries.select_for_update().values_list('pk', flat=True))
+        rows = count_summaries(year, month, keys)
+        summaries.delete()
+        # A summary created meanwhile for a month without one counted that
+        # month itself
+        AttendanceMonthlySummary.objects.bulk_create(
+            list(rows.values()), batch_size=1000, ignore_conflicts=True
+        )
+    return len(rows)
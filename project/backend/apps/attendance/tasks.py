@@ -0,0 +1,30 @@
+"""
+Attendance background tasks
+"""
+from datetime import timedelta
+from celery import shared_task
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .auto_mark import auto_mark_attendance
+from .overtime import build_missing_rollups
+from .recompute import recompute_attendance
+
+
+@shared_task
+def recompute_attendance_task(start_date, end_date, shift_id=None):
+    """Recompute attendance hours/status for a date range (ISO dates)"""
+    return recompute_attendance(parse_date(start_date), parse_date(end_date), shift_id=shift_id)
+
+
+
+@shared_task
+def auto_mark_attendance_task(day=None):
+    """Mark absences/leave for an ISO date; defaults to yesterday"""
+    day = parse_date(day) if day else timezone.localdate() - timedelta(days=1)
+    return auto_mark_attendance(day)
+
+
+@shared_task
+def build_overtime_rollups_task():
+    """Roll up recently closed weeks and months that have no rollups yet"""
+    return build_missing_rollups(timezone.localdate())
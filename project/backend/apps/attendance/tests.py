@@ -0,0 +1,992 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import base64
+import os
+import random
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.accounts.models import User
+from apps.core.cache import bump_version
+from apps.core.utils import to_stored_decimal
+from apps.employees.models import Employee
+from apps.leaves.models import Holiday, LeaveRequest, LeaveType
+from .archive import (
+    ARCHIVE_FIELDS, _mark_pending, _stage_month, archive_month, archived_months, open_month,
+    recover_staged_months,
+)
+from .auto_mark import auto_mark_attendance
+from .models import (
+    Attendance, AttendanceMonthlySummary, AttendanceRequest, OvertimeRollup, Shift, EmployeeShift, WorkFromHome,
+)
+from .month_calendar import DAY_CODES, NO_RECORD, encode_month_calendar, pack_nibbles, unpack_nibbles
+from .occupancy import StreamToken
+from .overtime import ArchivedPeriodsMissing, build_rollups, overtime_report
+from .recompute import recompute_attendance
+from . import services
+from .services import PunchRejected, ingest_punches, record_check_in, send_attendance_changed
+from .summary import BULK_THRESHOLD, COUNTER_FIELDS, _create_missing, count_summaries
+from .shift_index import ShiftIndex, get_shift_for, invalidate_shift_index
+
+
+def create_employee(code, shift=None):
+    user = User.objects.create_user(
+        email=f'{code.lower()}@example.com', username=code.lower(), password='secret',
+        first_name='Test', last_name=code,
+    )
+    employee = Employee.objects.create(user=user, employee_id=code, date_of_joining=date(2020, 1, 1))
+    if shift:
+        EmployeeShift.objects.create(employee=employee, shift=shift, effective_from=date(2020, 1, 1))
+    return employee
+
+
+class CheckInOutTests(TestCase):
+
+    def setUp(self):
+        # Shift index invalidation happens on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_shift_index()
+            self.shift = Shift.objects.create(
+                name='General', start_time='09:00', end_time='18:00',
+                break_duration=timedelta(hours=1), total_hours=Decimal('8.00'),
+            )
+            self.employee = create_employee('EMP900', self.shift)
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.employee.user)
+
+    def test_check_in_query_budget(self):
+        get_shift_for(self.employee.id, date.today())  # warm the shift index
+        AttendanceMonthlySummary.objects.create(
+            employee=self.employee, year=date.today().year, month=date.today().month
+        )
+        with CaptureQueriesContext(connection) as queries:
+            attendance = record_check_in(self.employee, date.today(), timezone.now())
+        statements = [q['sql'] for q in queries if 'SAVEPOINT' not in q['sql']]
+        # The upsert itself plus the monthly summary delta
+        self.assertEqual(len(statements), 2, statements)
+        self.assertEqual(attendance.shift, self.shift)
+
+        attendance = Attendance.objects.get(employee=self.employee, date=date.today())
+        self.assertEqual(attendance.status, 'PRESENT')
+        self.assertEqual(attendance.shift, self.shift)
+        self.assertEqual(AttendanceMonthlySummary.objects.get(employee=self.employee).present_days, 1)
+
+    def test_duplicate_check_in_is_rejected(self):
+        self.client.post('/api/v1/attendance/records/check_in/')
+        response = self.client.post('/api/v1/attendance/records/check_in/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Already checked in for today')
+        self.assertEqual(Attendance.objects.filter(employee=self.employee).count(), 1)
+
+    def test_check_in_over_auto_marked_absence(self):
+        Attendance.objects.create(employee=self.employee, date=date.today(), status='ABSENT')
+        response = self.client.post('/api/v1/attendance/records/check_in/')
+        self.assertEqual(response.status_code, 200)
+        attendance = Attendance.objects.get(employee=self.employee, date=date.today())
+        self.assertEqual(attendance.status, 'PRESENT')
+        self.assertIsNotNone(attendance.check_in_time)
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee)
+        self.assertEqual((summary.present_days, summary.absent_days), (1, 0))
+
+    def test_check_in_over_absence_applies_a_delta(self):
+        Attendance.objects.create(employee=self.employee, date=date.today(), status='ABSENT')
+        # A recount of the month would reset this counter
+        AttendanceMonthlySummary.objects.filter(employee=self.employee).update(late_days=5)
+        attendance = record_check_in(self.employee, date.today(), timezone.now())
+        self.assertEqual(attendance._loaded_snapshot.status, 'PRESENT')
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee)
+        self.assertEqual((summary.present_days, summary.absent_days, summary.late_days), (1, 0, 5))
+
+        with self.assertRaises(PunchRejected):
+            record_check_in(self.employee, date.today(), timezone.now())
+
+    def test_check_out(self):
+        response = self.client.post('/api/v1/attendance/records/check_out/')
+        self.assertEqual(response.data['error'], 'No check-in record found for today')
+
+        Attendance.objects.create(
+            employee=self.employee, date=date.today(), shift=self.shift,
+            check_in_time=timezone.now() - timedelta(hours=9), status='PRESENT',
+        )
+        response = self.client.post('/api/v1/attendance/records/check_out/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(response.data['total_hours'], 9)
+
+        response = self.client.post('/api/v1/attendance/records/check_out/')
+        self.assertEqual(response.data['error'], 'Already checked out for today')
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee)
+        self.assertEqual(summary.present_days, 1)
+        self.assertGreater(summary.overtime_hours, 0)
+
+
+class PunchIngestTests(TestCase):
+
+    def setUp(self):
+        self.employee = create_employee('EMP906')
+        self.other = create_employee('EMP907')
+        self.day = date(2030, 5, 6)
+
+    def at(self, hour, minute=0, day=None):
+        return timezone.make_aware(datetime.combine(day or self.day, datetime.min.time()).replace(hour=hour, minute=minute))
+
+    def punch(self, code, hour, direction, minute=0, day=None):
+        return {'employee_id': code, 'timestamp': self.at(hour, minute, day), 'direction': direction}
+
+    def statuses(self, results):
+        return [(result['status'], result.get('error')) for result in results]
+
+    def test_punches_are_grouped_per_day(self):
+        results = ingest_punches([
+            self.punch('EMP906', 9, 'IN', 5),
+            self.punch('EMP906', 9, 'IN'),
+            self.punch('EMP906', 17, 'OUT'),
+            self.punch('EMP906', 18, 'OUT'),
+            self.punch('NOPE', 9, 'IN'),
+            self.punch('EMP906', 18, 'OUT', day=self.day + timedelta(days=1)),
+            self.punch('EMP907', 10, 'IN'),
+            self.punch('EMP907', 8, 'OUT'),
+        ])
+        self.assertEqual(self.statuses(results), [
+            ('duplicate', None), ('created', None), ('duplicate', None), ('created', None),
+            ('error', 'Unknown employee'), ('error', 'Check-out without a check-in'),
+            ('created', None), ('error', 'Check-out precedes check-in'),
+        ])
+        attendance = Attendance.objects.get(employee=self.employee)
+        self.assertEqual((attendance.check_in_time, attendance.check_out_time), (self.at(9), self.at(18)))
+        self.assertEqual(results[1]['attendance_id'], attendance.id)
+        self.assertEqual(Attendance.objects.filter(employee=self.other).get().check_out_time, None)
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee)
+        self.assertEqual(summary.total_hours, count_summaries(2030, 5)[(self.employee.id, 2030, 5)].total_hours)
+
+    def test_interrupted_import_resumes_from_the_checkpoint(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path, checkpoint = os.path.join(directory, 'punches.csv'), os.path.join(directory, 'punches.offset')
+        days = [self.day + timedelta(days=offset) for offset in range(3)]
+        with open(path, 'w') as f:
+            f.write('employee_id,timestamp,direction\n')
+            for day in days:
+                for code in ('EMP906', 'EMP907'):
+                    f.write(f'{code},{self.at(9, day=day).isoformat()},IN\n')
+                    f.write(f'{code},{self.at(17, day=day).isoformat()},OUT\n')
+            f.write('EMP906,not a time,IN\n')
+
+        calls = []
+
+        def interrupted(chunk):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return ingest_punches(chunk)
+
+        command = 'apps.attendance.management.commands.import_attendance_logs.ingest_punches'
+        with mock.patch(command, side_effect=interrupted), self.assertRaises(KeyboardInterrupt):
+            call_command('import_attendance_logs', path, chunk_size=4, checkpoint=checkpoint, stdout=StringIO())
+        self.assertEqual(Attendance.objects.count(), 2)
+
+        out = StringIO()
+        call_command('import_attendance_logs', path, chunk_size=4, checkpoint=checkpoint, stdout=out)
+        self.assertIn('Resuming from checkpoint', out.getvalue())
+        # Only the punches after the committed chunk are read again
+        self.assertIn('9 rows', out.getvalue())
+        self.assertIn('created: 8, updated: 0, duplicates: 0, skipped: 1', out.getvalue())
+        with open(checkpoint) as f:
+            self.assertEqual(int(f.read()), os.path.getsize(path))
+        self.assertEqual(
+            sorted(Attendance.objects.values_list('date', 'check_in_time', 'check_out_time')),
+            sorted((day, self.at(9, day=day), self.at(17, day=day)) for day in days for _ in range(2)),
+        )
+
+    def test_punches_merge_with_the_stored_row(self):
+        Attendance.objects.create(employee=self.employee, date=self.day, status='ABSENT')
+        results = ingest_punches([self.punch('EMP906', 9, 'IN')])
+        self.assertEqual(self.statuses(results), [('updated', None)])
+        self.assertEqual(Attendance.objects.get(employee=self.employee).status, 'PRESENT')
+
+        results = ingest_punches([self.punch('EMP906', 10, 'IN'), self.punch('EMP906', 17, 'OUT')])
+        self.assertEqual(self.statuses(results), [('duplicate', None), ('updated', None)])
+        results = ingest_punches([self.punch('EMP906', 16, 'OUT')])
+        self.assertEqual(self.statuses(results), [('duplicate', None)])
+
+        attendance = Attendance.objects.get(employee=self.employee)
+        self.assertEqual((attendance.check_in_time, attendance.check_out_time), (self.at(9), self.at(17)))
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee)
+        recount = count_summaries(2030, 5)[(self.employee.id, 2030, 5)]
+        self.assertEqual(
+            [getattr(summary, field) for field in COUNTER_FIELDS],
+            [getattr(recount, field) for field in COUNTER_FIELDS]
+        )
+        self.assertEqual((summary.present_days, summary.absent_days), (1, 0))
+
+    def test_day_created_by_another_batch_is_merged(self):
+        fetch = services.fetch_attendance
+        calls = []
+
+        def created_meanwhile(keys, lock=False):
+            # The first lookup misses a row another batch commits right after
+            calls.append(list(keys))
+            if len(calls) == 1:
+                Attendance.objects.create(
+                    employee=self.employee, date=self.day, check_in_time=self.at(8, 30), status='PRESENT'
+                )
+                return {}
+            return fetch(keys, lock)
+
+        with mock.patch.object(services, 'fetch_attendance', side_effect=created_meanwhile):
+            results = ingest_punches([self.punch('EMP906', 9, 'IN'), self.punch('EMP906', 17, 'OUT')])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.statuses(results), [('duplicate', None), ('updated', None)])
+        attendance = Attendance.objects.get(employee=self.employee)
+        self.assertEqual((attendance.check_in_time, attendance.check_out_time), (self.at(8, 30), self.at(17)))
+        self.assertEqual(results[1]['attendance_id'], attendance.id)
+        self.assertEqual(AttendanceMonthlySummary.objects.get(employee=self.employee).present_days, 1)
+
+    def test_bulk_punch_reports_each_event(self):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.employee.user)
+        self.assertEqual(client.post('/api/v1/attendance/records/bulk_punch/', [], format='json').status_code, 403)
+
+        hr = create_employee('HR906').user
+        hr.role = 'HR_MANAGER'
+        hr.save(update_fields=['role'])
+        client.force_authenticate(hr)
+        events = [
+            {'employee_id': 'EMP906', 'timestamp': self.at(9).isoformat(), 'direction': 'IN'},
+            {'employee_id': 'EMP906', 'timestamp': self.at(9).isoformat(), 'direction': 'SIDEWAYS'},
+            {'employee_id': 'EMP906', 'timestamp': self.at(9, 30).isoformat(), 'direction': 'IN'},
+            {'employee_id': 'NOPE', 'timestamp': self.at(9).isoformat(), 'direction': 'IN'},
+        ]
+        response = client.post('/api/v1/attendance/records/bulk_punch/', {'events': events}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary'], {'created': 1, 'updated': 0, 'duplicate': 1, 'error': 2})
+        self.assertEqual([result['index'] for result in response.data['results']], [0, 1, 2, 3])
+        self.assertIn('direction', response.data['results'][1]['error'])
+
+        response = client.post('/api/v1/attendance/records/bulk_punch/', {'events': 'nope'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class AutoMarkTests(TestCase):
+
+    def setUp(self):
+        self.day = date(2030, 3, 4)  # a Monday
+        self.absent = create_employee('EMP909')
+        self.late = create_employee('EMP910')
+
+    def summary(self, employee):
+        summary = AttendanceMonthlySummary.objects.get(employee=employee)
+        return (summary.present_days, summary.absent_days)
+
+    def test_rerun_marks_nobody_twice(self):
+        stats = auto_mark_attendance(self.day)
+        self.assertEqual((stats['absent'], stats['on_leave']), (2, 0))
+        self.assertEqual(auto_mark_attendance(self.day)['absent'], 0)
+        self.assertEqual(Attendance.objects.filter(date=self.day).count(), 2)
+        self.assertEqual(self.summary(self.absent), (0, 1))
+
+    def test_check_in_during_the_run_wins(self):
+        bulk_create = Attendance.objects.bulk_create
+        check_in = timezone.make_aware(datetime(2030, 3, 4, 9))
+
+        def checked_in_meanwhile(rows, **kwargs):
+            # The employee was listed as missing, then checks in
+            record_check_in(self.late, self.day, check_in)
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch.object(Attendance.objects, 'bulk_create', side_effect=checked_in_meanwhile):
+            stats = auto_mark_attendance(self.day)
+        self.assertEqual(stats['absent'], 1)
+        attendance = Attendance.objects.get(employee=self.late, date=self.day)
+        self.assertEqual((attendance.status, attendance.check_in_time), ('PRESENT', check_in))
+        self.assertEqual(self.summary(self.late), (1, 0))
+        self.assertEqual(self.summary(self.absent), (0, 1))
+
+
+class ShiftIndexTests(TestCase):
+
+    def create_shift(self, name):
+        return Shift.objects.create(
+            name=name, start_time='09:00', end_time='18:00',
+            break_duration=timedelta(hours=1), total_hours=Decimal('8.00'),
+        )
+
+    def test_lookups_at_segment_boundaries(self):
+        january = date(2030, 1, 1)
+        index = ShiftIndex({
+            # Open-ended, with a later assignment overriding three days of it
+            'open': [(january, january + timedelta(days=30), 1), (january + timedelta(days=31), None, 2),
+                     (january + timedelta(days=40), january + timedelta(days=42), 3)],
+            # A gap between two assignments of the same shift
+            'gap': [(january, january + timedelta(days=9), 1),
+                    (january + timedelta(days=19), january + timedelta(days=30), 1)],
+        }, {})
+        for employee_id, offset, shift_id in [
+            ('open', -1, None), ('open', 0, 1), ('open', 30, 1), ('open', 31, 2), ('open', 39, 2),
+            ('open', 40, 3), ('open', 42, 3), ('open', 43, 2), ('open', 4000, 2),
+            ('gap', 9, 1), ('gap', 10, None), ('gap', 18, None), ('gap', 19, 1), ('gap', 30, 1), ('gap', 31, None),
+            ('nobody', 0, None),
+        ]:
+            day = january + timedelta(days=offset)
+            self.assertEqual(index.shift_id_for(employee_id, day), shift_id, (employee_id, day))
+
+    def test_lookups_match_a_scan_of_the_assignments(self):
+        generator = random.Random(4)
+        start = date(2030, 1, 1)
+        assignments = {}
+        for employee_id in range(20):
+            rows = []
+            for shift_id in range(generator.randint(1, 6)):
+                begin = start + timedelta(days=generator.randint(0, 60))
+                end = None if generator.random() < 0.2 else begin + timedelta(days=generator.randint(0, 20))
+                rows.append((begin, end, shift_id))
+            assignments[employee_id] = rows
+        index = ShiftIndex(assignments, {})
+
+        for employee_id, rows in assignments.items():
+            for offset in range(-2, 90):
+                day = start + timedelta(days=offset)
+                # The most recently started assignment covering the day wins
+                covering = [row for row in sorted(rows, key=lambda row: row[0])
+                            if row[0] <= day and (row[1] is None or row[1] >= day)]
+                expected = covering[-1][2] if covering else None
+                self.assertEqual(index.shift_id_for(employee_id, day), expected, (employee_id, day))
+
+    def test_shift_changes_rebuild_the_index(self):
+        day = date(2030, 1, 15)
+        with self.captureOnCommitCallbacks(execute=True):
+            general, night = self.create_shift('General'), self.create_shift('Night')
+            employee = create_employee('EMP911', general)
+        self.assertEqual(get_shift_for(employee.id, day), general)
+
+        # Rebuilt once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = EmployeeShift.objects.create(employee=employee, shift=night, effective_from=day)
+            self.assertEqual(get_shift_for(employee.id, day), general)
+        self.assertEqual(get_shift_for(employee.id, day), night)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.effective_from = day + timedelta(days=1)
+            assignment.save()
+        self.assertEqual(get_shift_for(employee.id, day), general)
+        self.assertEqual(get_shift_for(employee.id, day + timedelta(days=1)), night)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            general.name = 'Day'
+            general.save()
+        self.assertEqual(get_shift_for(employee.id, day).name, 'Day')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EmployeeShift.objects.filter(shift=general).delete()
+        self.assertIsNone(get_shift_for(employee.id, day))
+
+
+class MonthCalendarTests(TestCase):
+
+    def test_packed_codes_round_trip(self):
+        self.assertEqual(pack_nibbles([1, 2, 8]), bytes([0x12, 0x80]))
+        generator = random.Random(6)
+        for days in (28, 29, 30, 31):
+            codes = [generator.randint(0, 15) for _ in range(days)]
+            packed = pack_nibbles(codes)
+            self.assertEqual(len(packed), (days + 1) // 2)
+            self.assertEqual(unpack_nibbles(packed, days), codes)
+
+    def test_codes_follow_the_stored_rows(self):
+        # Rolled-back holidays must not stay in this process's caches
+        for namespace in ('leaves.working_days', 'reference.leaves.holiday'):
+            self.addCleanup(bump_version, namespace)
+        employee, idle = create_employee('EMP912'), create_employee('EMP913')
+        with self.captureOnCommitCallbacks(execute=True):
+            Holiday.objects.create(name='Founders Day', date=date(2030, 3, 20))
+            Holiday.objects.create(name='Optional Day', date=date(2030, 3, 21), is_optional=True)
+        leave_type = LeaveType.objects.create(name='Casual Leave', code='CL', days_allowed_per_year=12)
+        LeaveRequest.objects.create(
+            employee=employee, leave_type=leave_type, start_date=date(2030, 3, 11), end_date=date(2030, 3, 13),
+            days_requested=3, reason='Holiday', status='APPROVED',
+        )
+        for day, wfh_status in [(12, 'APPROVED'), (14, 'APPROVED'), (15, 'PENDING')]:
+            WorkFromHome.objects.create(employee=employee, date=date(2030, 3, day), reason='Remote', status=wfh_status)
+        statuses = {4: 'PRESENT', 5: 'LATE', 6: 'HALF_DAY', 7: 'ABSENT', 13: 'PRESENT', 14: 'PRESENT',
+                    15: 'PRESENT', 20: 'ABSENT', 31: 'ON_LEAVE'}
+        for day, attendance_status in statuses.items():
+            Attendance.objects.create(employee=employee, date=date(2030, 3, day), status=attendance_status)
+
+        expected = [NO_RECORD] * 31
+        expected[19] = DAY_CODES['HOLIDAY']
+        idle_expected = list(expected)
+        for day in (11, 12, 13):
+            expected[day - 1] = DAY_CODES['APPROVED_LEAVE']
+        # Attendance wins, except PRESENT on an approved WFH day
+        for day, attendance_status in statuses.items():
+            expected[day - 1] = DAY_CODES[attendance_status]
+        expected[13] = DAY_CODES['WORK_FROM_HOME']
+
+        packed = encode_month_calendar([employee.id, idle.id], 2030, 3)
+        self.assertEqual(unpack_nibbles(base64.b64decode(packed[employee.id]), 31), expected)
+        self.assertEqual(unpack_nibbles(base64.b64decode(packed[idle.id]), 31), idle_expected)
+
+
+class BulkReviewTests(TestCase):
+
+    def setUp(self):
+        self.lead = create_employee('LEAD914')
+        self.lead.user.role = 'TEAM_LEAD'
+        self.lead.user.save()
+        self.first, self.second = create_employee('EMP915'), create_employee('EMP916')
+        for employee in (self.first, self.second):
+            employee.manager = self.lead
+            employee.save()
+        self.outsider = create_employee('EMP917')
+        self.day = date(2030, 5, 6)
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.lead.user)
+
+    def at(self, hour, day=None):
+        return timezone.make_aware(datetime.combine(day or self.day, datetime.min.time()).replace(hour=hour))
+
+    def correction(self, employee, day, check_in, check_out, status='PENDING'):
+        return AttendanceRequest.objects.create(
+            employee=employee, date=day, requested_check_in=self.at(check_in, day),
+            requested_check_out=self.at(check_out, day), reason='Forgot to punch', status=status,
+        )
+
+    def review(self, kind, action, ids, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/v1/attendance/{kind}/{action}/', dict(data, ids=[str(pk) for pk in ids]), format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_bulk_approve_applies_the_corrections(self):
+        next_day = self.day + timedelta(days=1)
+        Attendance.objects.create(employee=self.first, date=self.day, status='ABSENT')
+        stored = self.correction(self.first, self.day, 9, 17)
+        new = self.correction(self.second, self.day, 10, 18)
+        earlier = self.correction(self.first, next_day, 8, 16)
+        later = self.correction(self.first, next_day, 9, 18)
+        reviewed = self.correction(self.second, next_day, 9, 17, status='APPROVED')
+        outside = self.correction(self.outsider, self.day, 9, 17)
+        unknown = '00000000-0000-0000-0000-000000000000'
+
+        data = self.review(
+            'requests', 'bulk_approve', [stored.pk, new.pk, earlier.pk, later.pk, reviewed.pk, outside.pk, unknown]
+        )
+        self.assertEqual(data['summary'], {'approved': 4, 'rejected': 0, 'skipped': 1, 'not_found': 2})
+        self.assertEqual(
+            [result['status'] for result in data['results']],
+            ['approved'] * 4 + ['skipped', 'not_found', 'not_found'],
+        )
+        self.assertEqual(data['results'][4]['detail'], 'Request is already approved')
+        self.assertEqual(AttendanceRequest.objects.get(pk=outside.pk).status, 'PENDING')
+
+        attendance = {(row.employee_id, row.date): row for row in Attendance.objects.all()}
+        self.assertEqual(len(attendance), 3)
+        for correction, result in zip([stored, new, earlier, later], data['results']):
+            self.assertEqual(result['attendance_id'], attendance[(correction.employee_id, correction.date)].id)
+        # The last correction of a day wins
+        for key, correction in [((self.first.id, self.day), stored), ((self.second.id, self.day), new),
+                                ((self.first.id, next_day), later)]:
+            row = attendance[key]
+            self.assertEqual(
+                (row.check_in_time, row.check_out_time, row.is_manual_entry, row.approved_by_id),
+                (correction.requested_check_in, correction.requested_check_out, True, self.lead.user.id),
+            )
+        self.assertEqual(
+            set(AttendanceRequest.objects.filter(status='APPROVED').values_list('approved_by', flat=True)),
+            {self.lead.user.id, None},
+        )
+        for employee in (self.first, self.second):
+            summary = AttendanceMonthlySummary.objects.get(employee=employee)
+            expected = count_summaries(2030, 5)[(employee.id, 2030, 5)]
+            self.assertEqual(
+                [getattr(summary, field) for field in COUNTER_FIELDS],
+                [getattr(expected, field) for field in COUNTER_FIELDS],
+            )
+
+    def test_bulk_reject_leaves_attendance_alone(self):
+        first, second = self.correction(self.first, self.day, 9, 17), self.correction(self.second, self.day, 9, 17)
+        data = self.review('requests', 'bulk_reject', [first.pk, second.pk], rejection_reason='No badge record')
+        self.assertEqual(data['summary']['rejected'], 2)
+        self.assertEqual(
+            list(AttendanceRequest.objects.values_list('status', 'rejection_reason')),
+            [('REJECTED', 'No badge record')] * 2,
+        )
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_work_from_home_review(self):
+        requests = [
+            WorkFromHome.objects.create(employee=employee, date=self.day, reason='Remote')
+            for employee in (self.first, self.second)
+        ]
+        rejected = WorkFromHome.objects.create(
+            employee=self.first, date=self.day + timedelta(days=1), reason='Remote', status='REJECTED'
+        )
+        # WorkFromHome has no rejection_reason; the reason is accepted and dropped
+        data = self.review('work-from-home', 'bulk_reject', [requests[0].pk], rejection_reason='Office day')
+        self.assertEqual(data['summary'], {'approved': 0, 'rejected': 1, 'skipped': 0, 'not_found': 0})
+
+        data = self.review('work-from-home', 'bulk_approve', [requests[0].pk, requests[1].pk, rejected.pk])
+        self.assertEqual(data['summary'], {'approved': 1, 'rejected': 0, 'skipped': 2, 'not_found': 0})
+        rows = WorkFromHome.objects.order_by('employee__employee_id', 'date')
+        self.assertEqual(
+            [(row.status, row.approved_by_id) for row in rows],
+            [('REJECTED', self.lead.user.id), ('REJECTED', None), ('APPROVED', self.lead.user.id)],
+        )
+        self.assertFalse(Attendance.objects.exists())
+
+        self.client.force_authenticate(self.first.user)
+        response = self.client.post(
+            '/api/v1/attendance/work-from-home/bulk_approve/', {'ids': [str(requests[1].pk)]}, format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class TemporaryArchiveMixin:
+    """Point the attendance archive at an empty directory for each test"""
+
+    def setUp(self):
+        super().setUp()
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+        settings_override = override_settings(ATTENDANCE_ARCHIVE_DIR=archive_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class RecomputeParityTests(TestCase):
+
+    def setUp(self):
+        self.day_shift = Shift.objects.create(
+            name='General', start_time='09:00', end_time='18:00',
+            break_duration=timedelta(hours=1), total_hours=Decimal('8.00'),
+        )
+        self.night_shift = Shift.objects.create(
+            name='Night', start_time='22:00', end_time='06:00',
+            break_duration=timedelta(0), total_hours=Decimal('8.00'),
+        )
+        self.employee = create_employee('EMP902')
+
+    def add(self, day, check_in, check_out, shift=None, break_hours=None):
+        """A row saved through Attendance.save(); times are hours after midnight of the day"""
+        midnight = timezone.make_aware(datetime(2024, 3, day))
+        return Attendance.objects.create(
+            employee=self.employee, date=date(2024, 3, day), shift=shift or self.day_shift,
+            check_in_time=midnight + timedelta(hours=check_in),
+            check_out_time=midnight + timedelta(hours=check_out) if check_out is not None else None,
+            break_time=timedelta(hours=break_hours) if break_hours else None,
+        )
+
+    def test_batch_recompute_matches_per_row_path(self):
+        rows = {
+            'present': self.add(1, 9, 18, break_hours=1),
+            'overtime': self.add(2, 9, 20, break_hours=1),
+            # Exactly half the shift is a half day; a minute less is late
+            'half_day': self.add(3, 9, 13),
+            'late': self.add(4, 9, 13 - 1 / 60),
+            'no_hours': self.add(5, 9, 9),
+            'break_below_shift': self.add(6, 9, 17.5, break_hours=1),
+            'overnight': self.add(7, 22, 30.5, shift=self.night_shift),
+            'no_check_out': self.add(8, 9, None),
+        }
+        rows['no_shift'] = self.add(9, 9, 19)
+        Attendance.objects.filter(pk=rows['no_shift'].pk).update(shift=None)
+
+        # Stale stored values, which both paths must correct the same way
+        Attendance.objects.update(total_hours=0, overtime_hours=Decimal('1.50'), status='ABSENT')
+        expected = {}
+        for attendance in Attendance.objects.select_related('shift'):
+            attendance.refresh_computed_fields()
+            expected[attendance.pk] = (
+                to_stored_decimal(Attendance, 'total_hours', attendance.total_hours),
+                to_stored_decimal(Attendance, 'overtime_hours', attendance.overtime_hours),
+                attendance.status,
+            )
+
+        stats = recompute_attendance(date(2024, 3, 1), date(2024, 3, 31))
+        self.assertEqual(stats['scanned'], 8)
+        stored = {
+            pk: (total_hours, overtime_hours, status)
+            for pk, total_hours, overtime_hours, status in Attendance.objects.values_list(
+                'pk', 'total_hours', 'overtime_hours', 'status'
+            )
+        }
+        self.assertEqual(stored, expected)
+
+        outcome = {name: stored[row.pk] for name, row in rows.items()}
+        self.assertEqual(outcome['present'], (Decimal('8.00'), Decimal('1.50'), 'PRESENT'))
+        self.assertEqual(outcome['overtime'], (Decimal('10.00'), Decimal('2.00'), 'PRESENT'))
+        self.assertEqual(outcome['half_day'][2], 'HALF_DAY')
+        self.assertEqual(outcome['late'][2], 'LATE')
+        self.assertEqual(outcome['no_hours'][2], 'ABSENT')
+        self.assertEqual(outcome['break_below_shift'], (Decimal('7.50'), Decimal('1.50'), 'HALF_DAY'))
+        self.assertEqual(outcome['overnight'], (Decimal('8.50'), Decimal('0.50'), 'PRESENT'))
+        self.assertEqual(outcome['no_check_out'], (Decimal('0.00'), Decimal('1.50'), 'ABSENT'))
+        self.assertEqual(outcome['no_shift'], (Decimal('10.00'), Decimal('1.50'), 'ABSENT'))
+
+
+class MonthlySummaryTests(TemporaryArchiveMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.shift = Shift.objects.create(
+            name='General', start_time='09:00', end_time='18:00',
+            break_duration=timedelta(hours=1), total_hours=Decimal('8.00'),
+        )
+        self.employee = create_employee('EMP903')
+
+    def add(self, employee, day, status='PRESENT', worked=None):
+        attendance = Attendance(employee=employee, date=date(2024, 3, day), status=status)
+        if worked is not None:
+            attendance.shift = self.shift
+            attendance.check_in_time = timezone.make_aware(datetime(2024, 3, day, 9))
+            attendance.check_out_time = attendance.check_in_time + timedelta(hours=worked)
+        attendance.save()
+        return attendance
+
+    def assertMatchesRecount(self):
+        stored = {
+            (row.employee_id, row.year, row.month): [getattr(row, field) for field in COUNTER_FIELDS]
+            for row in AttendanceMonthlySummary.objects.all()
+        }
+        counted = {
+            key: [Decimal(getattr(row, field)) for field in COUNTER_FIELDS]
+            for key, row in count_summaries().items()
+        }
+        self.assertEqual(stored, counted)
+
+    def test_deltas_follow_saves_and_deletes(self):
+        worked = self.add(self.employee, 1, worked=10)
+        absent = self.add(self.employee, 2, status='ABSENT')
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee)
+        self.assertEqual((summary.present_days, summary.absent_days), (1, 1))
+        self.assertEqual((summary.total_hours, summary.overtime_hours), (Decimal('10.00'), Decimal('2.00')))
+
+        absent.status = 'ON_LEAVE'
+        absent.save()
+        worked.delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.present_days, summary.absent_days, summary.leave_days), (0, 0, 1))
+        self.assertEqual(summary.total_hours, Decimal('0.00'))
+        self.assertMatchesRecount()
+
+    def test_missing_summary_is_recounted(self):
+        # Attendance from before summaries were maintained
+        self.add(self.employee, 1)
+        self.add(self.employee, 2, status='LATE')
+        AttendanceMonthlySummary.objects.all().delete()
+        self.add(self.employee, 3)
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee)
+        self.assertEqual((summary.present_days, summary.late_days), (2, 1))
+
+        # The same through the bulk path
+        employees = [create_employee(f'BLK{number:03d}') for number in range(BULK_THRESHOLD + 1)]
+        for employee in employees:
+            self.add(employee, 1)
+        AttendanceMonthlySummary.objects.all().delete()
+        rows = Attendance.objects.bulk_create([
+            Attendance(employee=employee, date=date(2024, 3, 2), status='ABSENT') for employee in employees
+        ])
+        send_attendance_changed([(None, attendance.snapshot()) for attendance in rows])
+        self.assertEqual(
+            set(AttendanceMonthlySummary.objects.values_list('present_days', 'absent_days')), {(1, 1)}
+        )
+        self.assertEqual(AttendanceMonthlySummary.objects.count(), len(employees))
+
+    def test_row_created_meanwhile_gets_the_delta(self):
+        self.add(self.employee, 1)
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee)
+        # Another transaction inserted the row after this one found it missing
+        _create_missing({(self.employee.id, 2024, 3): {'present_days': 1}})
+        summary.refresh_from_db()
+        self.assertEqual(summary.present_days, 2)
+        self.assertEqual(AttendanceMonthlySummary.objects.count(), 1)
+
+    def test_period_filters_are_validated(self):
+        self.add(self.employee, 1)
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.employee.user)
+        response = client.get('/api/v1/attendance/monthly-summaries/', {'year': 2024, 'month': 3})
+        self.assertEqual(response.status_code, 200)
+        for params in ({'year': 'abc'}, {'month': 'x'}, {'month': 13}):
+            response = client.get('/api/v1/attendance/monthly-summaries/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(next(iter(params)), response.data)
+
+
+class ArchiveTests(TemporaryArchiveMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.shift = Shift.objects.create(
+            name='General', start_time='09:00', end_time='18:00',
+            break_duration=timedelta(hours=1), total_hours=Decimal('8.00'),
+        )
+        self.employee = create_employee('EMP904')
+        self.reviewer = create_employee('HR904').user
+        check_in = timezone.make_aware(datetime(2024, 1, 2, 9))
+        Attendance.objects.create(
+            employee=self.employee, date=date(2024, 1, 2), shift=self.shift,
+            check_in_time=check_in, check_out_time=check_in + timedelta(hours=9, minutes=30),
+            break_time=timedelta(minutes=45), is_manual_entry=True,
+            manual_entry_reason='Badge reader offline', approved_by=self.reviewer,
+        )
+        Attendance.objects.create(employee=self.employee, date=date(2024, 1, 3), status='ABSENT')
+
+    def hot_rows(self):
+        return sorted(
+            Attendance.objects.filter(date__year=2024, date__month=1).values(*ARCHIVE_FIELDS),
+            key=lambda row: row['date'],
+        )
+
+    def archived_rows(self):
+        archived = open_month(2024, 1)
+        return sorted(archived.rows(range(len(archived))), key=lambda row: row['date'])
+
+    def test_archived_rows_read_back_every_column(self):
+        expected = self.hot_rows()
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive_month(2024, 1), 2)
+        self.assertFalse(Attendance.objects.exists())
+        self.assertEqual(self.archived_rows(), expected)
+        self.assertEqual(count_summaries(2024, 1)[(self.employee.id, 2024, 1)].present_days, summary.present_days)
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.employee.user)
+        response = client.get('/api/v1/attendance/records/', {'start_date': '2024-01-01', 'end_date': '2024-01-31'})
+        self.assertEqual(response.status_code, 200)
+        row = response.data['results'][-1]
+        self.assertEqual((row['shift_name'], row['break_time']), ('General', '00:45:00'))
+        self.assertEqual(row['manual_entry_reason'], 'Badge reader offline')
+
+        # A late hot row is merged in and wins over the archived day
+        Attendance.objects.create(employee=self.employee, date=date(2024, 1, 3), status='ON_LEAVE')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive_month(2024, 1), 1)
+        self.assertEqual([row['status'] for row in self.archived_rows()], ['PRESENT', 'ON_LEAVE'])
+
+    def test_failed_archive_leaves_hot_rows_and_no_files(self):
+        expected = self.hot_rows()
+        with mock.patch('django.db.models.query.QuerySet._raw_delete', side_effect=DatabaseError):
+            with self.captureOnCommitCallbacks(execute=True), self.assertRaises(DatabaseError):
+                archive_month(2024, 1)
+        self.assertEqual(self.hot_rows(), expected)
+        self.assertEqual(archived_months(), [])
+        self.assertIsNone(open_month(2024, 1))
+        self.assertEqual(os.listdir(os.path.join(settings.ATTENDANCE_ARCHIVE_DIR, '2024')), [])
+
+    def test_month_staged_before_a_crash_is_promoted_by_the_next_run(self):
+        expected = self.hot_rows()
+        # The delete commits but the process dies before the swap
+        with self.captureOnCommitCallbacks(execute=False):
+            archive_month(2024, 1)
+        self.assertFalse(Attendance.objects.exists())
+        self.assertEqual(archived_months(), [])
+
+        self.assertEqual(recover_staged_months(), [(2024, 1)])
+        self.assertEqual(self.archived_rows(), expected)
+        self.assertEqual(os.listdir(os.path.join(settings.ATTENDANCE_ARCHIVE_DIR, '2024')), ['2024-01'])
+
+    def test_interrupted_swap_is_finished_by_the_next_run(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_month(2024, 1)
+        Attendance.objects.create(employee=self.employee, date=date(2024, 1, 3), status='ON_LEAVE')
+        rename = os.rename
+        renames = []
+
+        def fail_second_rename(source, target):
+            # The old month is moved aside, then the new one fails to move in
+            renames.append(source)
+            if len(renames) == 2:
+                raise OSError('disk went away')
+            rename(source, target)
+
+        with mock.patch('apps.attendance.archive.os.rename', side_effect=fail_second_rename):
+            with self.assertRaises(OSError), self.captureOnCommitCallbacks(execute=True):
+                archive_month(2024, 1)
+        self.assertEqual(archived_months(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive_month(2024, 1), 0)
+        self.assertEqual([row['status'] for row in self.archived_rows()], ['PRESENT', 'ON_LEAVE'])
+        self.assertEqual(os.listdir(os.path.join(settings.ATTENDANCE_ARCHIVE_DIR, '2024')), ['2024-01'])
+
+    def test_staged_month_whose_delete_rolled_back_is_discarded(self):
+        expected = self.hot_rows()
+        staging = _stage_month(2024, 1, [dict(row) for row in expected])
+        _mark_pending(staging, expected[0]['id'])
+
+        self.assertEqual(recover_staged_months(), [])
+        self.assertFalse(os.path.exists(staging))
+        self.assertEqual(self.hot_rows(), expected)
+        self.assertIsNone(open_month(2024, 1))
+
+    def test_late_hot_row_replaces_the_archived_day_when_listing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_month(2024, 1)
+        Attendance.objects.create(employee=self.employee, date=date(2024, 1, 3), status='ON_LEAVE')
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.employee.user)
+        response = client.get('/api/v1/attendance/records/', {'start_date': '2024-01-01', 'end_date': '2024-01-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [(row['date'], row['status']) for row in response.data['results']],
+            [('2024-01-03', 'ON_LEAVE'), ('2024-01-02', 'PRESENT')]
+        )
+        summary = count_summaries(2024, 1)[(self.employee.id, 2024, 1)]
+        self.assertEqual((summary.present_days, summary.leave_days, summary.absent_days), (1, 1, 0))
+
+
+class OccupancyStreamTests(TestCase):
+
+    def setUp(self):
+        self.lead = create_employee('LEAD905').user
+        self.lead.role = 'TEAM_LEAD'
+        self.lead.save(update_fields=['role'])
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def stream(self, **params):
+        # The events themselves are never read, so the stream stays unopened
+        return self.client.get('/api/v1/attendance/occupancy/stream/', params).status_code
+
+    def test_only_stream_tokens_are_accepted_in_the_url(self):
+        self.client.force_authenticate(self.lead)
+        response = self.client.post('/api/v1/attendance/occupancy/stream-token/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['expires_in'], int(StreamToken.lifetime.total_seconds()))
+        self.client.force_authenticate(None)
+
+        self.assertEqual(self.stream(token=response.data['token']), 200)
+        self.assertEqual(self.stream(token=str(AccessToken.for_user(self.lead))), 401)
+        self.assertEqual(self.stream(), 401)
+        # ...while the API does not take a stream token as an access token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']}")
+        self.assertEqual(self.client.get('/api/v1/auth/me/').status_code, 403)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.lead)}')
+        self.assertEqual(self.stream(), 200)
+
+    def test_employees_get_no_stream_token(self):
+        self.client.force_authenticate(create_employee('EMP905').user)
+        response = self.client.post('/api/v1/attendance/occupancy/stream-token/')
+        self.assertEqual(response.status_code, 403)
+
+
+class OvertimeRollupTests(TemporaryArchiveMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.shift = Shift.objects.create(
+            name='General', start_time='09:00', end_time='18:00',
+            break_duration=timedelta(hours=1), total_hours=Decimal('8.00'),
+        )
+        self.employee = create_employee('EMP908')
+        for day, hours, shift in [(5, 10, self.shift), (6, 9, self.shift), (7, 3, self.shift), (8, 9, None)]:
+            check_in = timezone.make_aware(datetime(2024, 2, day, 9))
+            Attendance.objects.create(
+                employee=self.employee, date=date(2024, 2, day), shift=shift,
+                check_in_time=check_in, check_out_time=check_in + timedelta(hours=hours),
+            )
+        self.february = (date(2024, 2, 1), date(2024, 2, 29))
+        self.hr = create_employee('HR908').user
+        self.hr.role = 'HR_MANAGER'
+        self.hr.save(update_fields=['role'])
+
+    def report(self, **kwargs):
+        return overtime_report(*self.february, group_by=('employee', 'shift'), **kwargs)
+
+    def test_rebuilt_rollups_match_live_totals_and_stay_unique(self):
+        live = self.report()
+        self.assertEqual(build_rollups('month', [date(2024, 2, 1)]), 2)
+        self.assertEqual(build_rollups('month', [date(2024, 2, 1)]), 2)
+        self.assertEqual(OvertimeRollup.objects.count(), 2)
+        self.assertEqual(self.report(), live)
+        self.assertEqual([row['days_worked'] for row in live], [1, 3])
+
+        for shift in [self.shift, None]:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                OvertimeRollup.objects.create(
+                    employee=self.employee, shift=shift, period='MONTH', period_start=date(2024, 2, 1)
+                )
+
+    def test_archived_months_need_a_rollup(self):
+        live = self.report()
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_month(2024, 2)
+        with self.assertRaises(ArchivedPeriodsMissing) as raised:
+            self.report()
+        self.assertEqual(raised.exception.months, [(2024, 2)])
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.hr)
+        response = client.get('/api/v1/attendance/records/overtime/', {
+            'start_date': '2024-02-01', 'end_date': '2024-02-29',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('2024-02', response.data['error'])
+
+        # Rolled up before archiving, the month is read from its rollups;
+        # part of it is still not available
+        OvertimeRollup.objects.bulk_create([
+            OvertimeRollup(
+                employee_id=row['employee_id'], shift_id=row['shift_id'], period='MONTH',
+                period_start=row['period_start'], **{metric: row[metric] for metric in (
+                    'days_worked', 'compliant_days', 'short_days', 'overtime_days', 'total_hours', 'overtime_hours'
+                )}
+            )
+            for row in live
+        ])
+        self.assertEqual(self.report(), live)
+        with self.assertRaises(ArchivedPeriodsMissing):
+            overtime_report(date(2024, 2, 10), date(2024, 3, 31))
+
+
+class ConcurrentCheckInTests(TransactionTestCase):
+    """
+    Hammers check-in from many threads at once; exactly one tap may win.
+    """
+    THREADS = 16
+
+    def setUp(self):
+        invalidate_shift_index()
+        self.employee = create_employee('EMP901')
+
+    def test_concurrent_duplicate_taps(self):
+        barrier = threading.Barrier(self.THREADS)
+        responses, errors = [], []
+
+        def tap():
+            client = APIClient(SERVER_NAME='localhost')
+            client.force_authenticate(self.employee.user)
+            try:
+                barrier.wait()
+                responses.append(client.post('/api/v1/attendance/records/check_in/'))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=tap) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        codes = sorted(response.status_code for response in responses)
+        self.assertEqual(codes, [200] + [400] * (self.THREADS - 1))
+        self.assertEqual(Attendance.objects.filter(employee=self.employee).count(), 1)
+        summary = AttendanceMonthlySummary.objects.get(employee=self.employee)
+        self.assertEqual(summary.present_days, 1)
@@ -9,9 +9,12 @@ router = DefaultRouter()
 router.register('shifts', views.ShiftViewSet, basename='shift')
 router.register('employee-shifts', views.EmployeeShiftViewSet, basename='employee-shift')
 router.register('records', views.AttendanceViewSet, basename='attendance')
+router.register('monthly-summaries', views.AttendanceMonthlySummaryViewSet, basename='attendance-monthly-summary')
 router.register('requests', views.AttendanceRequestViewSet, basename='attendance-request')
 router.register('work-from-home', views.WorkFromHomeViewSet, basename='work-from-home')
 
 urlpatterns = [
+    path('occupancy/stream/', views.occupancy_stream, name='attendance-occupancy-stream'),
+    path('occupancy/stream-token/', views.occupancy_stream_token, name='attendance-occupancy-stream-token'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -2,20 +2,50 @@
 Attendance views
 """
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime, date
 from django.core.exceptions import ObjectDoesNotExist
-from .models import Shift, EmployeeShift, Attendance, AttendanceRequest, WorkFromHome
+from rest_framework.exceptions import ValidationError, AuthenticationFailed
+from rest_framework.pagination import PageNumberPagination
+from django.utils.dateparse import parse_date
+from .models import (
+    Shift, EmployeeShift, Attendance, AttendanceRequest, WorkFromHome,
+    AttendanceMonthlySummary
+)
 from .serializers import (
     ShiftSerializer, EmployeeShiftSerializer, AttendanceSerializer,
     AttendanceCheckInSerializer, AttendanceCheckOutSerializer,
-    AttendanceRequestSerializer, WorkFromHomeSerializer
+    AttendanceRequestSerializer, WorkFromHomeSerializer, PunchEventSerializer,
+    AttendanceMonthlySummarySerializer, BulkReviewSerializer, ArchivedAttendanceSerializer
+)
+from .services import (
+    PunchRejected, ingest_punches, record_check_in, record_check_out,
+    review_requests, apply_attendance_corrections
 )
+from .month_calendar import LEGEND, encode_month_calendar
+from .archive import ArchivedRows, HistoryRows, months_in_range
+from .occupancy import OCCUPANCY_CHANNEL, StreamToken, compute_occupancy
+from .overtime import GROUP_FIELDS, PERIODS, ArchivedPeriodsMissing, overtime_report
+from apps.employees.models import Employee
+from apps.employees.hierarchy import in_reporting_tree
 from apps.accounts.permissions import IsSuperAdminOrHRManager, IsOwnerOrTeamLead
+from apps.core.events import get_hub
+from apps.core.pagination import SelectablePagination
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+import asyncio
+import json
+
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_MAX_SECONDS = 300
+STREAM_RETRY_MS = 3000
 
 class ShiftViewSet(viewsets.ModelViewSet):
     """
@@ -42,7 +72,7 @@ class EmployeeShiftViewSet(viewsets.ModelViewSet):
             return EmployeeShift.objects.all()
         elif user.role == 'TEAM_LEAD':
             return EmployeeShift.objects.filter(
-                Q(employee__user=user) | Q(employee__manager__user=user)
+                in_reporting_tree(user)
             )
         else:
             return EmployeeShift.objects.filter(employee__user=user)
@@ -53,18 +83,95 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     """
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SelectablePagination
+    keyset_ordering = ('-date', '-id')
     
     def get_queryset(self):
         user = self.request.user
         
+        queryset = Attendance.objects.select_related('employee__user', 'shift', 'approved_by')
+        
         if user.role in ['SUPER_ADMIN', 'HR_MANAGER']:
-            return Attendance.objects.all()
+            pass
         elif user.role == 'TEAM_LEAD':
-            return Attendance.objects.filter(
-                Q(employee__user=user) | Q(employee__manager__user=user)
+            queryset = queryset.filter(
+                in_reporting_tree(user)
             )
         else:
-            return Attendance.objects.filter(employee__user=user)
+            queryset = queryset.filter(employee__user=user)
+        
+        start_date, end_date = self.get_date_range()
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
+        employee_id = self.request.query_params.get('employee', None)
+        if employee_id:
+            queryset = queryset.filter(employee_id=employee_id)
+        return queryset
+    
+    def get_date_range(self):
+        """Optional ?start_date= / ?end_date= filters (YYYY-MM-DD)"""
+        dates = []
+        for param in ['start_date', 'end_date']:
+            value = self.request.query_params.get(param, None)
+            try:
+                parsed = parse_date(value) if value else None
+            except ValueError:
+                parsed = None
+            if value and parsed is None:
+                raise ValidationError({param: 'Enter a valid date (YYYY-MM-DD)'})
+            dates.append(parsed)
+        return dates
+    
+    def get_archive_employee_ids(self):
+        """Employees whose archived rows the user may see; None means everyone"""
+        user = self.request.user
+        employee_id = self.request.query_params.get('employee', None)
+        if user.role in ['SUPER_ADMIN', 'HR_MANAGER']:
+            employees = Employee.objects.all() if employee_id else None
+        elif user.role == 'TEAM_LEAD':
+            employees = Employee.objects.filter(in_reporting_tree(user, field=None))
+        else:
+            employees = Employee.objects.filter(user=user)
+        if employees is None:
+            return None
+        if employee_id:
+            employees = employees.filter(id=employee_id)
+        return set(employees.values_list('id', flat=True))
+    
+    def list(self, request, *args, **kwargs):
+        """
+        List attendance. Rows from archived months are included when the
+        requested date range reaches into them (or with ?archive=include);
+        such pages always use page-number pagination.
+        """
+        start_date, end_date = self.get_date_range()
+        include_archive = request.query_params.get('archive', None)
+        if include_archive == 'exclude' or not months_in_range(start_date, end_date) or (
+            include_archive != 'include' and not (start_date or end_date)
+        ):
+            return super().list(request, *args, **kwargs)
+        
+        queryset = self.filter_queryset(self.get_queryset()).order_by('-date', '-id')
+        archived = ArchivedRows(self.get_archive_employee_ids(), start_date, end_date)
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(HistoryRows(queryset, archived), request, view=self)
+        
+        names = {
+            employee_id: f"{first_name} {last_name}".strip()
+            for employee_id, first_name, last_name in Employee.objects.filter(
+                id__in={row['employee_id'] for row in page if isinstance(row, dict)}
+            ).values_list('id', 'user__first_name', 'user__last_name')
+        }
+        data = []
+        for row in page:
+            if isinstance(row, dict):
+                row = dict(row, employee_name=names.get(row['employee_id'], ''))
+                data.append(ArchivedAttendanceSerializer(row).data)
+            else:
+                data.append(self.get_serializer(row).data)
+        return paginator.get_paginated_response(data)
     
     def get_employee_profile(self, request):
         """Safely get employee profile with proper error handling"""
@@ -77,38 +184,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         """Check in for today"""
         try:
             employee = self.get_employee_profile(request)
-            today = date.today()
-            
-            # Check if already checked in
-            existing_attendance = Attendance.objects.filter(
-                employee=employee, 
-                date=today
-            ).first()
-            
-            if existing_attendance and existing_attendance.check_in_time:
-                return Response(
-                    {'error': 'Already checked in for today'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Get active shift for today
-            employee_shift = EmployeeShift.objects.filter(
-                employee=employee,
-                is_active=True,
-                effective_from__lte=today,
-                effective_to__gte=today
-            ).first()
-            
-            shift = employee_shift.shift if employee_shift else None
-            
-            # Create attendance record
-            attendance = Attendance.objects.create(
-                employee=employee,
-                date=today,
-                shift=shift,
-                check_in_time=timezone.now(),
-                status='PRESENT'
-            )
+            attendance = record_check_in(employee, date.today(), timezone.now())
             
             serializer = self.get_serializer(attendance)
             return Response({
@@ -116,6 +192,11 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 'data': serializer.data
             })
             
+        except PunchRejected as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except ObjectDoesNotExist as e:
             return Response(
                 {'error': str(e)}, 
@@ -132,30 +213,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         """Check out for today"""
         try:
             employee = self.get_employee_profile(request)
-            today = date.today()
-            
-            try:
-                attendance = Attendance.objects.get(employee=employee, date=today)
-            except Attendance.DoesNotExist:
-                return Response(
-                    {'error': 'No check-in record found for today'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            if not attendance.check_in_time:
-                return Response(
-                    {'error': 'Must check in first'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            if attendance.check_out_time:
-                return Response(
-                    {'error': 'Already checked out for today'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            attendance.check_out_time = timezone.now()
-            attendance.save()
+            attendance = record_check_out(employee, date.today(), timezone.now())
             
             return Response({
                 'message': 'Checked out successfully',
@@ -163,6 +221,11 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 'total_hours': float(attendance.total_hours)
             })
             
+        except PunchRejected as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except ObjectDoesNotExist as e:
             return Response(
                 {'error': str(e)}, 
@@ -174,6 +237,145 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['post'], permission_classes=[IsSuperAdminOrHRManager])
+    def bulk_punch(self, request):
+        """Ingest a batch of punches from biometric terminals"""
+        payload = request.data.get('events') if isinstance(request.data, dict) else request.data
+        if not isinstance(payload, list):
+            return Response(
+                {'error': 'Expected a list of events'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Validate per event so one bad punch does not reject the whole batch
+        event_serializer = PunchEventSerializer()
+        events, positions, errors = [], [], {}
+        for index, item in enumerate(payload):
+            try:
+                events.append(event_serializer.run_validation(item))
+                positions.append(index)
+            except ValidationError as e:
+                errors[index] = e.detail
+        
+        results = [None] * len(payload)
+        for result in ingest_punches(events):
+            index = positions[result['index']]
+            results[index] = dict(result, index=index)
+        for index, detail in errors.items():
+            results[index] = {'index': index, 'status': 'error', 'error': detail}
+        
+        summary = {'created': 0, 'updated': 0, 'duplicate': 0, 'error': 0}
+        for result in results:
+            summary[result['status']] += 1
+        
+        return Response({
+            'received': len(payload),
+            'summary': summary,
+            'results': results
+        })
+    
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """Packed month calendar (4 bits per day) for the visible employees"""
+        month_param = request.query_params.get('month')
+        try:
+            if month_param:
+                year, month = [int(part) for part in month_param.split('-')]
+                date(year, month, 1)
+            else:
+                year, month = date.today().year, date.today().month
+        except ValueError:
+            return Response(
+                {'error': 'month must be in YYYY-MM format'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        user = request.user
+        employees = Employee.objects.select_related('user').filter(
+            employment_status='ACTIVE'
+        ).order_by('employee_id')
+        if user.role in ['SUPER_ADMIN', 'HR_MANAGER']:
+            department = request.query_params.get('department')
+            if department:
+                employees = employees.filter(department_id=department)
+        elif user.role == 'TEAM_LEAD':
+            employees = employees.filter(in_reporting_tree(user, field=None))
+        else:
+            employees = employees.filter(user=user)
+        
+        page = self.paginate_queryset(employees)
+        employees = list(page if page is not None else employees)
+        packed = encode_month_calendar([employee.id for employee in employees], year, month)
+        
+        data = {
+            'month': f"{year:04d}-{month:02d}",
+            'encoding': 'base64; 4 bits per day, first day in the high nibble',
+            'legend': LEGEND,
+            'employees': [
+                {
+                    'id': employee.id,
+                    'employee_id': employee.employee_id,
+                    'name': employee.full_name,
+                    'days': packed[employee.id],
+                }
+                for employee in employees
+            ]
+        }
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def overtime(self, request):
+        """Overtime and shift-compliance totals by week/month and employee, department or shift"""
+        start_date, end_date = self.get_date_range()
+        today = date.today()
+        start_date = start_date or today.replace(day=1)
+        end_date = end_date or today
+        if end_date < start_date:
+            return Response(
+                {'error': 'end_date must not be before start_date'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        period = request.query_params.get('period', 'month')
+        group_by = [group for group in request.query_params.get('group_by', 'employee').split(',') if group]
+        if period not in PERIODS or not group_by or any(group not in GROUP_FIELDS for group in group_by):
+            return Response(
+                {'error': f"period must be one of {', '.join(PERIODS)}; "
+                          f"group_by a comma-separated list of {', '.join(GROUP_FIELDS)}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        user = request.user
+        scope = Q()
+        if user.role in ['SUPER_ADMIN', 'HR_MANAGER', 'PAYROLL_ADMIN']:
+            pass
+        elif user.role == 'TEAM_LEAD':
+            scope = in_reporting_tree(user)
+        else:
+            scope = Q(employee__user=user)
+        department = request.query_params.get('department')
+        if department:
+            scope &= Q(employee__department_id=department)
+        shift = request.query_params.get('shift')
+        if shift:
+            scope &= Q(shift_id=shift)
+        employee_id = request.query_params.get('employee')
+        if employee_id:
+            scope &= Q(employee_id=employee_id)
+        
+        try:
+            results = overtime_report(start_date, end_date, period=period, group_by=group_by, scope=scope)
+        except ArchivedPeriodsMissing as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(results, request, view=self)
+        return paginator.get_paginated_response(page)
+    
     @action(detail=False, methods=['get'])
     def today(self, request):
         """Get today's attendance"""
@@ -210,7 +412,94 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class AttendanceRequestViewSet(viewsets.ModelViewSet):
+class AttendanceMonthlySummaryViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for per-employee monthly attendance counts
+    """
+    serializer_class = AttendanceMonthlySummarySerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        user = self.request.user
+        queryset = AttendanceMonthlySummary.objects.select_related('employee').order_by(
+            '-year', '-month', 'employee_id'
+        )
+        
+        year, month = self.get_period()
+        if year:
+            queryset = queryset.filter(year=year)
+        if month:
+            queryset = queryset.filter(month=month)
+        
+        if user.role in ['SUPER_ADMIN', 'HR_MANAGER', 'PAYROLL_ADMIN']:
+            return queryset
+        elif user.role == 'TEAM_LEAD':
+            return queryset.filter(
+                in_reporting_tree(user)
+            )
+        else:
+            return queryset.filter(employee__user=user)
+    
+    def get_period(self):
+        """Optional ?year= / ?month= filters"""
+        period = []
+        for param, valid in [('year', range(1, 10000)), ('month', range(1, 13))]:
+            value = self.request.query_params.get(param, None)
+            try:
+                parsed = int(value) if value else None
+            except ValueError:
+                parsed = None
+            if value and parsed not in valid:
+                raise ValidationError({param: f'Enter a number from {valid.start} to {valid.stop - 1}'})
+            period.append(parsed)
+        return period
+
+class BulkReviewMixin:
+    """
+    Bulk approve/reject actions for request viewsets
+    """
+    
+    def apply_approvals(self, approved, results, reviewer):
+        """Hook for side effects of approval, e.g. writing attendance rows"""
+    
+    @action(detail=False, methods=['post'])
+    def bulk_approve(self, request):
+        """Approve many pending requests in one transaction"""
+        return self.bulk_review(request, approve=True)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_reject(self, request):
+        """Reject many pending requests in one transaction"""
+        return self.bulk_review(request, approve=False)
+    
+    def bulk_review(self, request, approve):
+        if not request.user.is_team_lead():
+            return Response(
+                {'error': 'Permission denied'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = BulkReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        with transaction.atomic():
+            results, reviewed = review_requests(
+                self.get_queryset(), serializer.validated_data['ids'], request.user,
+                approve, serializer.validated_data['rejection_reason']
+            )
+            if approve and reviewed:
+                self.apply_approvals(reviewed, results, request.user)
+        
+        summary = {'approved': 0, 'rejected': 0, 'skipped': 0, 'not_found': 0}
+        for result in results:
+            summary[result['status']] += 1
+        
+        return Response({
+            'summary': summary,
+            'results': results
+        })
+
+class AttendanceRequestViewSet(BulkReviewMixin, viewsets.ModelViewSet):
     """
     ViewSet for attendance correction requests
     """
@@ -224,7 +513,7 @@ class AttendanceRequestViewSet(viewsets.ModelViewSet):
             return AttendanceRequest.objects.all()
         elif user.role == 'TEAM_LEAD':
             return AttendanceRequest.objects.filter(
-                Q(employee__user=user) | Q(employee__manager__user=user)
+                in_reporting_tree(user)
             )
         else:
             return AttendanceRequest.objects.filter(employee__user=user)
@@ -269,8 +558,14 @@ class AttendanceRequestViewSet(viewsets.ModelViewSet):
             attendance.save()
         
         return Response({'status': 'Attendance request approved'})
+    
+    def apply_approvals(self, approved, results, reviewer):
+        attendance = apply_attendance_corrections(approved, reviewer)
+        for result in results:
+            if result['id'] in attendance:
+                result['attendance_id'] = attendance[result['id']].id
 
-class WorkFromHomeViewSet(viewsets.ModelViewSet):
+class WorkFromHomeViewSet(BulkReviewMixin, viewsets.ModelViewSet):
     """
     ViewSet for work from home requests
     """
@@ -284,7 +579,7 @@ class WorkFromHomeViewSet(viewsets.ModelViewSet):
             return WorkFromHome.objects.all()
         elif user.role == 'TEAM_LEAD':
             return WorkFromHome.objects.filter(
-                Q(employee__user=user) | Q(employee__manager__user=user)
+                in_reporting_tree(user)
             )
         else:
             return WorkFromHome.objects.filter(employee__user=user)
@@ -307,4 +602,65 @@ class WorkFromHomeViewSet(viewsets.ModelViewSet):
         wfh_request.approved_date = timezone.now()
         wfh_request.save()
         
-        return Response({'status': 'Work from home request approved'})
\ No newline at end of file
+        return Response({'status': 'Work from home request approved'})
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def occupancy_stream_token(request):
+    """
+    Short-lived token for the occupancy stream, for EventSource clients
+    that have to pass it as ?token=
+    """
+    if not request.user.is_team_lead():
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    return Response({
+        'token': str(StreamToken.for_user(request.user)),
+        'expires_in': int(StreamToken.lifetime.total_seconds()),
+    })
+
+def authenticate_stream(request):
+    """
+    Access token from the Authorization header or, for EventSource clients,
+    a stream token as ?token=; access tokens are not accepted in the URL
+    """
+    authentication = JWTAuthentication()
+    result = authentication.authenticate(request)
+    if result is not None:
+        return result[0]
+    token = request.GET.get('token')
+    if token:
+        try:
+            return authentication.get_user(StreamToken(token))
+        except TokenError as error:
+            raise AuthenticationFailed(str(error))
+    return None
+
+async def occupancy_stream(request):
+    """Server-sent events with per-department occupancy for today"""
+    try:
+        user = await sync_to_async(authenticate_stream)(request)
+    except AuthenticationFailed:
+        user = None
+    if user is None:
+        return JsonResponse({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+    if not user.is_team_lead():
+        return JsonResponse({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    response = StreamingHttpResponse(occupancy_events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def occupancy_events():
+    # Streams end after STREAM_MAX_SECONDS; EventSource reconnects on its own
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_MAX_SECONDS
+    async with get_hub().subscribe(OCCUPANCY_CHANNEL) as subscription:
+        yield f"retry: {STREAM_RETRY_MS}\n"
+        yield sse_message(await sync_to_async(compute_occupancy)())
+        while loop.time() < deadline:
+            message = await subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+            yield sse_message(message) if message is not None else ': keepalive\n\n'
+
+def sse_message(data, event='occupancy'):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,118 @@
+"""
+Versioned process-local caches
+Each worker keeps its own copy of a derived structure and rebuilds it when
+a version counter stored in the shared Django cache is bumped.
+"""
+import threading
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'hrms:version:{}'
+
+
+def get_version(namespace):
+    """Current shared version for a namespace (initialised on first use)"""
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every process-local copy of a namespace"""
+    key = VERSION_KEY.format(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key expired or was evicted: any value differs from what workers hold
+        cache.add(key, 1, timeout=None)
+        return cache.incr(key)
+
+
+def bump_version_on_commit(namespace):
+    """Bump once the current transaction commits so rebuilds see committed data"""
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+class VersionedLocalCache:
+    """
+    Process-local value built by `builder` and rebuilt whenever the shared
+    version of `namespace` changes.
+    """
+
+    def __init__(self, namespace, builder):
+        self.namespace = namespace
+        self.builder = builder
+        self._value = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = get_version(self.namespace)
+        if self._value is not None and self._version == version:
+            return self._value
+        with self._lock:
+            if self._value is None or self._version != version:
+                self._value = self.builder()
+                self._version = version
+        return self._value
+
+    def invalidate(self):
+        bump_version_on_commit(self.namespace)
+
+
+CHANGES_KEY = 'hrms:changes:{}:{}'
+# How long a version's change log is kept, and how far behind a worker may
+# fall before it rebuilds from scratch instead of replaying
+CHANGES_TIMEOUT = 86400
+MAX_REPLAYED_VERSIONS = 200
+
+
+def record_changes_on_commit(namespace, keys):
+    """Bump `namespace` after commit and log which keys changed with it"""
+    keys = list(keys)
+
+    def publish():
+        version = bump_version(namespace)
+        cache.set(CHANGES_KEY.format(namespace, version), keys, CHANGES_TIMEOUT)
+    transaction.on_commit(publish)
+
+
+class IncrementalLocalCache(VersionedLocalCache):
+    """
+    VersionedLocalCache that catches up by passing the keys logged with each
+    missed version to `updater(value, keys)`, and only calls `builder` again
+    when that log is incomplete or too long.
+    """
+
+    def __init__(self, namespace, builder, updater):
+        super().__init__(namespace, builder)
+        self.updater = updater
+
+    def get(self):
+        version = get_version(self.namespace)
+        if self._value is not None and self._version == version:
+            return self._value
+        with self._lock:
+            if self._value is not None and self._version != version:
+                keys = self._logged_changes(self._version, version)
+                if keys is None:
+                    self._value = None
+                else:
+                    self.updater(self._value, keys)
+                    self._version = version
+            if self._value is None:
+                self._value = self.builder()
+                self._version = version
+        return self._value
+
+    def _logged_changes(self, since, version):
+        if not since < version <= since + MAX_REPLAYED_VERSIONS:
+            return None
+        log_keys = [CHANGES_KEY.format(self.namespace, number) for number in range(since + 1, version + 1)]
+        logged = cache.get_many(log_keys)
+        if len(logged) != len(log_keys):
+            return None
+        return {key for keys in logged.values() for key in keys}
@@ -0,0 +1,120 @@
+"""
+In-process event hub
+Fan-out of small messages from request/worker threads to async consumers
+such as server-sent event streams.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+SUBSCRIPTION_QUEUE_SIZE = 16
+
+
+class Subscription:
+    """
+    One consumer's view of a channel; iterate it from the event loop that
+    created it. Slow consumers only ever see the most recent messages.
+    """
+
+    def __init__(self, hub, channel):
+        self.hub = hub
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def deliver(self, message):
+        """Thread-safe; called by the backend for every published message"""
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Next message, or None after `timeout` seconds without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+class LocalBackend:
+    """
+    Delivers messages to subscribers in this process only. Run a single
+    worker, or plug in a shared backend, when producers live elsewhere.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def add(self, subscription):
+        with self._lock:
+            self._subscribers[subscription.channel].add(subscription)
+
+    def remove(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def has_subscribers(self, channel):
+        with self._lock:
+            return bool(self._subscribers.get(channel))
+
+
+class EventHub:
+    """
+    Publish/subscribe facade over a backend chosen by settings.EVENT_HUB_BACKEND.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def publish(self, channel, message):
+        self.backend.publish(channel, message)
+
+    def subscribe(self, channel):
+        """Subscribe from inside a running event loop"""
+        subscription = Subscription(self, channel)
+        self.backend.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.backend.remove(subscription)
+
+    def has_subscribers(self, channel):
+        return self.backend.has_subscribers(channel)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = EventHub(import_string(settings.EVENT_HUB_BACKEND)())
+    return _hub
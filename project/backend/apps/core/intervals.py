@@ -0,0 +1,73 @@
+"""
+Static interval tree
+Closed [start, end] intervals over any ordered type (dates, numbers),
+queried for everything overlapping a range in O(log n + k).
+"""
+
+
+class _Node:
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, center, intervals, left, right):
+        self.center = center
+        self.by_start = sorted(intervals, key=lambda interval: interval[0])
+        self.by_end = sorted(intervals, key=lambda interval: interval[1], reverse=True)
+        self.left = left
+        self.right = right
+
+
+class IntervalTree:
+    """
+    Centered interval tree built once from (start, end, item) tuples.
+    Each node keeps the intervals containing its center point, sorted by
+    start and by end, so a query only scans intervals that match.
+    """
+
+    def __init__(self, intervals=()):
+        intervals = list(intervals)
+        self._size = len(intervals)
+        self._root = self._build(intervals)
+
+    def __len__(self):
+        return self._size
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        points = sorted(point for start, end, _ in intervals for point in (start, end))
+        center = points[len(points) // 2]
+        left, here, right = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        return _Node(center, here, self._build(left), self._build(right))
+
+    def overlapping(self, start, end):
+        """Items of all intervals sharing at least one point with [start, end]"""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if end < node.center:
+                for interval in node.by_start:
+                    if interval[0] > end:
+                        break
+                    found.append(interval[2])
+                stack.append(node.left)
+            elif start > node.center:
+                for interval in node.by_end:
+                    if interval[1] < start:
+                        break
+                    found.append(interval[2])
+                stack.append(node.right)
+            else:
+                found.extend(interval[2] for interval in node.by_start)
+                stack.append(node.left)
+                stack.append(node.right)
+        return found
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["timestamp", "id"], name="audit_log_timestamp_id_idx"
+            ),
+        ),
+    ]
@@ -94,6 +94,10 @@ class AuditLog(models.Model):
     class Meta:
         db_table = 'core_audit_log'
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination on (timestamp, id)
+            models.Index(fields=['timestamp', 'id'], name='audit_log_timestamp_id_idx'),
+        ]
 
 class Notification(TimeStampedModel):
     """
@@ -0,0 +1,190 @@
+"""
+Pagination classes
+Keyset (cursor) pagination for large, append-mostly tables.
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique composite ordering such as ('-date', '-id').
+    Pages are fetched with a WHERE on the ordering columns instead of
+    COUNT(*) + OFFSET, so deep pages cost the same as the first one.
+    """
+    ordering = None
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = self.ordering if not reverse else tuple(self._flip(field) for field in self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            if has_more or reverse:
+                self.next_position = self._position(results[-1])
+            if (has_more and reverse) or (position is not None and not reverse):
+                self.previous_position = self._position(results[0])
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.encode_cursor(self.next_position, reverse=False),
+            'previous': self.encode_cursor(self.previous_position, reverse=True),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+            return position, bool(payload.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        if position is None:
+            return None
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _position(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return values
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _after(ordering, position):
+        """Rows strictly after `position` in `ordering`, as (a < x) OR (a = x AND b < y) ..."""
+        clauses = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = f"{name}__lt" if field.startswith('-') else f"{name}__gt"
+            equal = {ordering[j].lstrip('-'): position[j] for j in range(i)}
+            clauses.append(Q(**equal, **{lookup: position[i]}))
+        return reduce(or_, clauses)
+
+
+class SelectablePagination(BasePagination):
+    """
+    Page-number or keyset pagination, chosen per request.
+
+    Viewsets set `keyset_ordering` (a unique ordering) and optionally
+    `pagination_mode` ('page' or 'cursor', default 'page'); clients can
+    override it with ?pagination=page|cursor. Only list actions use keyset
+    pagination, other actions always get page numbers.
+    """
+    mode_query_param = 'pagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = request.query_params.get(self.mode_query_param) or getattr(view, 'pagination_mode', 'page')
+        if KeysetPagination.cursor_query_param in request.query_params:
+            mode = 'cursor'
+        ordering = getattr(view, 'keyset_ordering', None)
+        if mode == 'cursor' and ordering and getattr(view, 'action', None) == 'list':
+            self.paginator = KeysetPagination(ordering)
+        else:
+            # Meta.ordering alone may tie; only an explicit order_by is kept
+            if ordering and not queryset.query.order_by:
+                queryset = queryset.order_by(*ordering)
+            self.paginator = PageNumberPagination()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return PageNumberPagination().get_schema_operation_parameters(view) + [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Pagination mode: page or cursor.',
+                'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+            },
+        ] + KeysetPagination().get_schema_operation_parameters(view)
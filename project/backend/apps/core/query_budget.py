@@ -0,0 +1,80 @@
+"""
+Query budgets
+Count the SQL statements a block or a viewset action runs and flag it when
+it goes over a fixed budget, so N+1 regressions surface in tests and dev.
+"""
+import logging
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('hrms.query_budget')
+
+
+class QueryBudgetExceeded(Exception):
+    """More queries ran than the budget allows"""
+
+
+class QueryCounter:
+    """connection.execute_wrapper that counts statements and keeps their SQL"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+class query_budget:
+    """
+    Raise QueryBudgetExceeded when the block runs more than `limit` queries:
+
+        with query_budget(6):
+            EmployeeDetailSerializer(employee).data
+    """
+
+    def __init__(self, limit, label='block'):
+        self.limit = limit
+        self.label = label
+        self.counter = QueryCounter()
+        self._wrapper = None
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self.counter)
+        self._wrapper.__enter__()
+        return self.counter
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._wrapper.__exit__(exc_type, exc, traceback)
+        if exc_type is None and self.counter.count > self.limit:
+            raise QueryBudgetExceeded(_describe(self.label, self.limit, self.counter))
+
+
+def _describe(label, limit, counter):
+    statements = '\n'.join(sql if len(sql) <= 300 else sql[:300] + '...' for sql in counter.statements)
+    return f"{label} ran {counter.count} queries, budget is {limit}:\n{statements}"
+
+
+class QueryBudgetMixin:
+    """
+    Check viewset actions against `query_budgets` ({action: max queries}).
+    Requests over budget are logged, and fail with QueryBudgetExceeded when
+    settings.QUERY_BUDGET_STRICT is on.
+    """
+    query_budgets = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = super().dispatch(request, *args, **kwargs)
+        limit = self.query_budgets.get(getattr(self, 'action', None))
+        if limit is not None and counter.count > limit:
+            message = _describe(f"{type(self).__name__}.{self.action}", limit, counter)
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
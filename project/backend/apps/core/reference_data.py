@@ -0,0 +1,135 @@
+"""
+Reference data cache
+Small tables that change a few times a year (leave types, holidays, shifts,
+departments, job titles, salary components) held in every process, keyed
+by id and natural key, and rebuilt everywhere when a row is saved or deleted.
+"""
+from functools import partial
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .cache import VersionedLocalCache
+
+# Model label -> natural keys to index rows by, besides the primary key
+REFERENCE_MODELS = {
+    'core.Department': ['code'],
+    'core.JobTitle': [],
+    'leaves.LeaveType': ['code'],
+    'leaves.Holiday': [],
+    'attendance.Shift': ['name'],
+    'payroll.SalaryComponent': ['code'],
+}
+
+_tables = {}
+
+
+class ReferenceTable:
+    """
+    Every row of one model, by primary key and by each natural key. Rows
+    are shared by all requests in the process and must not be modified.
+    """
+
+    def __init__(self, rows, keys):
+        self.rows = list(rows)
+        self.by_id = {row.pk: row for row in self.rows}
+        self.by_key = {key: {getattr(row, key): row for row in self.rows} for key in keys}
+
+    @classmethod
+    def build(cls, model, keys):
+        return cls(model._default_manager.all(), keys)
+
+
+def register_reference_models():
+    """Set up the caches and their invalidation; called once from CoreConfig.ready"""
+    for label, keys in REFERENCE_MODELS.items():
+        model = apps.get_model(label)
+        _tables[model] = VersionedLocalCache(f'reference.{label.lower()}', partial(ReferenceTable.build, model, keys))
+        for signal in (post_save, post_delete):
+            signal.connect(_reference_changed, sender=model, dispatch_uid=f'reference.{label.lower()}')
+
+
+def _reference_changed(sender, **kwargs):
+    # Querysets' update()/delete() send no signals; use save() or bump by hand
+    _tables[sender].invalidate()
+
+
+def reference_table(model):
+    return _tables[model].get()
+
+
+def get_reference(model, pk):
+    """Cached row by primary key, or None"""
+    if pk is None:
+        return None
+    return reference_table(model).by_id.get(model._meta.pk.to_python(pk))
+
+
+def get_reference_by(model, key, value):
+    """Cached row by a natural key registered in REFERENCE_MODELS, or None"""
+    return reference_table(model).by_key[key].get(value)
+
+
+def reference_rows(model, **filters):
+    """Cached rows, optionally filtered on attribute equality"""
+    return [
+        row for row in reference_table(model).rows
+        if all(getattr(row, name) == value for name, value in filters.items())
+    ]
+
+
+def invalidate_reference(model):
+    """For writes that bypass signals, e.g. QuerySet.update()"""
+    _tables[model].invalidate()
+
+
+class ReferenceField(serializers.ReadOnlyField):
+    """
+    Attribute of a related reference row read from the cache instead of the
+    database, e.g. ReferenceField(Department, 'name', source='department_id').
+    Omitted when the foreign key is empty, like a dotted source would be.
+    """
+
+    def __init__(self, model, attribute, **kwargs):
+        self.model = model
+        self.attribute = attribute
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        row = get_reference(self.model, super().get_attribute(instance))
+        if row is None:
+            raise serializers.SkipField()
+        return getattr(row, self.attribute)
+
+
+# Paginator attributes naming query parameters that only pick a page
+PAGE_PARAM_ATTRIBUTES = (
+    'page_query_param', 'page_size_query_param', 'limit_query_param',
+    'offset_query_param', 'cursor_query_param',
+)
+
+
+class ReferenceListMixin:
+    """
+    Serve a viewset's list action from the reference cache. `reference_rows`
+    must select the same rows, in the same order, as get_queryset does.
+    Requests with other query parameters (search, ordering, ...) go through
+    the filter backends and the database instead.
+    """
+    reference_model = None
+
+    def reference_rows(self):
+        return reference_rows(self.reference_model)
+
+    def list(self, request, *args, **kwargs):
+        paging = {getattr(self.paginator, name, None) for name in PAGE_PARAM_ATTRIBUTES}
+        paging.add(api_settings.URL_FORMAT_OVERRIDE)
+        if not set(request.query_params) <= paging:
+            return super().list(request, *args, **kwargs)
+
+        rows = self.reference_rows()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(rows, many=True).data)
@@ -2,7 +2,8 @@
 Core app serializers
 """
 from rest_framework import serializers
-from .models import Organization, Department, JobTitle, Notification
+from .models import Organization, Department, JobTitle, Notification, AuditLog
+from .reference_data import ReferenceField
 
 class OrganizationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -19,7 +20,7 @@ class DepartmentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 class JobTitleSerializer(serializers.ModelSerializer):
-    department_name = serializers.CharField(source='department.name', read_only=True)
+    department_name = ReferenceField(Department, 'name', source='department_id')
     
     class Meta:
         model = JobTitle
@@ -36,4 +37,11 @@ class NotificationSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data['sender'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+class AuditLogSerializer(serializers.ModelSerializer):
+    user_email = serializers.CharField(source='user.email', read_only=True)
+    
+    class Meta:
+        model = AuditLog
+        fields = '__all__'
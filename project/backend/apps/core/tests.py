@@ -0,0 +1,189 @@
+import base64
+import json
+import random
+from datetime import date, timedelta
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.leaves.models import Holiday, LeaveType
+from .cache import get_version
+from .models import AuditLog
+from .intervals import IntervalTree
+from .reference_data import reference_rows
+
+
+def brute_force(intervals, start, end):
+    return sorted(item for low, high, item in intervals if low <= end and high >= start)
+
+
+class IntervalTreeTests(SimpleTestCase):
+
+    def setUp(self):
+        self.random = random.Random(17)
+
+    def random_intervals(self, count, span=100):
+        intervals = []
+        for item in range(count):
+            start = self.random.randint(0, span)
+            intervals.append((start, start + self.random.randint(0, 10), item))
+        return intervals
+
+    def assert_matches_scan(self, tree, intervals, queries=200):
+        for _ in range(queries):
+            start = self.random.randint(-5, 110)
+            end = start + self.random.randint(0, 15)
+            self.assertEqual(sorted(tree.overlapping(start, end)), brute_force(intervals, start, end), (start, end))
+
+    def test_overlapping_matches_a_scan(self):
+        intervals = self.random_intervals(300)
+        tree = IntervalTree(intervals)
+        self.assertEqual(len(tree), 300)
+        self.assert_matches_scan(tree, intervals)
+
+    def test_touching_endpoints_overlap(self):
+        tree = IntervalTree([(1, 3, 'a'), (3, 5, 'b'), (6, 6, 'c')])
+        self.assertEqual(sorted(tree.overlapping(3, 3)), ['a', 'b'])
+        self.assertEqual(tree.overlapping(4, 4), ['b'])
+        self.assertEqual(sorted(tree.overlapping(5, 6)), ['b', 'c'])
+        self.assertEqual(tree.overlapping(0, 0), [])
+        self.assertEqual(tree.overlapping(7, 9), [])
+        self.assertEqual(IntervalTree().overlapping(1, 2), [])
+
+        # Dates are closed ranges too: a leave ending on Friday meets one starting then
+        friday = date(2024, 3, 8)
+        tree = IntervalTree([
+            (friday - timedelta(days=4), friday, 'week'),
+            (friday, friday + timedelta(days=3), 'long weekend'),
+            (friday + timedelta(days=4), friday + timedelta(days=4), 'tuesday'),
+        ])
+        self.assertEqual(sorted(tree.overlapping(friday, friday)), ['long weekend', 'week'])
+        self.assertEqual(tree.overlapping(friday + timedelta(days=4), friday + timedelta(days=10)), ['tuesday'])
+
+
+class ReferenceDataTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(User.objects.create_user(
+            email='ref@example.com', username='ref', password='secret'
+        ))
+
+    def test_saves_and_deletes_rebuild_the_cache(self):
+        namespace = 'reference.leaves.leavetype'
+        version = get_version(namespace)
+        with self.captureOnCommitCallbacks(execute=True):
+            leave_type = LeaveType.objects.create(name='Casual', code='CL')
+        self.assertEqual(get_version(namespace), version + 1)
+        self.assertEqual([row.name for row in reference_rows(LeaveType)], ['Casual'])
+
+        leave_type.name = 'Casual Leave'
+        with self.captureOnCommitCallbacks(execute=True):
+            leave_type.save()
+        self.assertEqual(get_version(namespace), version + 2)
+        self.assertEqual([row.name for row in reference_rows(LeaveType)], ['Casual Leave'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            leave_type.delete()
+        self.assertEqual(get_version(namespace), version + 3)
+        self.assertEqual(reference_rows(LeaveType), [])
+
+    def test_lists_match_get_queryset_and_honour_filters(self):
+        this_year = timezone.now().year
+        with self.captureOnCommitCallbacks(execute=True):
+            for code, name, active in [('SL', 'Sick', True), ('AL', 'Annual', True), ('OL', 'Old', False)]:
+                LeaveType.objects.create(name=name, code=code, is_active=active)
+            for day, name in [(date(this_year, 12, 25), 'Christmas'), (date(this_year, 1, 1), 'New Year'),
+                              (date(this_year - 1, 12, 25), 'Last Christmas')]:
+                Holiday.objects.create(name=name, date=day)
+
+        for url, queryset in [
+            ('/api/v1/leaves/types/', LeaveType.objects.filter(is_active=True)),
+            ('/api/v1/leaves/holidays/', Holiday.objects.filter(date__year=this_year)),
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [row['id'] for row in response.data['results']],
+                [str(pk) for pk in queryset.values_list('id', flat=True)]
+            )
+            # Name order differs from the cached order
+            response = self.client.get(url, {'ordering': 'name'})
+            self.assertEqual(
+                [row['name'] for row in response.data['results']],
+                sorted(queryset.values_list('name', flat=True))
+            )
+        response = self.client.get('/api/v1/leaves/holidays/', {'page': 1})
+        self.assertEqual([row['name'] for row in response.data['results']], ['New Year', 'Christmas'])
+
+
+class AuditLogPaginationTests(TestCase):
+
+    def setUp(self):
+        self.hr = User.objects.create_user(
+            email='audit@example.com', username='audit', password='secret', role='HR_MANAGER'
+        )
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.hr)
+        # Many rows share a timestamp, so only the id breaks ties
+        self.moments = [timezone.now() - timedelta(hours=hours) for hours in (3, 2, 1)]
+        for number in range(25):
+            log = AuditLog.objects.create(user=self.hr, action='POST', model_name='leaves', object_id=str(number))
+            AuditLog.objects.filter(pk=log.pk).update(timestamp=self.moments[number % 3])
+
+    def expected_ids(self):
+        return [str(pk) for pk in AuditLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True)]
+
+    def walk(self, url, link):
+        """Follow `link` from `url`: the pages' ids and the last response"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data[link]
+        return pages, response
+
+    def cursor(self, payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode('ascii')).decode('ascii')
+
+    def test_cursor_pages_are_stable_across_ties_and_new_rows(self):
+        expected = self.expected_ids()
+        first = self.client.get('/api/v1/core/audit-logs/', {'page_size': 4})
+        self.assertNotIn('count', first.data)
+        self.assertEqual([row['id'] for row in first.data['results']], expected[:4])
+
+        # A row logged meanwhile lands before the cursor and does not shift later pages
+        new = AuditLog.objects.create(user=self.hr, action='DELETE', model_name='leaves', object_id='new')
+        pages, last = self.walk(first.data['next'], 'next')
+        self.assertEqual([pk for page in pages for pk in page], expected[4:])
+        self.assertEqual([len(page) for page in pages], [4, 4, 4, 4, 4, 1])
+
+        # Walking back from the last page gives the same pages, then the new row
+        back, _ = self.walk(last.data['previous'], 'previous')
+        self.assertEqual([pk for page in reversed(back) for pk in page], [str(new.pk)] + expected[:-1])
+
+    def test_tampered_cursors_are_rejected(self):
+        timestamp = self.moments[0].isoformat()
+        for cursor in [
+            'not-a-cursor',
+            base64.urlsafe_b64encode(b'{"p": ').decode('ascii'),
+            self.cursor({'p': [timestamp]}),
+            self.cursor({'p': ['yesterday', '00000000-0000-0000-0000-000000000000']}),
+            self.cursor({'p': [timestamp, 'not-a-uuid']}),
+            self.cursor({'position': [timestamp, '00000000-0000-0000-0000-000000000000']}),
+        ]:
+            response = self.client.get('/api/v1/core/audit-logs/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+            self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+    def test_page_numbers_on_request(self):
+        response = self.client.get('/api/v1/core/audit-logs/', {'pagination': 'page', 'page': 2})
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual([row['id'] for row in response.data['results']], self.expected_ids()[20:])
+        response = self.client.get('/api/v1/core/audit-logs/', {'action': 'DELETE'})
+        self.assertEqual((response.data['results'], response.data['next']), ([], None))
+
+        employee = User.objects.create_user(email='staff@example.com', username='staff', password='secret')
+        self.client.force_authenticate(employee)
+        self.assertEqual(self.client.get('/api/v1/core/audit-logs/').status_code, 403)
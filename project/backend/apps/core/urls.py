@@ -10,6 +10,7 @@ router.register('organizations', views.OrganizationViewSet)
 router.register('departments', views.DepartmentViewSet)
 router.register('job-titles', views.JobTitleViewSet)
 router.register('notifications', views.NotificationViewSet)
+router.register('audit-logs', views.AuditLogViewSet, basename='audit-log')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -0,0 +1,24 @@
+"""
+Shared helpers for set-based processing
+"""
+from decimal import Decimal
+from itertools import islice
+from django.db.backends.utils import format_number
+
+
+def chunked(iterable, size):
+    """Yield lists of at most `size` items from any iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def to_stored_decimal(model, field_name, value):
+    """Convert a value exactly the way its DecimalField does when saving it"""
+    field = model._meta.get_field(field_name)
+    if value is None:
+        return None
+    return Decimal(format_number(field.to_python(value), field.max_digits, field.decimal_places))
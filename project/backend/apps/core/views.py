@@ -5,10 +5,11 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Organization, Department, JobTitle, Notification
+from .models import Organization, Department, JobTitle, Notification, AuditLog
+from .pagination import SelectablePagination
 from .serializers import (
     OrganizationSerializer, DepartmentSerializer, 
-    JobTitleSerializer, NotificationSerializer
+    JobTitleSerializer, NotificationSerializer, AuditLogSerializer
 )
 from apps.accounts.permissions import IsSuperAdminOrHRManager
 
@@ -73,4 +74,22 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def mark_all_as_read(self, request):
         """Mark all notifications as read"""
         self.get_queryset().update(is_read=True)
-        return Response({'status': 'all notifications marked as read'})
\ No newline at end of file
+        return Response({'status': 'all notifications marked as read'})
+
+class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for browsing the audit history
+    """
+    serializer_class = AuditLogSerializer
+    permission_classes = [IsSuperAdminOrHRManager]
+    pagination_class = SelectablePagination
+    pagination_mode = 'cursor'
+    keyset_ordering = ('-timestamp', '-id')
+    
+    def get_queryset(self):
+        queryset = AuditLog.objects.select_related('user')
+        for param in ['user', 'action', 'model_name', 'object_id']:
+            value = self.request.query_params.get(param, None)
+            if value:
+                queryset = queryset.filter(**{param: value})
+        return queryset
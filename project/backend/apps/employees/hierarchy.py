@@ -0,0 +1,167 @@
+"""
+Reporting hierarchy
+Maintains the ReportingLine closure table from Employee.manager, so a whole
+reporting subtree is one indexed lookup instead of a walk down the FKs.
+"""
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Q
+from apps.core.models import Department, JobTitle
+from apps.core.reference_data import get_reference
+from apps.core.utils import chunked
+from .models import Employee, ReportingLine
+
+# Keep IN (...) lists well below the SQLite bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+WRITE_BATCH_SIZE = 1000
+
+ORG_CHART_FIELDS = [
+    'depth', 'descendant_id', 'descendant__employee_id', 'descendant__user__first_name',
+    'descendant__user__last_name', 'descendant__manager_id', 'descendant__department_id',
+    'descendant__job_title_id', 'descendant__employment_status',
+]
+
+
+class ReportingCycle(ValueError):
+    """The new manager reports to the employee, directly or not"""
+
+
+def in_reporting_tree(user, field='employee', include_self=True):
+    """
+    Q matching rows whose `field` employee reports to `user` at any depth,
+    plus the user's own rows with include_self. With field=None it filters
+    Employee querysets themselves.
+    """
+    lines = ReportingLine.objects.filter(ancestor__user=user)
+    if not include_self:
+        lines = lines.filter(depth__gt=0)
+    lookup = f'{field}__in' if field else 'pk__in'
+    return Q(**{lookup: lines.values('descendant_id')})
+
+
+def reports_to(employee_id, manager_id):
+    """Whether employee_id is manager_id or sits anywhere below them"""
+    return ReportingLine.objects.filter(ancestor_id=manager_id, descendant_id=employee_id).exists()
+
+
+def check_manager(employee, manager_id):
+    if manager_id and employee.pk and reports_to(manager_id, employee.pk):
+        raise ReportingCycle(f"{employee.employee_id} cannot report to someone in their own reporting tree")
+
+
+def add_to_hierarchy(employee_id, manager_id):
+    """Lines for a new employee: itself at depth 0 and every manager above"""
+    lines = [ReportingLine(ancestor_id=employee_id, descendant_id=employee_id, depth=0)]
+    if manager_id:
+        lines.extend(
+            ReportingLine(ancestor_id=ancestor_id, descendant_id=employee_id, depth=depth + 1)
+            for ancestor_id, depth in ReportingLine.objects.filter(
+                descendant_id=manager_id
+            ).values_list('ancestor_id', 'depth')
+        )
+    ReportingLine.objects.bulk_create(lines)
+
+
+def add_many_to_hierarchy(employees):
+    """
+    Lines for many new employees from (employee_id, manager_id) pairs listed
+    managers first; managers outside the list are read in one pass
+    """
+    new_ids = {employee_id for employee_id, _ in employees}
+    ancestors = defaultdict(list)
+    existing = {manager_id for _, manager_id in employees if manager_id and manager_id not in new_ids}
+    for chunk in chunked(existing, LOOKUP_CHUNK_SIZE):
+        for ancestor_id, descendant_id, depth in ReportingLine.objects.filter(
+            descendant_id__in=chunk
+        ).values_list('ancestor_id', 'descendant_id', 'depth'):
+            ancestors[descendant_id].append((ancestor_id, depth))
+    lines = []
+    for employee_id, manager_id in employees:
+        chain = [(employee_id, 0)]
+        if manager_id:
+            chain.extend((ancestor_id, depth + 1) for ancestor_id, depth in ancestors[manager_id])
+        ancestors[employee_id] = chain
+        lines.extend(
+            ReportingLine(ancestor_id=ancestor_id, descendant_id=employee_id, depth=depth)
+            for ancestor_id, depth in chain
+        )
+    ReportingLine.objects.bulk_create(lines, batch_size=WRITE_BATCH_SIZE)
+
+
+def move_subtree(employee_id, manager_id):
+    """
+    Re-attach an employee and everyone below them under a new manager (or
+    none): drop the lines from their old managers into the subtree and add
+    the new managers' lines, with two set-based statements.
+    """
+    with transaction.atomic():
+        subtree = list(ReportingLine.objects.filter(ancestor_id=employee_id).values_list('descendant_id', 'depth'))
+        subtree_ids = {descendant_id for descendant_id, _ in subtree}
+        if manager_id in subtree_ids:
+            raise ReportingCycle('A manager cannot report to someone in their own reporting tree')
+        old_ancestors = list(ReportingLine.objects.filter(
+            descendant_id=employee_id, depth__gt=0
+        ).values_list('ancestor_id', flat=True))
+        if old_ancestors:
+            for chunk in chunked(subtree_ids, LOOKUP_CHUNK_SIZE):
+                ReportingLine.objects.filter(ancestor_id__in=old_ancestors, descendant_id__in=chunk).delete()
+        if not manager_id:
+            return
+        ancestors = list(ReportingLine.objects.filter(descendant_id=manager_id).values_list('ancestor_id', 'depth'))
+        ReportingLine.objects.bulk_create([
+            ReportingLine(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=above + below + 1)
+            for ancestor_id, above in ancestors
+            for descendant_id, below in subtree
+        ], batch_size=WRITE_BATCH_SIZE)
+
+
+def rebuild_reporting_lines():
+    """Recompute the whole closure table from Employee.manager; returns the row count"""
+    managers = dict(Employee.objects.values_list('id', 'manager_id'))
+    lines = []
+    for employee_id in managers:
+        seen = set()
+        ancestor_id, depth = employee_id, 0
+        # Walk up the chain; a cycle in bad data stops at the repeat
+        while ancestor_id and ancestor_id in managers and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            lines.append(ReportingLine(ancestor_id=ancestor_id, descendant_id=employee_id, depth=depth))
+            ancestor_id, depth = managers[ancestor_id], depth + 1
+    with transaction.atomic():
+        ReportingLine.objects.all().delete()
+        ReportingLine.objects.bulk_create(lines, batch_size=WRITE_BATCH_SIZE)
+    return len(lines)
+
+
+def org_chart(root_id=None, max_depth=None):
+    """
+    Nested org chart below `root_id` (or for every top-level employee when
+    None), read with one query. Returns a list of root nodes.
+    """
+    lines = ReportingLine.objects.all()
+    if root_id:
+        lines = lines.filter(ancestor_id=root_id)
+    else:
+        lines = lines.filter(ancestor__manager__isnull=True)
+    if max_depth is not None:
+        lines = lines.filter(depth__lte=max_depth)
+
+    nodes, roots = {}, []
+    for row in lines.values(*ORG_CHART_FIELDS).order_by('depth', 'descendant__employee_id'):
+        department = get_reference(Department, row['descendant__department_id'])
+        job_title = get_reference(JobTitle, row['descendant__job_title_id'])
+        node = nodes[row['descendant_id']] = {
+            'id': row['descendant_id'],
+            'employee_id': row['descendant__employee_id'],
+            'full_name': f"{row['descendant__user__first_name']} {row['descendant__user__last_name']}".strip(),
+            'department_name': department.name if department else None,
+            'job_title_name': job_title.title if job_title else None,
+            'employment_status': row['descendant__employment_status'],
+            'reports': [],
+        }
+        parent = nodes.get(row['descendant__manager_id']) if row['depth'] else None
+        if parent is None:
+            roots.append(node)
+        else:
+            parent['reports'].append(node)
+    return roots
@@ -0,0 +1,71 @@
+"""
+Management command to onboard employees in bulk from a CSV or JSON file
+"""
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.employees.onboarding import CHUNK_SIZE, onboard_employees, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Validate a CSV/JSON file of new hires and create their accounts and profiles in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the CSV or JSON file')
+        parser.add_argument(
+            '--format', choices=['csv', 'json'],
+            help='File format (defaults to the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Number of employees written per transaction'
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            help='Processes hashing passwords (defaults to the CPU count)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Validate the file and report errors without creating anything'
+        )
+        parser.add_argument(
+            '--report',
+            help='File to write the row-level results to, as JSON'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"File not found: {path}")
+
+        file_format = options['format'] or ('json' if path.endswith('.json') else 'csv')
+        with open(path, 'rb') as upload:
+            try:
+                rows = read_rows(upload.read(), file_format)
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        started = time.monotonic()
+        results = onboard_employees(
+            rows, chunk_size=options['chunk_size'], workers=options['workers'] or os.cpu_count() or 1,
+            dry_run=options['dry_run'],
+        )
+        elapsed = max(time.monotonic() - started, 1e-6)
+
+        errors = [result for result in results if result['status'] == 'error']
+        for result in errors:
+            messages = '; '.join(
+                f"{field}: {' '.join(str(message) for message in field_errors)}"
+                for field, field_errors in result['errors'].items()
+            )
+            self.stdout.write(self.style.WARNING(f"Row {result['row']} ({result['employee_id']}): {messages}"))
+        if options['report']:
+            with open(options['report'], 'w') as report:
+                json.dump(results, report, indent=2, default=str)
+
+        done = 'valid' if options['dry_run'] else 'created'
+        self.stdout.write(
+            f"{len(results)} rows in {elapsed:.2f}s - {done}: {len(results) - len(errors)}, errors: {len(errors)}"
+        )
+        self.stdout.write(self.style.SUCCESS('Employee import finished'))
@@ -0,0 +1,20 @@
+"""
+Management command to rebuild the employee directory search index
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.employees.search import index_employees, search_supported
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the employee search index from the employee, user, department and job title tables'
+
+    def handle(self, *args, **options):
+        if not search_supported():
+            self.stdout.write(self.style.WARNING('No search index on this database; searches scan the tables'))
+            return
+        started = time.monotonic()
+        with transaction.atomic():
+            index_employees()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt in {time.monotonic() - started:.2f}s"))
@@ -0,0 +1,15 @@
+"""
+Management command to rebuild the reporting hierarchy closure table
+"""
+import time
+from django.core.management.base import BaseCommand
+from apps.employees.hierarchy import rebuild_reporting_lines
+
+
+class Command(BaseCommand):
+    help = 'Recompute reporting lines from Employee.manager (after bulk manager updates)'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = rebuild_reporting_lines()
+        self.stdout.write(self.style.SUCCESS(f"{count} reporting lines in {time.monotonic() - started:.2f}s"))
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_reporting_lines(apps, schema_editor):
+    """Closure rows for the existing hierarchy: each employee with every manager above"""
+    Employee = apps.get_model("employees", "Employee")
+    ReportingLine = apps.get_model("employees", "ReportingLine")
+    managers = dict(Employee.objects.values_list("id", "manager_id"))
+    lines = []
+    for employee_id in managers:
+        seen = set()
+        ancestor_id, depth = employee_id, 0
+        while ancestor_id and ancestor_id in managers and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            lines.append(ReportingLine(ancestor_id=ancestor_id, descendant_id=employee_id, depth=depth))
+            ancestor_id, depth = managers[ancestor_id], depth + 1
+    ReportingLine.objects.bulk_create(lines, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("employees", "0002_employee_work_mode"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportingLine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField()),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_lines",
+                        to="employees.employee",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_lines",
+                        to="employees.employee",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "employees_reporting_line",
+                "unique_together": {("ancestor", "descendant")},
+            },
+        ),
+        migrations.RunPython(build_reporting_lines, migrations.RunPython.noop),
+    ]
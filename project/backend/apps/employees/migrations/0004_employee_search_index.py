@@ -0,0 +1,93 @@
+from django.db import migrations
+
+SOURCE_SQL = (
+    "SELECT e.id AS employee_id, TRIM(u.first_name || ' ' || u.last_name) AS full_name, "
+    "e.employee_id AS employee_code, u.email AS email, {email_name} AS email_name, "
+    "COALESCE(d.name, '') AS department, COALESCE(j.title, '') AS job_title, e.city AS city "
+    "FROM employees_employee e "
+    "JOIN accounts_user u ON u.id = e.user_id "
+    "LEFT JOIN core_department d ON d.id = e.department_id "
+    "LEFT JOIN core_job_title j ON j.id = e.job_title_id "
+    "WHERE e.employment_status = 'ACTIVE'"
+)
+
+FTS_COLUMNS = "full_name, employee_code, email_name, department, job_title, city"
+PEOPLE_COLUMNS = "full_name, employee_code, email_name"
+
+CREATE_SQL = {
+    # External-content FTS5 indexes over a plain table, synced by triggers:
+    # every column, and the name, code and email alone
+    "sqlite": [
+        "CREATE TABLE employees_search ("
+        "id integer NOT NULL PRIMARY KEY AUTOINCREMENT, employee_id char(32) NOT NULL UNIQUE, "
+        "full_name text NOT NULL, employee_code text NOT NULL, email text NOT NULL, email_name text NOT NULL, "
+        "department text NOT NULL, job_title text NOT NULL, city text NOT NULL)",
+        f"CREATE VIRTUAL TABLE employees_search_fts USING fts5({FTS_COLUMNS}, "
+        "content = 'employees_search', content_rowid = 'id', "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')",
+        f"CREATE VIRTUAL TABLE employees_search_people USING fts5({PEOPLE_COLUMNS}, "
+        "content = 'employees_search', content_rowid = 'id', "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')",
+        "CREATE TRIGGER employees_search_ai AFTER INSERT ON employees_search BEGIN "
+        f"INSERT INTO employees_search_fts (rowid, {FTS_COLUMNS}) VALUES (new.id, new.full_name, "
+        "new.employee_code, new.email_name, new.department, new.job_title, new.city); "
+        f"INSERT INTO employees_search_people (rowid, {PEOPLE_COLUMNS}) VALUES (new.id, new.full_name, "
+        "new.employee_code, new.email_name); END",
+        "CREATE TRIGGER employees_search_ad AFTER DELETE ON employees_search BEGIN "
+        f"INSERT INTO employees_search_fts (employees_search_fts, rowid, {FTS_COLUMNS}) VALUES ('delete', old.id, "
+        "old.full_name, old.employee_code, old.email_name, old.department, old.job_title, old.city); "
+        f"INSERT INTO employees_search_people (employees_search_people, rowid, {PEOPLE_COLUMNS}) VALUES ('delete', "
+        "old.id, old.full_name, old.employee_code, old.email_name); END",
+        "INSERT INTO employees_search (employee_id, full_name, employee_code, email, email_name, "
+        "department, job_title, city) SELECT * FROM ({}) x".format(
+            SOURCE_SQL.format(email_name="substr(u.email, 1, instr(u.email, '@') - 1)")
+        ),
+    ],
+    "postgresql": [
+        "CREATE TABLE employees_search ("
+        "employee_id uuid PRIMARY KEY REFERENCES employees_employee (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+        "full_name text NOT NULL, employee_code text NOT NULL, email text NOT NULL, "
+        "department text NOT NULL, job_title text NOT NULL, city text NOT NULL, "
+        "person_document tsvector NOT NULL, document tsvector NOT NULL)",
+        "CREATE INDEX employees_search_person_idx ON employees_search USING GIN (person_document)",
+        "CREATE INDEX employees_search_document_idx ON employees_search USING GIN (document)",
+        "INSERT INTO employees_search (employee_id, full_name, employee_code, email, department, job_title, city, "
+        "person_document, document) "
+        "SELECT employee_id, full_name, employee_code, email, department, job_title, city, person_document, "
+        "person_document || to_tsvector('simple', department || ' ' || job_title || ' ' || city) "
+        "FROM (SELECT x.*, "
+        "setweight(to_tsvector('simple', full_name || ' ' || employee_code), 'A') || "
+        "setweight(to_tsvector('simple', translate(email_name, '._-', '   ')), 'B') AS person_document "
+        "FROM ({}) x) y".format(SOURCE_SQL.format(email_name="split_part(u.email, '@', 1)")),
+    ],
+}
+
+DROP_SQL = {
+    "sqlite": [
+        "DROP TABLE IF EXISTS employees_search_people",
+        "DROP TABLE IF EXISTS employees_search_fts",
+        "DROP TABLE IF EXISTS employees_search",
+    ],
+    "postgresql": ["DROP TABLE IF EXISTS employees_search"],
+}
+
+
+def create_search_index(apps, schema_editor):
+    """Vendor-specific full-text index, filled from the current employees"""
+    for sql in CREATE_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in DROP_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("employees", "0003_reporting_line"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -103,9 +103,46 @@ class Employee(TimeStampedModel):
             return today.year - self.date_of_birth.year - ((today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day))
         return None
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored manager so reporting lines move only on change
+        if 'manager_id' in field_names:
+            instance._loaded_manager_id = instance.manager_id
+        return instance
+    
     class Meta:
         db_table = 'employees_employee'
 
+class ReportingLine(models.Model):
+    """
+    Closure table of the reporting hierarchy: one row per (manager at any
+    level, report) pair, including each employee with itself at depth 0
+    """
+    ancestor = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='descendant_lines', db_index=False)
+    descendant = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='ancestor_lines')
+    depth = models.PositiveIntegerField()
+    
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+    
+    class Meta:
+        db_table = 'employees_reporting_line'
+        # Also serves lookups by ancestor, so that FK has no index of its own
+        unique_together = ['ancestor', 'descendant']
+
+class OnboardingUpload(TimeStampedModel):
+    """
+    Rows of a bulk_onboard upload waiting for its Celery task. Only the id
+    goes through the broker, so passwords stay in the database, and the
+    task empties `rows` once it has run. The id doubles as the task id.
+    """
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='onboarding_uploads')
+    rows = models.JSONField(default=list)
+
+    class Meta:
+        db_table = 'employees_onboarding_upload'
+
 class EmployeeDocument(TimeStampedModel):
     """
     Employee documents storage
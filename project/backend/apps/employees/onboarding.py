@@ -0,0 +1,267 @@
+"""
+Bulk employee onboarding
+Validates a whole upload before writing anything, hashes the passwords (in a
+process pool for the import command) and creates users and employees with
+bulk_create in chunks; problems are reported per row instead of failing the
+batch.
+"""
+import csv
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from apps.core.models import Department, JobTitle
+from apps.core.utils import chunked
+from .hierarchy import add_many_to_hierarchy
+from .models import Employee
+from .search import index_employees
+from .serializers import EmployeeOnboardingSerializer
+
+User = get_user_model()
+
+REQUIRED_COLUMNS = ('username', 'email', 'first_name', 'last_name', 'password', 'employee_id', 'date_of_joining')
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name', 'role')
+# Keep IN (...) lists well below the SQLite bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+# Uploads through the API are onboarded by a Celery task hashing in one
+# process; the import_employees command takes larger files
+MAX_UPLOAD_ROWS = 500
+CHUNK_SIZE = 500
+
+
+def read_rows(data, file_format):
+    """
+    Row dicts from the bytes of a CSV file or a JSON list of objects. CSV
+    headers are lower-cased and blank cells dropped so field defaults apply.
+    Raises ValueError for an unreadable file or missing CSV columns.
+    """
+    text = data.decode('utf-8-sig')
+    if file_format == 'json':
+        rows = json.loads(text)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError('A JSON upload must be a list of objects')
+        return rows
+
+    try:
+        reader = csv.DictReader(io.StringIO(text, newline=''))
+        reader.fieldnames = [column.strip().lower() for column in reader.fieldnames or []]
+        missing = [column for column in REQUIRED_COLUMNS if column not in reader.fieldnames]
+        if missing:
+            raise ValueError(f"Missing CSV columns: {', '.join(missing)}")
+        return [
+            {
+                column: value.strip() for column, value in row.items()
+                if column and isinstance(value, str) and value.strip()
+            }
+            for row in reader
+        ]
+    except csv.Error as error:
+        raise ValueError(f'Unreadable CSV: {error}')
+
+
+def _fail(result, field, message):
+    result['status'] = 'error'
+    result.setdefault('errors', {}).setdefault(field, []).append(message)
+
+
+def _taken(model, field, values):
+    """The values of `field` already stored, looked up in chunks"""
+    taken = set()
+    for chunk in chunked(set(values), LOOKUP_CHUNK_SIZE):
+        taken.update(model.objects.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+    return taken
+
+
+def validate_rows(rows):
+    """
+    Validate every row, then check uniqueness, related records and in-file
+    managers across the batch. Returns (results, valid): a result dict per
+    row, and (result, validated_data) for valid rows with managers first.
+    """
+    results, valid = [], []
+    # One instance for every row, as ListSerializer does, so the fields
+    # are built once
+    serializer = EmployeeOnboardingSerializer()
+    for number, row in enumerate(rows, start=1):
+        result = {'row': number, 'employee_id': row.get('employee_id'), 'status': None}
+        results.append(result)
+        try:
+            valid.append((result, serializer.run_validation(row)))
+        except ValidationError as error:
+            result.update(status='error', errors=error.detail)
+
+    # Unique within the file and against the stored records
+    for field, model, label in (
+        ('username', User, 'username'), ('email', User, 'email'), ('employee_id', Employee, 'employee ID'),
+    ):
+        taken = _taken(model, field, [data[field] for _, data in valid])
+        seen = set()
+        for result, data in valid:
+            value = data[field]
+            if value in taken:
+                _fail(result, field, f'An account with this {label} already exists')
+            elif value in seen:
+                _fail(result, field, f'This {label} appears more than once in the file')
+            seen.add(value)
+
+    for field, model, label in (
+        ('department_id', Department, 'department'), ('job_title_id', JobTitle, 'job title'),
+        ('manager_id', Employee, 'manager'),
+    ):
+        found = _taken(model, 'pk', [data[field] for _, data in valid if data.get(field)])
+        for result, data in valid:
+            if data.get(field) and data[field] not in found:
+                _fail(result, field.replace('_id', ''), f'No {label} with this id')
+
+    failed_codes = {result['employee_id'] for result in results if result['status'] == 'error'}
+    valid = [(result, data) for result, data in valid if result['status'] is None]
+    return results, _managers_first(valid, failed_codes)
+
+
+def _managers_first(valid, failed_codes):
+    """
+    Resolve manager_employee_id codes of stored employees to manager_id and
+    order the rows so an in-file manager comes before their reports. Rows
+    whose manager row failed, or that report to each other in a loop,
+    become errors.
+    """
+    in_file = {data['employee_id']: (result, data) for result, data in valid}
+    codes = {data['manager_employee_id'] for _, data in valid if data.get('manager_employee_id')}
+    stored = {}
+    for chunk in chunked(codes - in_file.keys(), LOOKUP_CHUNK_SIZE):
+        stored.update(Employee.objects.filter(employee_id__in=chunk).values_list('employee_id', 'id'))
+
+    ordered, placed = [], set()
+    for _, data in valid:
+        # Walk up the in-file managers and place them top-down
+        chain, code = [], data['employee_id']
+        while code in in_file and code not in placed and code not in chain:
+            chain.append(code)
+            code = in_file[code][1].get('manager_employee_id')
+        loop_start = chain.index(code) if code in chain else len(chain)
+        for position in reversed(range(len(chain))):
+            placed.add(chain[position])
+            row_result, row_data = in_file[chain[position]]
+            manager_code = row_data.get('manager_employee_id')
+            if position >= loop_start:
+                _fail(row_result, 'manager_employee_id', 'Managers in the file report to each other in a loop')
+            elif manager_code in in_file:
+                if in_file[manager_code][0]['status'] == 'error':
+                    _fail(row_result, 'manager_employee_id', f'Manager {manager_code} could not be onboarded')
+            elif manager_code in stored:
+                row_data['manager_id'] = stored[row_data.pop('manager_employee_id')]
+            elif manager_code in failed_codes:
+                _fail(row_result, 'manager_employee_id', f'Manager {manager_code} could not be onboarded')
+            elif manager_code:
+                _fail(row_result, 'manager_employee_id', 'No employee or row with this employee ID')
+            if row_result['status'] is None:
+                ordered.append((row_result, row_data))
+    return ordered
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    make_password for each password, spread over `workers` processes: every
+    hash is deliberately slow and keeps a core busy while it runs. Only the
+    import command forks; a threaded server or a Celery worker must not.
+    """
+    workers = min(workers, len(passwords))
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+
+def _build(data, password_hash, employee_ids):
+    """Unsaved User and Employee for a validated row"""
+    data = dict(data)
+    data.pop('password')
+    user = User(password=password_hash, **{field: data.pop(field) for field in USER_FIELDS if field in data})
+    manager_code = data.pop('manager_employee_id', None)
+    if manager_code:
+        data['manager_id'] = employee_ids[manager_code]
+    return user, Employee(pk=employee_ids[data['employee_id']], user=user, **data)
+
+
+def _write(entries):
+    """Create the chunk's users and employees with their reporting lines and search rows"""
+    with transaction.atomic():
+        User.objects.bulk_create([user for _, user, _ in entries])
+        employees = Employee.objects.bulk_create([employee for _, _, employee in entries])
+        # bulk_create sends no post_save, which maintains these for single saves
+        add_many_to_hierarchy([(employee.pk, employee.manager_id) for employee in employees])
+        index_employees([employee.pk for employee in employees])
+
+
+def onboard_employees(rows, chunk_size=CHUNK_SIZE, workers=1, dry_run=False):
+    """
+    Validate every row, then create the valid ones `chunk_size` to a
+    transaction. Returns one result dict per row, in input order, with a
+    status of 'created' (or 'valid' on a dry run) or 'error' and its errors.
+    """
+    results, valid = validate_rows(rows)
+    if dry_run:
+        for result, _ in valid:
+            result['status'] = 'valid'
+        return results
+
+    hashes = hash_passwords([data['password'] for _, data in valid], workers)
+    # Ids are generated up front so reports can point at a manager from the
+    # same file before either is saved
+    employee_ids = {data['employee_id']: Employee._meta.pk.get_default() for _, data in valid}
+    entries = [
+        (result, *_build(data, password_hash, employee_ids))
+        for (result, data), password_hash in zip(valid, hashes)
+    ]
+
+    failed = set()
+    for chunk in chunked(entries, chunk_size):
+        chunk = [entry for entry in chunk if not _manager_failed(entry, failed)]
+        try:
+            _write(chunk)
+        except IntegrityError:
+            # Someone else took a username, email or code since validation:
+            # save the chunk row by row to find out which
+            for entry in chunk:
+                if _manager_failed(entry, failed):
+                    continue
+                try:
+                    _write([entry])
+                except IntegrityError as error:
+                    _fail(entry[0], 'non_field_errors', f'Could not be saved: {error}')
+                    failed.add(entry[2].pk)
+                else:
+                    _created(entry)
+        else:
+            for entry in chunk:
+                _created(entry)
+    return results
+
+
+def _manager_failed(entry, failed):
+    result, _, employee = entry
+    if employee.manager_id in failed:
+        _fail(result, 'manager_employee_id', 'The manager could not be onboarded')
+        failed.add(employee.pk)
+        return True
+    return False
+
+
+def _created(entry):
+    result, _, employee = entry
+    result.update(status='created', id=employee.pk)
+
+
+def summarize(results, dry_run=False):
+    """Counts and row results of an onboarding run, as the API returns them"""
+    errors = sum(1 for result in results if result['status'] == 'error')
+    return {
+        'valid' if dry_run else 'created': len(results) - errors,
+        'errors': errors,
+        'results': results,
+    }
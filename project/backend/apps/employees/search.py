@@ -0,0 +1,240 @@
+"""
+Employee directory search
+A full-text index over name, employee code, email, department, job title
+and city of active employees: FTS5 on SQLite, tsvector + GIN on PostgreSQL.
+Rows are rewritten from the source tables with one INSERT ... SELECT.
+"""
+import re
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+from apps.core.utils import chunked
+from .models import Employee
+
+RESULT_COLUMNS = ['employee_id', 'full_name', 'employee_code', 'email', 'department', 'job_title', 'city']
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 50
+TYPEAHEAD_MIN_LENGTH = 2
+# Prefix tokens taken from a query; the rest are ignored
+MAX_QUERY_TOKENS = 6
+# Keep IN (...) lists well below the SQLite bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+# Index rows from the employee and its user, department and job title.
+# email_name is the address before the @: the company domain is shared by
+# everyone and would match every row.
+_SOURCE_SQL = (
+    "SELECT e.id AS employee_id, TRIM(u.first_name || ' ' || u.last_name) AS full_name, "
+    "e.employee_id AS employee_code, u.email AS email, {email_name} AS email_name, "
+    "COALESCE(d.name, '') AS department, COALESCE(j.title, '') AS job_title, e.city AS city "
+    "FROM employees_employee e "
+    "JOIN accounts_user u ON u.id = e.user_id "
+    "LEFT JOIN core_department d ON d.id = e.department_id "
+    "LEFT JOIN core_job_title j ON j.id = e.job_title_id "
+    "WHERE e.employment_status = 'ACTIVE' {{where}}"
+)
+_RESULTS = ', '.join(RESULT_COLUMNS)
+
+# `employees_search` holds one row per employee on both backends, with a
+# full-text index over every column and one over the name, code and email
+# alone; `key` is what the match queries return. On SQLite the FTS5 tables
+# index it as external content, kept in step by triggers from the migration.
+VENDOR_SQL = {
+    'sqlite': {
+        'key': 'id',
+        'insert': (
+            "INSERT INTO employees_search (employee_id, full_name, employee_code, email, email_name, "
+            "department, job_title, city) SELECT * FROM ({source}) x"
+        ).format(source=_SOURCE_SQL.format(email_name="substr(u.email, 1, instr(u.email, '@') - 1)")),
+        # Weights follow the columns: name, employee code, email name
+        'people': (
+            "SELECT rowid FROM employees_search_people WHERE employees_search_people MATCH %s "
+            "ORDER BY bm25(employees_search_people, 10, 10, 4), rowid LIMIT %s"
+        ),
+        'anything': "SELECT rowid FROM employees_search_fts WHERE employees_search_fts MATCH %s LIMIT %s",
+        # The unary + keeps the planner on the scope's employee_id index
+        # rather than looking up every full-text match by rowid
+        'scoped_people': (
+            "SELECT id FROM employees_search WHERE employee_id IN ({scope}) AND +id IN ("
+            "SELECT rowid FROM employees_search_people WHERE employees_search_people MATCH %s"
+            ") ORDER BY full_name LIMIT %s"
+        ),
+        'scoped_anything': (
+            "SELECT id FROM employees_search WHERE employee_id IN ({scope}) AND +id IN ("
+            "SELECT rowid FROM employees_search_fts WHERE employees_search_fts MATCH %s"
+            ") ORDER BY full_name LIMIT %s"
+        ),
+        'employee_ids': (
+            "SELECT employee_id FROM employees_search WHERE id IN ("
+            "SELECT rowid FROM employees_search_fts WHERE employees_search_fts MATCH %s)"
+        ),
+    },
+    'postgresql': {
+        'key': 'employee_id',
+        'insert': (
+            "INSERT INTO employees_search (employee_id, full_name, employee_code, email, department, "
+            "job_title, city, person_document, document) "
+            "SELECT employee_id, full_name, employee_code, email, department, job_title, city, person_document, "
+            "person_document || to_tsvector('simple', department || ' ' || job_title || ' ' || city) "
+            "FROM (SELECT x.*, "
+            "setweight(to_tsvector('simple', full_name || ' ' || employee_code), 'A') || "
+            "setweight(to_tsvector('simple', translate(email_name, '._-', '   ')), 'B') AS person_document "
+            "FROM ({source}) x) y"
+        ).format(source=_SOURCE_SQL.format(email_name="split_part(u.email, '@', 1)")),
+        'people': (
+            "SELECT employee_id FROM employees_search, to_tsquery('simple', %s) query "
+            "WHERE person_document @@ query ORDER BY ts_rank(person_document, query) DESC, employee_id LIMIT %s"
+        ),
+        'anything': "SELECT employee_id FROM employees_search WHERE document @@ to_tsquery('simple', %s) LIMIT %s",
+        'scoped_people': (
+            "SELECT employee_id FROM employees_search WHERE employee_id IN ({scope}) "
+            "AND person_document @@ to_tsquery('simple', %s) ORDER BY full_name LIMIT %s"
+        ),
+        'scoped_anything': (
+            "SELECT employee_id FROM employees_search WHERE employee_id IN ({scope}) "
+            "AND document @@ to_tsquery('simple', %s) ORDER BY full_name LIMIT %s"
+        ),
+        'employee_ids': "SELECT employee_id FROM employees_search WHERE document @@ to_tsquery('simple', %s)",
+    },
+}
+
+
+def search_supported():
+    return connection.vendor in VENDOR_SQL
+
+
+def query_tokens(text):
+    """Lower-cased word tokens of a search box value; an email's domain is dropped"""
+    text = re.sub(r'@\S*', ' ', text or '')
+    return re.findall(r'\w+', text.lower())[:MAX_QUERY_TOKENS]
+
+
+def _match_expression(tokens):
+    """Every token must start some indexed word"""
+    if connection.vendor == 'sqlite':
+        return ' '.join(f'"{token}"*' for token in tokens)
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def index_employees(employee_ids=None):
+    """
+    Rewrite the index rows of the given employees (all when None). Inactive
+    or deleted employees just lose their row.
+    """
+    if not search_supported():
+        return
+    insert = VENDOR_SQL[connection.vendor]['insert']
+    with connection.cursor() as cursor:
+        if employee_ids is None:
+            cursor.execute("DELETE FROM employees_search")
+            cursor.execute(insert.format(where=''))
+            return
+        adapt = Employee._meta.pk.get_db_prep_value
+        for chunk in chunked(set(employee_ids), LOOKUP_CHUNK_SIZE):
+            params = [adapt(employee_id, connection) for employee_id in chunk]
+            placeholders = ', '.join(['%s'] * len(params))
+            cursor.execute(f"DELETE FROM employees_search WHERE employee_id IN ({placeholders})", params)
+            cursor.execute(insert.format(where=f"AND e.id IN ({placeholders})"), params)
+
+
+def index_employees_where(**filters):
+    """Reindex the employees matching Employee queryset filters"""
+    index_employees(Employee.objects.filter(**filters).values_list('id', flat=True))
+
+
+def typeahead(text, scope=None, limit=TYPEAHEAD_LIMIT):
+    """
+    Up to `limit` active employees with every word of `text` starting a word
+    of their record. Name, code and email matches come first, best ranked
+    first; department, job title and city values are shared by many people,
+    so matches on those alone fill the remaining places unranked. `scope` is
+    an optional Employee queryset the matches must fall in, listed by name.
+    """
+    tokens = query_tokens(text)
+    if sum(map(len, tokens)) < TYPEAHEAD_MIN_LENGTH:
+        return []
+    if not search_supported():
+        return _typeahead_fallback(tokens, scope, limit)
+
+    sql = VENDOR_SQL[connection.vendor]
+    match = _match_expression(tokens)
+    keys = []
+    with connection.cursor() as cursor:
+        for tier in ('people', 'anything'):
+            if scope is None:
+                query, params = sql[tier], [match, limit]
+            else:
+                subquery, scope_params = scope.values('pk').query.sql_with_params()
+                query, params = sql[f'scoped_{tier}'].format(scope=subquery), [*scope_params, match, limit]
+            cursor.execute(query, params)
+            seen = set(keys)
+            keys.extend(key for (key,) in cursor.fetchall() if key not in seen)
+            keys = keys[:limit]
+            if len(keys) == limit:
+                break
+        if not keys:
+            return []
+        cursor.execute(
+            f"SELECT {_RESULTS}, {sql['key']} FROM employees_search "
+            f"WHERE {sql['key']} IN ({', '.join(['%s'] * len(keys))})",
+            keys,
+        )
+        rows = {row[-1]: row[:-1] for row in cursor.fetchall()}
+
+    pk = Employee._meta.pk
+    results = []
+    for key in keys:
+        employee_id, full_name, employee_code, email, department, job_title, city = rows[key]
+        results.append({
+            'id': pk.to_python(employee_id),
+            'employee_id': employee_code,
+            'full_name': full_name,
+            'email': email,
+            'department_name': department or None,
+            'job_title_name': job_title or None,
+            'city': city,
+        })
+    return results
+
+
+def _typeahead_fallback(tokens, scope, limit):
+    queryset = scope if scope is not None else Employee.objects.filter(employment_status='ACTIVE')
+    queryset = queryset.filter(search_q(tokens)).select_related('user', 'department', 'job_title')
+    return [
+        {
+            'id': employee.id,
+            'employee_id': employee.employee_id,
+            'full_name': employee.full_name,
+            'email': employee.user.email,
+            'department_name': employee.department.name if employee.department else None,
+            'job_title_name': employee.job_title.title if employee.job_title else None,
+            'city': employee.city,
+        }
+        for employee in queryset.order_by('user__first_name', 'user__last_name')[:limit]
+    ]
+
+
+def search_q(tokens):
+    """Q for Employee querysets matching every token; uses the index when there is one"""
+    if search_supported():
+        return Q(pk__in=RawSQL(VENDOR_SQL[connection.vendor]['employee_ids'], [_match_expression(tokens)]))
+    q = Q()
+    for token in tokens:
+        q &= (
+            Q(user__first_name__istartswith=token) | Q(user__last_name__istartswith=token)
+            | Q(employee_id__istartswith=token) | Q(user__email__istartswith=token)
+            | Q(department__name__istartswith=token) | Q(job_title__title__istartswith=token)
+            | Q(city__istartswith=token)
+        )
+    return q
+
+
+class EmployeeSearchFilter(SearchFilter):
+    """?search= on employee lists, answered from the index instead of LIKE scans"""
+
+    def filter_queryset(self, request, queryset, view):
+        tokens = query_tokens(request.query_params.get(self.search_param, ''))
+        if not tokens:
+            return queryset
+        return queryset.filter(search_q(tokens))
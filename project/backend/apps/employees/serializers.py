@@ -3,11 +3,16 @@ Employee serializers
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
 from .models import (
     Employee, EmployeeDocument, EmploymentHistory, 
     SkillSet, EducationRecord
 )
 from apps.accounts.serializers import UserSerializer
+from .hierarchy import reports_to
+from .skill_index import parse_query
+from apps.core.models import Department, JobTitle
+from apps.core.reference_data import ReferenceField
 from apps.core.serializers import DepartmentSerializer, JobTitleSerializer
 
 User = get_user_model()
@@ -19,14 +24,23 @@ class EmployeeSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     full_name = serializers.CharField(read_only=True)
     age = serializers.IntegerField(read_only=True)
-    department_name = serializers.CharField(source='department.name', read_only=True)
-    job_title_name = serializers.CharField(source='job_title.title', read_only=True)
+    department_name = ReferenceField(Department, 'name', source='department_id')
+    job_title_name = ReferenceField(JobTitle, 'title', source='job_title_id')
     manager_name = serializers.CharField(source='manager.full_name', read_only=True)
     
     class Meta:
         model = Employee
         fields = '__all__'
         read_only_fields = ['id', 'created_at', 'updated_at', 'user']
+    
+    @staticmethod
+    def setup_queryset(queryset):
+        return queryset.select_related('user', 'manager__user')
+    
+    def validate_manager(self, manager):
+        if manager and self.instance and reports_to(manager.pk, self.instance.pk):
+            raise serializers.ValidationError("An employee cannot report to someone in their own reporting tree")
+        return manager
 
 class EmployeeCreateSerializer(serializers.ModelSerializer):
     """
@@ -64,24 +78,53 @@ class EmployeeCreateSerializer(serializers.ModelSerializer):
         }
         password = validated_data.pop('password')
 
-        # Create user
-        user = User.objects.create_user(**user_data)
-        user.set_password(password)
-        user.save()
+        # Create user (create_user hashes the password once)
+        user = User.objects.create_user(password=password, **user_data)
 
         # Create employee
         employee = Employee.objects.create(user=user, **validated_data)
         return employee
 
 
+class EmployeeOnboardingSerializer(EmployeeCreateSerializer):
+    """
+    One row of a bulk onboarding upload. Related records, uniqueness and
+    in-file managers are checked for the whole batch at once, so a row
+    validates without queries.
+    """
+    username = serializers.CharField(write_only=True, max_length=150)
+    first_name = serializers.CharField(write_only=True, max_length=150)
+    last_name = serializers.CharField(write_only=True, max_length=150)
+    department = serializers.UUIDField(source='department_id', required=False, allow_null=True)
+    job_title = serializers.UUIDField(source='job_title_id', required=False, allow_null=True)
+    manager = serializers.UUIDField(source='manager_id', required=False, allow_null=True)
+    # A manager by employee code: an existing employee or another row
+    manager_employee_id = serializers.CharField(required=False, max_length=20)
+
+    class Meta(EmployeeCreateSerializer.Meta):
+        fields = EmployeeCreateSerializer.Meta.fields + ['manager_employee_id']
+        extra_kwargs = {'employee_id': {'validators': []}}
+
+    def validate_username(self, value):
+        return User.normalize_username(value)
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+    def validate(self, attrs):
+        if attrs.get('manager_id') and attrs.get('manager_employee_id'):
+            raise serializers.ValidationError({'manager': 'Give either manager or manager_employee_id'})
+        return attrs
+
+
 class EmployeeListSerializer(serializers.ModelSerializer):
     """
     Simplified employee serializer for list views
     """
     full_name = serializers.CharField(read_only=True)
     email = serializers.CharField(source='user.email', read_only=True)
-    department_name = serializers.CharField(source='department.name', read_only=True)
-    job_title_name = serializers.CharField(source='job_title.title', read_only=True)
+    department_name = ReferenceField(Department, 'name', source='department_id')
+    job_title_name = ReferenceField(JobTitle, 'title', source='job_title_id')
     manager_name = serializers.CharField(source='manager.full_name', read_only=True)
     
     class Meta:
@@ -91,6 +134,10 @@ class EmployeeListSerializer(serializers.ModelSerializer):
             'job_title_name', 'manager_name', 'employment_status',
             'employment_type', 'date_of_joining'
         ]
+    
+    @staticmethod
+    def setup_queryset(queryset):
+        return queryset.select_related('user', 'manager__user')
 
 class EmployeeDocumentSerializer(serializers.ModelSerializer):
     """
@@ -109,8 +156,8 @@ class EmploymentHistorySerializer(serializers.ModelSerializer):
     Employment history serializer
     """
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
-    department_name = serializers.CharField(source='department.name', read_only=True)
-    job_title_name = serializers.CharField(source='job_title.title', read_only=True)
+    department_name = ReferenceField(Department, 'name', source='department_id')
+    job_title_name = ReferenceField(JobTitle, 'title', source='job_title_id')
     manager_name = serializers.CharField(source='manager.full_name', read_only=True)
     
     class Meta:
@@ -157,4 +204,36 @@ class EmployeeDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Employee
         fields = '__all__'
-        read_only_fields = ['id', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    @staticmethod
+    def setup_queryset(queryset):
+        """
+        One query for the employee and one per nested list, whatever the
+        team size. Nested rows get their `employee` (or `manager`) set to the
+        profile by the prefetch; department and job title names come from
+        the reference cache.
+        """
+        return queryset.select_related(
+            'user', 'department__head__user', 'job_title', 'manager__user', 'manager__manager__user'
+        ).prefetch_related(
+            Prefetch('team_members', queryset=Employee.objects.select_related('user')),
+            Prefetch('documents', queryset=EmployeeDocument.objects.select_related('verified_by')),
+            Prefetch('employment_history', queryset=EmploymentHistory.objects.select_related('manager__user')),
+            'skills',
+            'education',
+        )
+
+class TalentSearchSerializer(serializers.Serializer):
+    """
+    Skill query across employees: a term {"skill", "min_level", "certified",
+    "min_years"} or nested {"all": [...]} / {"any": [...]} groups
+    """
+    query = serializers.JSONField()
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
+
+    def validate_query(self, value):
+        try:
+            return parse_query(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
@@ -0,0 +1,117 @@
+"""
+Employee signal handlers
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from apps.core.models import Department, JobTitle
+from .hierarchy import add_to_hierarchy, check_manager, move_subtree
+from .models import Employee, SkillSet
+from .search import index_employees, index_employees_where
+from .skill_index import skills_changed
+
+User = get_user_model()
+# Fields copied into the search index
+SEARCH_USER_FIELDS = {'first_name', 'last_name', 'email'}
+SEARCH_EMPLOYEE_FIELDS = {'employee_id', 'department', 'job_title', 'city', 'employment_status'}
+
+
+@receiver(pre_save, sender=Employee)
+def employee_manager_check(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    if hasattr(instance, '_loaded_manager_id'):
+        changed = instance.manager_id != instance._loaded_manager_id
+    else:
+        # Loaded without the manager column: check any manager set since,
+        # before the row is written
+        changed = 'manager_id' not in instance.get_deferred_fields()
+    if changed:
+        check_manager(instance, instance.manager_id)
+
+
+@receiver(post_save, sender=Employee)
+def employee_reporting_lines(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        add_to_hierarchy(instance.pk, instance.manager_id)
+    elif not hasattr(instance, '_loaded_manager_id'):
+        # Loaded without the manager column: compare with the stored lines
+        current = instance.ancestor_lines.filter(depth=1).values_list('ancestor_id', flat=True).first()
+        if current != instance.manager_id:
+            move_subtree(instance.pk, instance.manager_id)
+    elif instance._loaded_manager_id != instance.manager_id:
+        move_subtree(instance.pk, instance.manager_id)
+    instance._loaded_manager_id = instance.manager_id
+
+
+@receiver(pre_delete, sender=Employee)
+def employee_leaving_hierarchy(sender, instance, **kwargs):
+    # Direct reports lose their manager through SET_NULL, which sends no
+    # signals, so detach their subtrees from the managers above first
+    for report_id in Employee.objects.filter(manager_id=instance.pk).values_list('id', flat=True):
+        move_subtree(report_id, None)
+
+
+@receiver(post_save, sender=Employee)
+def employee_search_document(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not SEARCH_EMPLOYEE_FIELDS & set(update_fields)):
+        return
+    index_employees([instance.pk])
+
+
+@receiver(post_delete, sender=Employee)
+def employee_search_removed(sender, instance, **kwargs):
+    index_employees([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def user_search_documents(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Logins save last_login alone; only name and email changes matter
+    if raw or (update_fields is not None and not SEARCH_USER_FIELDS & set(update_fields)):
+        return
+    index_employees_where(user_id=instance.pk)
+
+
+@receiver(post_save, sender=Department)
+def department_search_documents(sender, instance, created, raw=False, **kwargs):
+    if not (raw or created):
+        index_employees_where(department_id=instance.pk)
+
+
+@receiver(post_save, sender=JobTitle)
+def job_title_search_documents(sender, instance, created, raw=False, **kwargs):
+    if not (raw or created):
+        index_employees_where(job_title_id=instance.pk)
+
+
+@receiver(pre_delete, sender=Department)
+@receiver(pre_delete, sender=JobTitle)
+def reference_search_collect(sender, instance, **kwargs):
+    # Employees lose the link through SET_NULL without signals
+    field = 'department_id' if sender is Department else 'job_title_id'
+    instance._search_employee_ids = list(
+        Employee.objects.filter(**{field: instance.pk}).values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=JobTitle)
+def reference_search_documents(sender, instance, **kwargs):
+    index_employees(getattr(instance, '_search_employee_ids', []))
+
+
+@receiver(post_save, sender=SkillSet)
+@receiver(post_delete, sender=SkillSet)
+def skill_index_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        skills_changed([instance.employee_id])
+
+
+@receiver(post_save, sender=Employee)
+def employee_skill_index_status(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Only active employees are indexed
+    if raw or created or (update_fields is not None and 'employment_status' not in update_fields):
+        return
+    skills_changed([instance.pk])
@@ -0,0 +1,331 @@
+"""
+In-memory inverted index of employee skills
+Maps each normalised skill name to a posting list of the active employees
+holding it, so boolean talent queries across the company need no query.
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from apps.core.cache import IncrementalLocalCache, record_changes_on_commit
+from apps.core.models import Department, JobTitle
+from apps.core.reference_data import get_reference
+from .models import Employee, SkillSet
+
+NAMESPACE = 'employees.skill_index'
+LEVELS = [level for level, _ in SkillSet.PROFICIENCY_LEVELS]
+LEVEL_RANK = {level: rank for rank, level in enumerate(LEVELS)}
+# Posting masks: bit n is set when the proficiency is at least LEVELS[n]
+CERTIFIED = 1 << len(LEVELS)
+# Years of experience beyond this add nothing to the score
+SCORE_YEARS_CAP = 10
+MAX_QUERY_TERMS = 20
+MAX_QUERY_DEPTH = 4
+
+
+def _entry_score(mask):
+    """Proficiency rank from 1, plus one when certified"""
+    return (mask & (CERTIFIED - 1)).bit_length() + (1 if mask & CERTIFIED else 0)
+
+
+ENTRY_SCORES = [_entry_score(mask) for mask in range(CERTIFIED * 2)]
+
+
+def normalize_skill(name):
+    return ' '.join(name.casefold().split())
+
+
+def skill_mask(level, certified):
+    mask = (1 << (LEVEL_RANK[level] + 1)) - 1
+    return mask | CERTIFIED if certified else mask
+
+
+class Posting:
+    """
+    Holders of one skill: ascending employee numbers with a proficiency
+    mask and years of experience alongside each.
+    """
+    __slots__ = ('numbers', 'masks', 'years')
+
+    def __init__(self, entries):
+        entries = sorted(entries)
+        self.numbers = array('I', [number for number, _, _ in entries])
+        self.masks = array('B', [mask for _, mask, _ in entries])
+        self.years = array('H', [min(max(years, 0), 0xFFFF) for _, _, years in entries])
+
+    def entries(self):
+        return zip(self.numbers, self.masks, self.years)
+
+    def matching(self, required_mask, min_years):
+        if required_mask == 1 and not min_years:
+            return set(self.numbers)
+        return {
+            number for number, mask, years in self.entries()
+            if mask & required_mask == required_mask and years >= min_years
+        }
+
+    def entry(self, number):
+        position = bisect_left(self.numbers, number)
+        if position < len(self.numbers) and self.numbers[position] == number:
+            return self.masks[position], self.years[position]
+        return None
+
+    def lookup(self, numbers):
+        """Entries of the given employee numbers that hold the skill"""
+        for number in numbers:
+            entry = self.entry(number)
+            if entry is not None:
+                yield (number, *entry)
+
+    def patched(self, removed, added):
+        """
+        Copy without the `removed` employee numbers and with `added`
+        (number, mask, years) entries; None when nothing is left
+        """
+        posting = Posting.__new__(Posting)
+        posting.numbers = array('I', self.numbers)
+        posting.masks = array('B', self.masks)
+        posting.years = array('H', self.years)
+        for number in removed:
+            position = bisect_left(posting.numbers, number)
+            if position < len(posting.numbers) and posting.numbers[position] == number:
+                del posting.numbers[position], posting.masks[position], posting.years[position]
+        for number, mask, years in added:
+            position = bisect_left(posting.numbers, number)
+            posting.numbers.insert(position, number)
+            posting.masks.insert(position, mask)
+            posting.years.insert(position, min(max(years, 0), 0xFFFF))
+        return posting if posting.numbers else None
+
+
+class SkillIndex:
+    """
+    Employees are numbered densely in the order first seen so postings hold
+    small integers; numbers are never reused while the index lives.
+    """
+
+    def __init__(self):
+        self.employee_ids = []
+        self.numbers = {}
+        self.postings = {}
+        self.skill_names = {}
+        self.employee_skills = {}
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        index.add_rows(_skill_rows(SkillSet.objects.all()))
+        return index
+
+    def number(self, employee_id):
+        number = self.numbers.get(employee_id)
+        if number is None:
+            number = self.numbers[employee_id] = len(self.employee_ids)
+            self.employee_ids.append(employee_id)
+        return number
+
+    def _read(self, rows):
+        """Entries per skill from (employee_id, skill_name, level, years, certified) rows"""
+        entries = defaultdict(list)
+        skills = defaultdict(list)
+        for employee_id, skill_name, level, years, certified in rows:
+            skill = normalize_skill(skill_name)
+            number = self.number(employee_id)
+            entries[skill].append((number, skill_mask(level, certified), years))
+            skills[number].append(skill)
+            self.skill_names.setdefault(skill, skill_name.strip())
+        for number, held in skills.items():
+            self.employee_skills[number] = tuple(held)
+        return entries
+
+    def add_rows(self, rows):
+        for skill, entries in self._read(rows).items():
+            self.postings[skill] = Posting(entries)
+
+    def update(self, employee_ids):
+        """Re-read the skills of the given employees and patch their postings"""
+        removed = defaultdict(list)
+        for employee_id in employee_ids:
+            number = self.numbers.get(employee_id)
+            for skill in self.employee_skills.pop(number, ()):
+                removed[skill].append(number)
+        added = self._read(_skill_rows(SkillSet.objects.filter(employee_id__in=list(employee_ids))))
+        # Swap in whole postings so concurrent readers never see half an update
+        for skill in removed.keys() | added.keys():
+            current = self.postings.get(skill)
+            if current is None:
+                self.postings[skill] = Posting(added[skill])
+                continue
+            posting = current.patched(removed.get(skill, ()), added.get(skill, ()))
+            if posting is None:
+                del self.postings[skill]
+                self.skill_names.pop(skill, None)
+            else:
+                self.postings[skill] = posting
+
+    def evaluate(self, node):
+        """Employee numbers matching a parsed query"""
+        kind = node[0]
+        if kind == 'skill':
+            _, skill, required_mask, min_years = node
+            posting = self.postings.get(skill)
+            return posting.matching(required_mask, min_years) if posting else set()
+        matches = [self.evaluate(child) for child in node[1]]
+        if kind == 'any':
+            return set().union(*matches)
+        matches.sort(key=len)
+        return matches[0].intersection(*matches[1:])
+
+    def _entries(self, number, terms):
+        """(skill, mask, years) for each query term the employee meets"""
+        for skill, required_mask, min_years in terms:
+            posting = self.postings.get(skill)
+            entry = posting.entry(number) if posting else None
+            if entry is not None and entry[0] & required_mask == required_mask and entry[1] >= min_years:
+                yield skill, entry[0], entry[1]
+
+    def scores(self, numbers, terms):
+        """
+        Proficiency, capped years and certification summed over the terms
+        each employee meets; walks a posting once, or looks the employees up
+        in it when they are few
+        """
+        scores = dict.fromkeys(numbers, 0.0)
+        for skill, required_mask, min_years in terms:
+            posting = self.postings.get(skill)
+            if posting is None:
+                continue
+            entries = posting.lookup(scores) if len(scores) * 16 < len(posting.numbers) else posting.entries()
+            for number, mask, years in entries:
+                if mask & required_mask == required_mask and years >= min_years and number in scores:
+                    scores[number] += ENTRY_SCORES[mask] + min(years, SCORE_YEARS_CAP) / SCORE_YEARS_CAP
+        return scores
+
+    def matched_skills(self, number, terms):
+        return [
+            {
+                'skill_name': self.skill_names.get(skill, skill),
+                'proficiency_level': LEVELS[(mask & (CERTIFIED - 1)).bit_length() - 1],
+                'years_of_experience': years,
+                'is_certified': bool(mask & CERTIFIED),
+            }
+            for skill, mask, years in self._entries(number, terms)
+        ]
+
+    def search(self, query, limit, numbers=None):
+        """
+        (employee_id, score, matched skills) for the best `limit` matches of
+        a parsed query, optionally within a set of employee numbers
+        """
+        matches = self.evaluate(query)
+        if numbers is not None:
+            matches &= numbers
+        terms = list(_terms(query))
+        scores = self.scores(matches, terms)
+        best = heapq.nsmallest(limit, scores, key=lambda number: (-scores[number], number))
+        return [
+            (self.employee_ids[number], scores[number], self.matched_skills(number, terms))
+            for number in best
+        ]
+
+
+def _skill_rows(queryset):
+    return queryset.filter(employee__employment_status='ACTIVE').values_list(
+        'employee_id', 'skill_name', 'proficiency_level', 'years_of_experience', 'is_certified'
+    ).iterator()
+
+
+def _terms(node):
+    if node[0] == 'skill':
+        yield node[1:]
+    else:
+        for child in node[1]:
+            yield from _terms(child)
+
+
+def parse_query(data, depth=0):
+    """
+    Validate a talent query into ('skill', skill, mask, min_years),
+    ('all', [...]) and ('any', [...]) nodes. A term is
+    {"skill", "min_level"?, "certified"?, "min_years"?}; groups are
+    {"all": [...]} or {"any": [...]} and nest. Raises ValueError.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Each query node must be an object')
+    if depth > MAX_QUERY_DEPTH:
+        raise ValueError(f'Queries nest at most {MAX_QUERY_DEPTH} levels deep')
+    groups = [key for key in ('all', 'any') if key in data]
+    if groups:
+        if len(groups) > 1 or 'skill' in data:
+            raise ValueError('A query node is either a skill or one of "all" / "any"')
+        children = data[groups[0]]
+        if not isinstance(children, list) or not children:
+            raise ValueError(f'"{groups[0]}" must be a non-empty list')
+        node = (groups[0], [parse_query(child, depth + 1) for child in children])
+        if depth == 0 and sum(1 for _ in _terms(node)) > MAX_QUERY_TERMS:
+            raise ValueError(f'At most {MAX_QUERY_TERMS} skills per query')
+        return node
+
+    skill = normalize_skill(str(data.get('skill', '')))
+    if not skill:
+        raise ValueError('Each term needs a skill')
+    min_level = data.get('min_level', LEVELS[0])
+    if min_level not in LEVEL_RANK:
+        raise ValueError(f'min_level must be one of {", ".join(LEVELS)}')
+    certified = data.get('certified', False)
+    min_years = data.get('min_years', 0)
+    if not isinstance(certified, bool) or type(min_years) is not int or min_years < 0:
+        raise ValueError('certified must be true or false and min_years a whole number')
+    required_mask = 1 << LEVEL_RANK[min_level]
+    if certified:
+        required_mask |= CERTIFIED
+    return ('skill', skill, required_mask, min_years)
+
+
+_skill_index = IncrementalLocalCache(NAMESPACE, SkillIndex.build, SkillIndex.update)
+
+
+def get_skill_index():
+    return _skill_index.get()
+
+
+def skills_changed(employee_ids):
+    """Reindex these employees' skills in every worker once the transaction commits"""
+    record_changes_on_commit(NAMESPACE, employee_ids)
+
+
+def talent_search(query, limit, scope=None):
+    """
+    Best `limit` matches for a parsed query with their directory fields;
+    `scope` is an optional Employee queryset to stay within
+    """
+    index = get_skill_index()
+    numbers = None
+    if scope is not None:
+        numbers = {
+            index.numbers[employee_id] for employee_id in scope.values_list('id', flat=True)
+            if employee_id in index.numbers
+        }
+    results = index.search(query, limit, numbers)
+    employees = {
+        row['id']: row for row in Employee.objects.filter(
+            pk__in=[employee_id for employee_id, _, _ in results]
+        ).values('id', 'employee_id', 'user__first_name', 'user__last_name', 'department_id', 'job_title_id')
+    }
+    found = []
+    for employee_id, score, matched in results:
+        row = employees.get(employee_id)
+        if row is None:
+            continue
+        department = get_reference(Department, row['department_id'])
+        job_title = get_reference(JobTitle, row['job_title_id'])
+        found.append({
+            'id': employee_id,
+            'employee_id': row['employee_id'],
+            'full_name': f"{row['user__first_name']} {row['user__last_name']}".strip(),
+            'department_name': department.name if department else None,
+            'job_title_name': job_title.title if job_title else None,
+            'score': round(score, 2),
+            'skills': matched,
+        })
+    return found
@@ -0,0 +1,21 @@
+"""
+Employee background tasks
+"""
+from celery import shared_task
+from .models import OnboardingUpload
+from .onboarding import onboard_employees
+
+
+@shared_task
+def onboard_employees_task(upload_id):
+    """Onboard the rows of a stashed API upload; returns the per-row results"""
+    upload = OnboardingUpload.objects.get(pk=upload_id)
+    try:
+        results = onboard_employees(upload.rows)
+    finally:
+        # The rows hold plaintext passwords
+        OnboardingUpload.objects.filter(pk=upload_id).update(rows=[])
+    for result in results:
+        if 'id' in result:
+            result['id'] = str(result['id'])
+    return results
@@ -0,0 +1,404 @@
+from datetime import date
+from decimal import Decimal
+import random
+import uuid
+from unittest import mock
+from django.contrib.auth.hashers import check_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.accounts.models import User
+from apps.core.models import Organization, Department, JobTitle
+from apps.core.cache import bump_version
+from apps.core.query_budget import QueryCounter, query_budget
+from apps.core.reference_data import REFERENCE_MODELS
+from .hierarchy import ReportingCycle, add_many_to_hierarchy, move_subtree, rebuild_reporting_lines, reports_to
+from .models import (
+    Employee, ReportingLine, EmployeeDocument, EmploymentHistory, SkillSet, EducationRecord, OnboardingUpload,
+)
+from .onboarding import hash_passwords
+from .tasks import onboard_employees_task
+from .skill_index import NAMESPACE as SKILL_INDEX
+from .views import EmployeeViewSet
+
+
+def create_employee(code, role='EMPLOYEE', **fields):
+    user = User.objects.create_user(
+        email=f'{code.lower()}@example.com', username=code.lower(), password='secret',
+        first_name='Test', last_name=code, role=role,
+    )
+    return Employee.objects.create(user=user, employee_id=code, date_of_joining=date(2020, 1, 1), **fields)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class EmployeeProfileQueryTests(TestCase):
+
+    def setUp(self):
+        organization = Organization.objects.create(name='Acme')
+        self.department = Department.objects.create(name='Engineering', code='ENG', organization=organization)
+        self.job_title = JobTitle.objects.create(title='Engineer', department=self.department)
+        self.hr = create_employee('HR001', role='HR_MANAGER')
+        self.manager = create_employee('EMP001', department=self.department, job_title=self.job_title, manager=self.hr)
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.hr.user)
+
+    def add_team(self, size):
+        for number in range(size):
+            code = f'TM{Employee.objects.count():03d}'
+            create_employee(code, department=self.department, job_title=self.job_title, manager=self.manager)
+            EmployeeDocument.objects.create(
+                employee=self.manager, document_type='OTHER', title=code, verified_by=self.hr.user,
+            )
+            EmploymentHistory.objects.create(
+                employee=self.manager, department=self.department, job_title=self.job_title,
+                manager=self.hr, start_date=date(2020, 1, 1), salary=Decimal('1000.00'),
+            )
+            SkillSet.objects.create(employee=self.manager, skill_name=code, proficiency_level='EXPERT')
+            EducationRecord.objects.create(
+                employee=self.manager, education_level='BACHELOR', institution_name=code,
+                field_of_study='CS', start_date=date(2010, 1, 1),
+            )
+
+    def retrieve_profile(self, budget=6):
+        with query_budget(budget, 'employee profile') as counter:
+            response = self.client.get(f'/api/v1/employees/{self.manager.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response, counter.count
+
+    def test_profile_queries_do_not_grow_with_team_size(self):
+        self.add_team(2)
+        self.retrieve_profile(budget=8)  # plus the department and job title reference caches
+        response, small_team = self.retrieve_profile()
+        self.assertEqual(len(response.data['team_members']), 2)
+
+        self.add_team(10)
+        response, large_team = self.retrieve_profile()
+        self.assertEqual(len(response.data['team_members']), 12)
+        self.assertEqual(len(response.data['documents']), 12)
+        self.assertEqual(small_team, large_team)
+        self.assertEqual(response.data['team_members'][0]['manager_name'], self.manager.full_name)
+        self.assertEqual(response.data['employment_history'][0]['department_name'], 'Engineering')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """
+    Every budgeted action called as clients call it, over JWT, with the
+    caches it reads rebuilt first: the worst case must be the budget
+    """
+
+    def setUp(self):
+        organization = Organization.objects.create(name='Acme')
+        department = Department.objects.create(name='Engineering', code='ENG', organization=organization)
+        job_title = JobTitle.objects.create(title='Engineer', department=department)
+        self.hr = create_employee('HR001', role='HR_MANAGER')
+        self.lead = create_employee('TL001', role='TEAM_LEAD', manager=self.hr, department=department)
+        for number in range(3):
+            report = create_employee(f'EMP00{number}', manager=self.lead, department=department, job_title=job_title)
+            SkillSet.objects.create(employee=report, skill_name='Python', proficiency_level='EXPERT')
+
+    def worst_case(self, user, method, path, data=None):
+        for label in REFERENCE_MODELS:
+            bump_version(f'reference.{label.lower()}')
+        bump_version(SKILL_INDEX)
+        client = APIClient(SERVER_NAME='localhost')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = getattr(client, method)(path, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return counter.count
+
+    def test_budgets_match_the_worst_case(self):
+        calls = {
+            'list': ('get', '/api/v1/employees/', None),
+            'retrieve': ('get', f'/api/v1/employees/{self.lead.id}/', None),
+            'org_chart': ('get', '/api/v1/employees/org_chart/', {'root': str(self.lead.id)}),
+            'search': ('get', '/api/v1/employees/search/', {'q': 'test'}),
+            'talent_search': ('post', '/api/v1/employees/talent_search/', {'query': {'skill': 'python'}}),
+        }
+        self.assertEqual(set(calls), set(EmployeeViewSet.query_budgets))
+        for action, call in calls.items():
+            # Profiles are opened by HR and by the employees themselves
+            users = [self.hr.user] if action == 'retrieve' else [self.hr.user, self.lead.user]
+            worst = max(self.worst_case(user, *call) for user in users)
+            self.assertEqual(worst, EmployeeViewSet.query_budgets[action], action)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class EmployeeSearchTests(TestCase):
+
+    def setUp(self):
+        organization = Organization.objects.create(name='Acme')
+        self.department = Department.objects.create(name='Engineering', code='ENG', organization=organization)
+        self.hr = create_employee('HR001', role='HR_MANAGER')
+        self.lead = create_employee('TL001', role='TEAM_LEAD', department=self.department)
+        self.report = create_employee('EMP001', department=self.department, manager=self.lead, city='Pune')
+        self.other = create_employee('EMP002', city='Pune')
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def search(self, user, q):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/v1/employees/search/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [row['employee_id'] for row in response.data['results']]
+
+    def test_index_follows_renames_and_status(self):
+        self.assertEqual(self.search(self.hr.user, 'emp001'), ['EMP001'])
+        user = self.report.user
+        user.first_name = 'Grace'
+        user.save()
+        self.assertEqual(self.search(self.hr.user, 'gra pun'), ['EMP001'])
+
+        self.department.name = 'Platform'
+        self.department.save()
+        self.assertEqual(sorted(self.search(self.hr.user, 'platf')), ['EMP001', 'TL001'])
+
+        self.report.employment_status = 'TERMINATED'
+        self.report.save()
+        self.assertEqual(self.search(self.hr.user, 'grace'), [])
+
+    def test_results_are_scoped_and_name_matches_come_first(self):
+        self.assertEqual(sorted(self.search(self.hr.user, 'pune')), ['EMP001', 'EMP002'])
+        self.assertEqual(self.search(self.lead.user, 'pune'), ['EMP001'])
+        self.assertEqual(self.search(self.other.user, 'test'), ['EMP002'])
+
+        # Name matches come before people who only work in Engineering
+        create_employee('ENG900')
+        results = self.search(self.hr.user, 'eng')
+        self.assertEqual(results[0], 'ENG900')
+        self.assertEqual(sorted(results[1:]), ['EMP001', 'TL001'])
+        self.assertEqual(self.search(self.hr.user, 'tl001 eng'), ['TL001'])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class TalentSearchTests(TestCase):
+    PYTHON_AND_KUBERNETES = {'all': [
+        {'skill': 'python', 'min_level': 'ADVANCED'},
+        {'skill': 'Kubernetes', 'certified': True, 'min_years': 3},
+    ]}
+
+    def setUp(self):
+        # Start from a fresh index rather than one built by an earlier test
+        bump_version(SKILL_INDEX)
+        self.hr = create_employee('HR001', role='HR_MANAGER')
+        self.lead = create_employee('TL001', role='TEAM_LEAD')
+        self.expert = create_employee('EMP001', manager=self.lead)
+        self.junior = create_employee('EMP002')
+        self.add_skill(self.expert, 'Python', 'EXPERT', 8, False)
+        self.add_skill(self.expert, 'Kubernetes', 'ADVANCED', 4, True)
+        self.add_skill(self.junior, ' PYTHON ', 'ADVANCED', 2, False)
+        self.add_skill(self.junior, 'Kubernetes', 'INTERMEDIATE', 3, True)
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def add_skill(self, employee, name, level, years, certified):
+        return SkillSet.objects.create(
+            employee=employee, skill_name=name, proficiency_level=level,
+            years_of_experience=years, is_certified=certified,
+        )
+
+    def search(self, user, query):
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/v1/employees/talent_search/', {'query': query}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['employee_id'] for row in response.data['results']]
+
+    def test_boolean_queries_are_ranked_and_scoped(self):
+        self.assertEqual(self.search(self.hr.user, self.PYTHON_AND_KUBERNETES), ['EMP001', 'EMP002'])
+        self.assertEqual(self.search(self.hr.user, {'any': [
+            {'skill': 'python', 'min_level': 'EXPERT'}, {'skill': 'go'},
+        ]}), ['EMP001'])
+        self.assertEqual(self.search(self.lead.user, {'skill': 'python'}), ['EMP001'])
+
+        self.client.force_authenticate(self.expert.user)
+        response = self.client.post('/api/v1/employees/talent_search/', {'query': {'skill': 'python'}}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.client.force_authenticate(self.hr.user)
+        response = self.client.post(
+            '/api/v1/employees/talent_search/', {'query': {'skill': 'python', 'min_level': 'GURU'}}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_follows_skill_changes(self):
+        self.assertEqual(self.search(self.hr.user, self.PYTHON_AND_KUBERNETES), ['EMP001', 'EMP002'])
+        with self.captureOnCommitCallbacks(execute=True):
+            SkillSet.objects.filter(employee=self.expert, skill_name='Kubernetes').delete()
+            self.add_skill(self.lead, 'Kubernetes', 'EXPERT', 5, True)
+            self.add_skill(self.lead, 'Python', 'ADVANCED', 1, False)
+        self.assertEqual(self.search(self.hr.user, self.PYTHON_AND_KUBERNETES), ['TL001', 'EMP002'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lead.employment_status = 'TERMINATED'
+            self.lead.save()
+        self.assertEqual(self.search(self.hr.user, self.PYTHON_AND_KUBERNETES), ['EMP002'])
+
+
+class ReportingHierarchyTests(TestCase):
+    """
+    Random hires, moves and leavers through every path that maintains the
+    closure table, checked against a full rebuild from Employee.manager
+    """
+    STEPS = 150
+
+    def setUp(self):
+        self.random = random.Random(2024)
+        self.codes = iter(range(1000, 10000))
+        for _ in range(5):
+            self.hire()
+
+    def lines(self):
+        return set(ReportingLine.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def assert_matches_rebuild(self):
+        incremental = self.lines()
+        rebuild_reporting_lines()
+        self.assertEqual(incremental, self.lines())
+
+    def employee_ids(self):
+        return list(Employee.objects.order_by('employee_id').values_list('id', flat=True))
+
+    def some_employee_id(self):
+        return self.random.choice(self.employee_ids())
+
+    def some_manager(self):
+        return self.random.choice(self.employee_ids() + [None])
+
+    def hire(self):
+        """One save, through the post_save signal"""
+        return create_employee(f'EMP{next(self.codes)}', manager_id=self.some_manager())
+
+    def hire_many(self):
+        """bulk_create as onboarding does, managers first, some reporting to each other"""
+        new = []
+        for _ in range(self.random.randint(2, 6)):
+            code = f'EMP{next(self.codes)}'
+            user = User(email=f'{code.lower()}@example.com', username=code.lower(), first_name='Test', last_name=code)
+            manager_id = self.random.choice([self.some_manager()] + [employee.pk for employee in new])
+            new.append(Employee(
+                pk=Employee._meta.pk.get_default(), user=user, employee_id=code,
+                date_of_joining=date(2020, 1, 1), manager_id=manager_id,
+            ))
+        User.objects.bulk_create([employee.user for employee in new])
+        Employee.objects.bulk_create(new)
+        add_many_to_hierarchy([(employee.pk, employee.manager_id) for employee in new])
+
+    def reassign(self, deferred):
+        """A manager change saved from a loaded instance, or one loaded without the manager column"""
+        employees = Employee.objects.only('id', 'employee_id', 'user_id') if deferred else Employee.objects
+        employee = employees.get(pk=self.some_employee_id())
+        manager_id = self.some_manager()
+        employee.manager_id = manager_id
+        if manager_id is not None and reports_to(manager_id, employee.pk):
+            with self.assertRaises(ReportingCycle):
+                employee.save()
+        else:
+            employee.save()
+
+    def move(self):
+        """move_subtree called directly next to a queryset update, as bulk edits do"""
+        employee_id = self.some_employee_id()
+        manager_id = self.some_manager()
+        try:
+            move_subtree(employee_id, manager_id)
+        except ReportingCycle:
+            self.assertTrue(reports_to(manager_id, employee_id))
+        else:
+            Employee.objects.filter(pk=employee_id).update(manager_id=manager_id)
+
+    def leave(self):
+        if Employee.objects.count() > 5:
+            Employee.objects.get(pk=self.some_employee_id()).delete()
+
+    def test_incremental_lines_match_a_rebuild(self):
+        steps = [self.hire, self.hire_many, lambda: self.reassign(False), lambda: self.reassign(True), self.move, self.leave]
+        for step in range(self.STEPS):
+            self.random.choice(steps)()
+            if step % 10 == 9:
+                self.assert_matches_rebuild()
+        self.assertGreater(Employee.objects.filter(manager__isnull=False).count(), 5)
+        self.assert_matches_rebuild()
+
+
+class BulkOnboardingTests(TestCase):
+    HEADER = 'username,email,first_name,last_name,password,employee_id,date_of_joining,department,manager_employee_id\n'
+
+    def setUp(self):
+        organization = Organization.objects.create(name='Acme')
+        self.department = Department.objects.create(name='Engineering', code='ENG', organization=organization)
+        self.hr = create_employee('HR001', role='HR_MANAGER')
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.hr.user)
+
+    def upload(self, lines, query=''):
+        upload = SimpleUploadedFile('hires.csv', (self.HEADER + '\n'.join(lines)).encode())
+        if query:
+            response = self.client.post(f'/api/v1/employees/bulk_onboard/{query}', {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, 200, response.data)
+            return response.data
+
+        # The task runs eagerly instead of on a worker, and its result is
+        # read back through the result endpoint
+        tasks = []
+
+        def run_eagerly(args, task_id):
+            # Only the id of the stashed upload goes to the broker
+            self.assertEqual(args, (task_id,))
+            tasks.append(onboard_employees_task.apply(args=args, task_id=task_id))
+            return tasks[-1]
+
+        with mock.patch.object(onboard_employees_task, 'apply_async', side_effect=run_eagerly):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/v1/employees/bulk_onboard/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertEqual(tasks[0].id, response.data['task_id'])
+        self.assertEqual(OnboardingUpload.objects.get(pk=response.data['task_id']).rows, [])
+        with mock.patch.object(onboard_employees_task, 'AsyncResult', return_value=tasks[0]):
+            response = self.client.get(f"/api/v1/employees/bulk_onboard/{response.data['task_id']}/")
+        self.assertEqual(response.data['status'], 'SUCCESS')
+        return response.data
+
+    def test_valid_rows_are_created_and_bad_rows_reported(self):
+        department = self.department.id
+        data = self.upload([
+            f'ana,Ana@Example.COM,Ana,Lee,password1,EMP010,2024-01-01,{department},EMP011',
+            f'bo,bo@example.com,Bo,Ray,password2,EMP011,2024-01-01,{department},HR001',
+            'cy,hr001@example.com,Cy,Fox,password3,EMP012,2024-01-01,,EMP011',
+            'di,di@example.com,Di,Kim,short,EMP013,2024-01-01,,',
+            'ed,ed@example.com,Ed,Ng,password5,EMP014,2024-01-01,,EMP015',
+            'fa,fa@example.com,Fa,Ng,password6,EMP015,2024-01-01,,EMP014',
+        ])
+        self.assertEqual((data['created'], data['errors']), (2, 4))
+        self.assertEqual([result['status'] for result in data['results']], ['created', 'created'] + ['error'] * 4)
+        self.assertIn('email', data['results'][2]['errors'])
+        self.assertIn('password', data['results'][3]['errors'])
+        self.assertIn('manager_employee_id', data['results'][4]['errors'])
+
+        ana = Employee.objects.select_related('user', 'manager').get(employee_id='EMP010')
+        self.assertEqual(ana.user.email, 'Ana@example.com')
+        self.assertTrue(ana.user.check_password('password1'))
+        self.assertEqual(ana.manager.employee_id, 'EMP011')
+        self.assertEqual(
+            sorted(ReportingLine.objects.filter(descendant=ana).values_list('ancestor__employee_id', 'depth')),
+            [('EMP010', 0), ('EMP011', 1), ('HR001', 2)],
+        )
+        response = self.client.get('/api/v1/employees/search/', {'q': 'ana lee'})
+        self.assertEqual([row['employee_id'] for row in response.data['results']], ['EMP010'])
+
+        # Nothing is created on a dry run; existing codes are reported
+        data = self.upload(['gu,gu@example.com,Gu,Li,password7,EMP010,2024-01-01,,'], query='?dry_run=true')
+        self.assertIn('employee_id', data['results'][0]['errors'])
+        self.assertEqual(Employee.objects.count(), 3)
+
+    def test_only_issued_task_ids_are_reported(self):
+        with mock.patch.object(onboard_employees_task, 'AsyncResult') as async_result:
+            for task_id in [uuid.uuid4(), 'celery-beat-task']:
+                response = self.client.get(f'/api/v1/employees/bulk_onboard/{task_id}/')
+                self.assertEqual(response.status_code, 404)
+        async_result.assert_not_called()
+
+    def test_passwords_hash_in_worker_processes(self):
+        hashes = hash_passwords(['first-secret', 'second-secret'], workers=2)
+        self.assertTrue(check_password('first-secret', hashes[0]))
+        self.assertTrue(check_password('second-secret', hashes[1]))
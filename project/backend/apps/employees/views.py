@@ -2,29 +2,43 @@
 Employee management views
 """
 from rest_framework import viewsets, status
+from rest_framework.filters import OrderingFilter
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
+from django.core.exceptions import ValidationError as DjangoValidationError
 from .models import (
     Employee, EmployeeDocument, EmploymentHistory, 
-    SkillSet, EducationRecord
+    SkillSet, EducationRecord, OnboardingUpload
 )
 from .serializers import (
     EmployeeSerializer, EmployeeCreateSerializer, EmployeeListSerializer,
     EmployeeDocumentSerializer, EmploymentHistorySerializer,
-    SkillSetSerializer, EducationRecordSerializer, EmployeeDetailSerializer
+    SkillSetSerializer, EducationRecordSerializer, EmployeeDetailSerializer,
+    TalentSearchSerializer
 )
 from apps.accounts.permissions import IsSuperAdminOrHRManager, IsOwnerOrHRManager
+from apps.core.query_budget import QueryBudgetMixin
+from .hierarchy import in_reporting_tree, org_chart, reports_to
+from .onboarding import MAX_UPLOAD_ROWS, onboard_employees, read_rows, summarize
+from .search import EmployeeSearchFilter, TYPEAHEAD_LIMIT, TYPEAHEAD_MAX_LIMIT, typeahead
+from .skill_index import talent_search
+from .tasks import onboard_employees_task
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     """
     ViewSet for employee management
     """
     permission_classes = [IsAuthenticated]
+    filter_backends = [EmployeeSearchFilter, OrderingFilter]
+    # Worst case per action, as QueryBudgetTests measures it: the planned
+    # queries, the JWT user lookup, a lead's reporting-tree check, and
+    # rebuilding the department and job title caches (and the skill index)
+    query_budgets = {'list': 5, 'retrieve': 9, 'org_chart': 6, 'search': 4, 'talent_search': 6}
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -36,28 +50,164 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         return EmployeeSerializer
     
     def get_queryset(self):
-        queryset = Employee.objects.select_related(
-            'user', 'department', 'job_title', 'manager'
-        ).filter(employment_status='ACTIVE')
+        queryset = Employee.objects.filter(employment_status='ACTIVE')
+        # Each serializer declares the joins and prefetches it needs
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_queryset'):
+            queryset = serializer_class.setup_queryset(queryset)
         
         # Filter based on user role
         user = self.request.user
         if user.role in ['SUPER_ADMIN', 'HR_MANAGER']:
             return queryset
         elif user.role == 'TEAM_LEAD':
-            # Team leads can see their team members
-            return queryset.filter(manager__user=user)
+            # Team leads can see everyone in their reporting tree
+            return queryset.filter(in_reporting_tree(user, field=None, include_self=False))
         else:
             # Employees can only see their own profile
             return queryset.filter(user=user)
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk_onboard', 'bulk_onboard_result']:
             self.permission_classes = [IsSuperAdminOrHRManager]
         elif self.action in ['retrieve', 'update_profile']:
             self.permission_classes = [IsOwnerOrHRManager]
         return super().get_permissions()
     
+    @action(detail=False, methods=['get'])
+    def org_chart(self, request):
+        """
+        Reporting subtree below ?root= (default: the requester), optionally
+        cut at ?depth=. HR without a root gets the whole organisation.
+        """
+        user = request.user
+        root = request.query_params.get('root')
+        own_profile = getattr(user, 'employee_profile', None)
+        if not root and own_profile is not None and user.role not in ['SUPER_ADMIN', 'HR_MANAGER']:
+            root = own_profile.id
+        try:
+            max_depth = int(request.query_params['depth']) if 'depth' in request.query_params else None
+            root = Employee._meta.pk.to_python(root) if root else None
+        except (ValueError, DjangoValidationError):
+            return Response(
+                {'error': 'root must be an employee id and depth a number'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if user.role not in ['SUPER_ADMIN', 'HR_MANAGER']:
+            if root is None or own_profile is None or not reports_to(root, own_profile.id):
+                return Response(
+                    {'error': 'Permission denied'}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        return Response(org_chart(root, max_depth))
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Typeahead: the best ?limit= (default 10) employees whose name, code,
+        email, department, job title or city start with every word of ?q=
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', TYPEAHEAD_LIMIT)), TYPEAHEAD_MAX_LIMIT)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be a number'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # HR searches the index alone; others within their visible employees
+        scope = None
+        if request.user.role not in ['SUPER_ADMIN', 'HR_MANAGER']:
+            scope = self.get_queryset()
+        return Response({'results': typeahead(request.query_params.get('q', ''), scope, max(limit, 1))})
+    
+    @action(detail=False, methods=['post'])
+    def talent_search(self, request):
+        """
+        Employees ranked by how well their skills meet a boolean skill query,
+        e.g. {"query": {"all": [{"skill": "Python", "min_level": "ADVANCED"},
+        {"skill": "Kubernetes", "certified": true, "min_years": 3}]}}
+        """
+        user = request.user
+        if user.role not in ['SUPER_ADMIN', 'HR_MANAGER', 'TEAM_LEAD']:
+            return Response(
+                {'error': 'Permission denied'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = TalentSearchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Team leads search their reporting tree
+        scope = self.get_queryset() if user.role == 'TEAM_LEAD' else None
+        results = talent_search(serializer.validated_data['query'], serializer.validated_data['limit'], scope)
+        return Response({'results': results})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_onboard(self, request):
+        """
+        Onboard up to 500 employees from an uploaded CSV/JSON `file` or a
+        JSON list of rows. The rows are created by a background task whose
+        results bulk_onboard/<task_id>/ returns; ?dry_run=true only
+        validates, right away. Valid rows are created even when others
+        fail, and every row gets a result.
+        """
+        upload = request.FILES.get('file')
+        try:
+            if upload is not None:
+                rows = read_rows(upload.read(), 'json' if upload.name.lower().endswith('.json') else 'csv')
+            elif isinstance(request.data, list) and all(isinstance(row, dict) for row in request.data):
+                rows = request.data
+            else:
+                raise ValueError('Upload a CSV or JSON file, or post a list of employee rows')
+        except ValueError as error:
+            return Response(
+                {'error': str(error)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > MAX_UPLOAD_ROWS:
+            return Response(
+                {'error': f'At most {MAX_UPLOAD_ROWS} rows per upload; use the import_employees command for more'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if request.query_params.get('dry_run', '').lower() in ['1', 'true']:
+            return Response(summarize(onboard_employees(rows, dry_run=True), dry_run=True))
+        
+        # Hashing hundreds of passwords takes longer than a request may. The
+        # rows are stashed in the database and the task only gets their id,
+        # so no password reaches the broker
+        upload = OnboardingUpload.objects.create(uploaded_by=request.user, rows=rows)
+        task_id = str(upload.pk)
+        transaction.on_commit(
+            lambda: onboard_employees_task.apply_async(args=(task_id,), task_id=task_id)
+        )
+        return Response({'task_id': task_id, 'status': 'PENDING'}, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'], url_path=r'bulk_onboard/(?P<task_id>[\w-]+)')
+    def bulk_onboard_result(self, request, task_id=None):
+        """State of a bulk_onboard task, with the row results once it has finished"""
+        try:
+            issued = OnboardingUpload.objects.filter(pk=task_id).exists()
+        except DjangoValidationError:
+            issued = False
+        if not issued:
+            return Response(
+                {'error': 'No bulk onboarding task with this id'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        task = onboard_employees_task.AsyncResult(task_id)
+        data = {'task_id': task_id, 'status': task.state}
+        if task.successful():
+            data.update(summarize(task.result))
+        elif task.failed():
+            data['error'] = 'Onboarding failed; employees in chunks written before the failure stay created'
+        return Response(data)
+    
     @action(detail=True, methods=['put'])
     def update_profile(self, request, pk=None):
         """Allow employees to update their own profile (limited fields)"""
@@ -2,7 +2,7 @@
 Leave admin configuration
 """
 from django.contrib import admin
-from .models import LeaveType, LeaveBalance, LeaveRequest, Holiday
+from .models import LeaveType, LeaveBalance, LeaveRequest, Holiday, LeaveLedgerEntry
 
 @admin.register(LeaveType)
 class LeaveTypeAdmin(admin.ModelAdmin):
@@ -15,6 +15,20 @@ class LeaveBalanceAdmin(admin.ModelAdmin):
     list_display = ['employee', 'leave_type', 'year', 'total_days', 'used_days', 'available_days']
     list_filter = ['leave_type', 'year']
     search_fields = ['employee__user__first_name', 'employee__user__last_name']
+    # Totals only move through ledger entries
+    readonly_fields = ['total_days', 'used_days', 'carry_forward_days']
+
+@admin.register(LeaveLedgerEntry)
+class LeaveLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['balance', 'entry_type', 'days', 'leave_request', 'created_at']
+    list_filter = ['entry_type']
+    search_fields = ['balance__employee__user__first_name', 'balance__employee__user__last_name']
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 @admin.register(LeaveRequest)
 class LeaveRequestAdmin(admin.ModelAdmin):
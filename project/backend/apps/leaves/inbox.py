@@ -0,0 +1,85 @@
+"""
+Approvals inbox
+Pending leave requests per approver, with cached pending-count badges that
+are adjusted on state transitions instead of recounted. Team leads approve
+for their whole reporting tree, as the leave request endpoints allow.
+"""
+from collections import Counter, defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from apps.employees.hierarchy import in_reporting_tree
+from apps.employees.models import ReportingLine
+from .models import LeaveRequest
+
+BADGE_KEY = 'leaves:pending:{}'
+# HR managers and super admins approve everything and share one counter
+ALL_REQUESTS = 'all'
+# Counters are recounted at least this often, bounding drift from writes
+# that bypass the transitions (e.g. moving an employee to another manager)
+BADGE_TIMEOUT = 60 * 60
+
+
+def badge_scope(user):
+    if user.role in ['SUPER_ADMIN', 'HR_MANAGER']:
+        return ALL_REQUESTS
+    if user.role == 'TEAM_LEAD':
+        return str(user.id)
+    return None
+
+
+def inbox_queryset(user):
+    """Pending requests the user can act on: a lead's are those of everyone below them"""
+    queryset = LeaveRequest.objects.filter(status='PENDING')
+    scope = badge_scope(user)
+    if scope is None:
+        return queryset.none()
+    if scope != ALL_REQUESTS:
+        queryset = queryset.filter(in_reporting_tree(user, include_self=False))
+    return queryset
+
+
+def pending_count(user):
+    """Cached number of requests in the user's inbox"""
+    scope = badge_scope(user)
+    if scope is None:
+        return 0
+    key = BADGE_KEY.format(scope)
+    count = cache.get(key)
+    if count is None:
+        count = inbox_queryset(user).count()
+        cache.add(key, count, BADGE_TIMEOUT)
+    return count
+
+
+def adjust_pending_counts(deltas):
+    """
+    Apply (approver user ids, +1/-1) changes to the cached badges once the
+    transaction commits. Badges not cached yet are simply recounted on read.
+    """
+    totals = Counter()
+    for approvers, delta in deltas:
+        totals[ALL_REQUESTS] += delta
+        for approver_id in approvers:
+            totals[str(approver_id)] += delta
+    totals = {scope: delta for scope, delta in totals.items() if delta}
+    if not totals:
+        return
+
+    def apply():
+        for scope, delta in totals.items():
+            try:
+                cache.incr(BADGE_KEY.format(scope), delta)
+            except ValueError:
+                pass
+
+    transaction.on_commit(apply)
+
+
+def approver_ids(employee_ids):
+    """Employee id -> user ids of everyone above them, whose inboxes hold their requests"""
+    approvers = defaultdict(list)
+    for employee_id, user_id in ReportingLine.objects.filter(
+        descendant_id__in=set(employee_ids), depth__gt=0
+    ).values_list('descendant_id', 'ancestor__user_id'):
+        approvers[employee_id].append(user_id)
+    return approvers
@@ -0,0 +1,364 @@
+"""
+Leave balance ledger
+Every change to a LeaveBalance is appended as a LeaveLedgerEntry in the same
+transaction; the balance columns are the running totals of its entries.
+"""
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+from apps.core.utils import chunked
+from .inbox import adjust_pending_counts, approver_ids
+from .models import LeaveBalance, LeaveLedgerEntry, LeaveRequest, LeaveRequestComment
+from .notifications import notify_reviewed
+from .working_days import get_working_day_calendar
+
+# Entry type -> {balance column: sign}
+ENTRY_EFFECTS = {
+    'OPENING': {},
+    'ACCRUAL': {'total_days': 1},
+    'CONSUMPTION': {'used_days': 1},
+    'REVERSAL': {'used_days': -1},
+    'CARRY_FORWARD': {'total_days': 1, 'carry_forward_days': 1},
+}
+
+BALANCE_FIELDS = ['total_days', 'used_days', 'carry_forward_days']
+REVIEW_FIELDS = ['status', 'approved_by', 'approved_date', 'rejection_reason', 'updated_at']
+
+# Keep IN (...) lists well below the SQLite bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+WRITE_BATCH_SIZE = 500
+
+
+class LeaveActionRejected(Exception):
+    """A leave status change that is not allowed in the request's current state"""
+
+
+class InsufficientLeaveBalance(LeaveActionRejected):
+    """Consuming the requested days would overdraw the balance"""
+
+
+def lock_balance(employee_id, leave_type, year):
+    """
+    Lock the balance row for update, creating it with the yearly allowance
+    (as an ACCRUAL entry) if it does not exist yet. Call inside a transaction.
+    """
+    balance, created = LeaveBalance.objects.select_for_update().get_or_create(
+        employee_id=employee_id, leave_type=leave_type, year=year
+    )
+    if created and leave_type.days_allowed_per_year:
+        post_entry(balance, 'ACCRUAL', Decimal(leave_type.days_allowed_per_year), note='Yearly allowance')
+    return balance
+
+
+def post_entry(balance, entry_type, days, leave_request=None, user=None, note=''):
+    """
+    Apply `days` to the (locked) balance and append the matching ledger entry.
+
+    The totals are changed with a single UPDATE ... SET col = col + n, so no
+    concurrent writer can lose an update even where row locks are no-ops.
+    """
+    effects = ENTRY_EFFECTS[entry_type]
+    if effects:
+        LeaveBalance.objects.filter(pk=balance.pk).update(
+            updated_at=timezone.now(),
+            **{field: F(field) + sign * days for field, sign in effects.items()}
+        )
+        balance.refresh_from_db(fields=BALANCE_FIELDS)
+    return LeaveLedgerEntry.objects.create(
+        balance=balance,
+        entry_type=entry_type,
+        days=days,
+        leave_request=leave_request,
+        created_by=user,
+        note=note,
+        total_days_after=balance.total_days,
+        used_days_after=balance.used_days,
+        carry_forward_days_after=balance.carry_forward_days,
+    )
+
+
+def consume_leave(leave_request, user=None):
+    """Debit an approved request's days from the balance of its start year"""
+    balance = lock_balance(leave_request.employee_id, leave_request.leave_type, leave_request.start_date.year)
+    entry = post_entry(balance, 'CONSUMPTION', leave_request.days_requested, leave_request=leave_request, user=user)
+    if balance.used_days > balance.total_days:
+        raise InsufficientLeaveBalance(
+            f"Insufficient {leave_request.leave_type.name} balance: "
+            f"{balance.available_days + leave_request.days_requested} days available, "
+            f"{leave_request.days_requested} requested"
+        )
+    return entry
+
+
+def reverse_consumption(leave_request, user=None, note=''):
+    """Credit back whatever is still consumed for the request; returns the entries"""
+    entries = []
+    for balance_id, days in _net_consumption(leave_request).items():
+        if days <= 0:
+            continue
+        balance = LeaveBalance.objects.select_for_update().get(pk=balance_id)
+        entries.append(post_entry(balance, 'REVERSAL', days, leave_request=leave_request, user=user, note=note))
+    return entries
+
+
+def _net_consumption(leave_request):
+    """Balance id -> days consumed minus days reversed for the request"""
+    net = {}
+    for balance_id, entry_type, days in LeaveLedgerEntry.objects.filter(
+        leave_request=leave_request, entry_type__in=['CONSUMPTION', 'REVERSAL']
+    ).values_list('balance_id', 'entry_type', 'days'):
+        sign = 1 if entry_type == 'CONSUMPTION' else -1
+        net[balance_id] = net.get(balance_id, Decimal('0')) + sign * days
+    return net
+
+
+def _lock_request(leave_request):
+    """
+    Reload the request under a write lock. Touching the row first takes the
+    lock up front on every backend; SQLite has no SELECT ... FOR UPDATE and
+    would otherwise fail read-then-write transactions that run concurrently.
+    """
+    LeaveRequest.objects.filter(pk=leave_request.pk).update(updated_at=timezone.now())
+    return LeaveRequest.objects.select_for_update().select_related('leave_type').get(pk=leave_request.pk)
+
+
+def approve_leave(leave_request, user):
+    """PENDING -> APPROVED, debiting the balance in the same transaction"""
+    with transaction.atomic():
+        leave_request = _lock_request(leave_request)
+        if leave_request.status != 'PENDING':
+            raise LeaveActionRejected('Only pending requests can be approved')
+        # Counted on the calendar as of approval, which the debit then fixes
+        leave_request.days_requested = Decimal(
+            get_working_day_calendar().count(leave_request.start_date, leave_request.end_date)
+        )
+        leave_request.status = 'APPROVED'
+        leave_request.approved_by = user
+        leave_request.approved_date = timezone.now()
+        leave_request.rejection_reason = ''
+        leave_request.save(update_fields=REVIEW_FIELDS + ['days_requested'])
+        consume_leave(leave_request, user)
+        notify_reviewed([leave_request], user)
+    return leave_request
+
+
+def reject_leave(leave_request, user, reason=''):
+    """PENDING -> REJECTED; nothing was debited, so the balance is untouched"""
+    with transaction.atomic():
+        leave_request = _lock_request(leave_request)
+        if leave_request.status != 'PENDING':
+            raise LeaveActionRejected('Only pending requests can be rejected')
+        leave_request.status = 'REJECTED'
+        leave_request.approved_by = user
+        leave_request.approved_date = timezone.now()
+        leave_request.rejection_reason = reason
+        leave_request.save(update_fields=REVIEW_FIELDS)
+        notify_reviewed([leave_request], user)
+    return leave_request
+
+
+def cancel_leave(leave_request, user):
+    """PENDING/APPROVED -> CANCELLED, crediting back approved days"""
+    with transaction.atomic():
+        leave_request = _lock_request(leave_request)
+        if leave_request.status not in ['PENDING', 'APPROVED']:
+            raise LeaveActionRejected('Only pending or approved requests can be cancelled')
+        was_approved = leave_request.status == 'APPROVED'
+        leave_request.status = 'CANCELLED'
+        leave_request.save(update_fields=['status', 'updated_at'])
+        if was_approved:
+            reverse_consumption(leave_request, user, note='Leave cancelled')
+    return leave_request
+
+
+def review_leave_requests(queryset, ids, reviewer, approve, rejection_reason='', comment=''):
+    """
+    Approve or reject many pending requests by id inside the caller's
+    transaction, with a fixed number of statements however many there are.
+
+    Rows come from `queryset`, so callers pass the reviewer's scoped queryset.
+    Approvals debit balances exactly like approve_leave; a request that would
+    overdraw its balance is skipped. `comment` is added to every reviewed
+    request. Returns a result dict per distinct id, in input order.
+    """
+    ids = list(dict.fromkeys(ids))
+    now = timezone.now()
+    found = {}
+    for chunk in chunked(ids, LOOKUP_CHUNK_SIZE):
+        # Touch first to take the write lock up front, as _lock_request does
+        queryset.filter(id__in=chunk, status='PENDING').update(updated_at=now)
+        found.update(
+            (leave_request.id, leave_request)
+            for leave_request in queryset.select_for_update(of=('self',)).select_related(
+                'employee', 'leave_type'
+            ).filter(id__in=chunk)
+        )
+
+    results, pending = {}, []
+    for request_id in ids:
+        leave_request = found.get(request_id)
+        if leave_request is None:
+            results[request_id] = {'id': request_id, 'status': 'not_found'}
+        elif leave_request.status != 'PENDING':
+            results[request_id] = {
+                'id': request_id, 'status': 'skipped',
+                'detail': f'Request is already {leave_request.status.lower()}',
+            }
+        else:
+            pending.append(leave_request)
+
+    if approve:
+        reviewed, skipped = _consume_leave_bulk(pending, reviewer)
+        for leave_request, detail in skipped:
+            results[leave_request.id] = {'id': leave_request.id, 'status': 'skipped', 'detail': detail}
+    else:
+        reviewed = pending
+
+    for leave_request in reviewed:
+        leave_request.status = 'APPROVED' if approve else 'REJECTED'
+        leave_request.approved_by = reviewer
+        leave_request.approved_date = now
+        leave_request.rejection_reason = '' if approve else rejection_reason
+        leave_request.updated_at = now
+        results[leave_request.id] = {'id': leave_request.id, 'status': leave_request.status.lower()}
+
+    if reviewed:
+        # The review columns are the same for every row, so group by the only
+        # per-row value instead of paying for bulk_update's CASE per column.
+        # Approving clears any reason left over from an earlier rejection.
+        review = {
+            'status': 'APPROVED' if approve else 'REJECTED',
+            'approved_by': reviewer,
+            'approved_date': now,
+            'rejection_reason': '' if approve else rejection_reason,
+            'updated_at': now,
+        }
+        by_days = defaultdict(list)
+        for leave_request in reviewed:
+            by_days[leave_request.days_requested].append(leave_request.pk)
+        for days, pks in by_days.items():
+            for chunk in chunked(pks, LOOKUP_CHUNK_SIZE):
+                LeaveRequest.objects.filter(pk__in=chunk).update(days_requested=days, **review)
+        # update() sends no post_save, so settle the inbox badges here
+        approvers = approver_ids(leave_request.employee_id for leave_request in reviewed)
+        adjust_pending_counts([(approvers[leave_request.employee_id], -1) for leave_request in reviewed])
+        for leave_request in reviewed:
+            leave_request._loaded_status = leave_request.status
+        if comment:
+            LeaveRequestComment.objects.bulk_create([
+                LeaveRequestComment(leave_request=leave_request, user=reviewer, comment=comment)
+                for leave_request in reviewed
+            ], batch_size=WRITE_BATCH_SIZE)
+        notify_reviewed(reviewed, reviewer)
+    return [results[request_id] for request_id in ids]
+
+
+def _consume_leave_bulk(leave_requests, user):
+    """
+    Debit the days of many requests from their balances with one ledger insert
+    and one UPDATE per chunk of balances. Returns the requests debited and
+    (request, reason) pairs for those that would overdraw their balance.
+    """
+    calendar = get_working_day_calendar()
+    keys = set()
+    for leave_request in leave_requests:
+        leave_request.days_requested = Decimal(calendar.count(leave_request.start_date, leave_request.end_date))
+        keys.add((leave_request.employee_id, leave_request.leave_type_id, leave_request.start_date.year))
+    balances = _lock_balances_bulk(keys, {lr.leave_type_id: lr.leave_type for lr in leave_requests}, user)
+
+    debited, skipped, entries, used = [], [], [], defaultdict(Decimal)
+    for leave_request in leave_requests:
+        balance = balances[(leave_request.employee_id, leave_request.leave_type_id, leave_request.start_date.year)]
+        available = balance.available_days - used[balance.pk]
+        if leave_request.days_requested > available:
+            skipped.append((leave_request, (
+                f"Insufficient {leave_request.leave_type.name} balance: "
+                f"{available} days available, {leave_request.days_requested} requested"
+            )))
+            continue
+        used[balance.pk] += leave_request.days_requested
+        debited.append(leave_request)
+        entries.append(LeaveLedgerEntry(
+            balance=balance,
+            entry_type='CONSUMPTION',
+            days=leave_request.days_requested,
+            leave_request=leave_request,
+            created_by=user,
+            total_days_after=balance.total_days,
+            used_days_after=balance.used_days + used[balance.pk],
+            carry_forward_days_after=balance.carry_forward_days,
+        ))
+
+    now = timezone.now()
+    for chunk in chunked(used.items(), LOOKUP_CHUNK_SIZE):
+        LeaveBalance.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+            used_days=Case(*(When(pk=pk, then=F('used_days') + days) for pk, days in chunk)),
+            updated_at=now,
+        )
+    LeaveLedgerEntry.objects.bulk_create(entries, batch_size=WRITE_BATCH_SIZE)
+    return debited, skipped
+
+
+def _lock_balances_bulk(keys, leave_types, user):
+    """
+    Lock the balances for (employee_id, leave_type_id, year) keys, opening the
+    missing ones with their yearly allowance like lock_balance does.
+    """
+    def load():
+        balances = {}
+        employee_ids = {employee_id for employee_id, _, _ in keys}
+        for chunk in chunked(employee_ids, LOOKUP_CHUNK_SIZE):
+            for balance in LeaveBalance.objects.select_for_update().filter(
+                employee_id__in=chunk,
+                leave_type_id__in={leave_type_id for _, leave_type_id, _ in keys},
+                year__in={year for _, _, year in keys},
+            ):
+                key = (balance.employee_id, balance.leave_type_id, balance.year)
+                if key in keys:
+                    balances[key] = balance
+        return balances
+
+    balances = load()
+    missing = [
+        LeaveBalance(
+            id=uuid.uuid4(), employee_id=employee_id, leave_type_id=leave_type_id, year=year,
+            total_days=Decimal(leave_types[leave_type_id].days_allowed_per_year or 0),
+        )
+        for employee_id, leave_type_id, year in keys - set(balances)
+    ]
+    if not missing:
+        return balances
+
+    LeaveBalance.objects.bulk_create(missing, batch_size=WRITE_BATCH_SIZE, ignore_conflicts=True)
+    # A concurrent writer may have opened some of them first; reload the winners
+    opened = {balance.pk for balance in missing}
+    balances = load()
+    LeaveLedgerEntry.objects.bulk_create([
+        LeaveLedgerEntry(
+            balance=balance,
+            entry_type='ACCRUAL',
+            days=balance.total_days,
+            created_by=user,
+            note='Yearly allowance',
+            total_days_after=balance.total_days,
+            used_days_after=balance.used_days,
+            carry_forward_days_after=balance.carry_forward_days,
+        )
+        for balance in balances.values() if balance.pk in opened and balance.total_days
+    ], batch_size=WRITE_BATCH_SIZE)
+    return balances
+
+
+def balance_as_of(balance, moment):
+    """Balance totals as they stood at `moment`, read from the last ledger entry before it"""
+    entry = balance.ledger_entries.filter(created_at__lte=moment).order_by('-created_at').first()
+    if entry is None:
+        return {'total_days': Decimal('0'), 'used_days': Decimal('0'), 'carry_forward_days': Decimal('0')}
+    return {
+        'total_days': entry.total_days_after,
+        'used_days': entry.used_days_after,
+        'carry_forward_days': entry.carry_forward_days_after,
+    }
@@ -0,0 +1,35 @@
+"""
+Management command to open next year's leave balances with carry-forward
+"""
+import time
+from datetime import date
+from django.core.management.base import BaseCommand
+from apps.leaves.rollover import rollover_leave_year
+
+
+class Command(BaseCommand):
+    help = 'Create next-year leave balances from --year (default: last year), carrying forward unused days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Year to roll over from')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would change without saving it'
+        )
+
+    def handle(self, *args, **options):
+        year = options['year'] or date.today().year - 1
+        started = time.monotonic()
+        report = rollover_leave_year(year, dry_run=options['dry_run'])
+
+        prefix = 'Would open' if options['dry_run'] else 'Opened'
+        for row in report['leave_types']:
+            self.stdout.write(
+                f"{row['code']}: {row['balances_created']} balances created, "
+                f"{row['balances_carried_forward']} carried forward ({row['days_carried_forward']} days)"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {report['year']}: {report['balances_created']} balances created, "
+            f"{report['balances_carried_forward']} carried forward "
+            f"({report['days_carried_forward']} days) in {time.monotonic() - started:.2f}s"
+        ))
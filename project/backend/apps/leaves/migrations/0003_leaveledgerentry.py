@@ -0,0 +1,118 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def open_existing_balances(apps, schema_editor):
+    """One OPENING entry per existing balance so the ledger matches its totals"""
+    LeaveBalance = apps.get_model("leaves", "LeaveBalance")
+    LeaveLedgerEntry = apps.get_model("leaves", "LeaveLedgerEntry")
+    LeaveLedgerEntry.objects.bulk_create(
+        [
+            LeaveLedgerEntry(
+                balance=balance,
+                entry_type="OPENING",
+                days=balance.total_days,
+                note="Balance before the ledger was introduced",
+                total_days_after=balance.total_days,
+                used_days_after=balance.used_days,
+                carry_forward_days_after=balance.carry_forward_days,
+            )
+            for balance in LeaveBalance.objects.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("leaves", "0002_holiday_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaveLedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "entry_type",
+                    models.CharField(
+                        choices=[
+                            ("OPENING", "Opening Balance"),
+                            ("ACCRUAL", "Accrual"),
+                            ("CONSUMPTION", "Consumption"),
+                            ("REVERSAL", "Reversal"),
+                            ("CARRY_FORWARD", "Carry Forward"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("days", models.DecimalField(decimal_places=2, max_digits=5)),
+                ("note", models.CharField(blank=True, max_length=200)),
+                (
+                    "total_days_after",
+                    models.DecimalField(decimal_places=2, max_digits=5),
+                ),
+                (
+                    "used_days_after",
+                    models.DecimalField(decimal_places=2, max_digits=5),
+                ),
+                (
+                    "carry_forward_days_after",
+                    models.DecimalField(decimal_places=2, max_digits=5),
+                ),
+                (
+                    "balance",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ledger_entries",
+                        to="leaves.leavebalance",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "leave_request",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="ledger_entries",
+                        to="leaves.leaverequest",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "leaves_leave_ledger_entry",
+                "ordering": ["created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["balance", "created_at"],
+                        name="leave_ledger_balance_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(open_existing_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leaves", "0003_leaveledgerentry"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="leaveledgerentry",
+            name="balance",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="ledger_entries",
+                to="leaves.leavebalance",
+            ),
+        ),
+    ]
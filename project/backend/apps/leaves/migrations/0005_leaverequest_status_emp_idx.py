@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leaves", "0004_leaveledgerentry_balance_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="leaverequest",
+            index=models.Index(
+                fields=["status", "employee"], name="leave_request_status_emp_idx"
+            ),
+        ),
+    ]
@@ -5,6 +5,7 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from apps.core.models import TimeStampedModel
 from apps.employees.models import Employee
+from .working_days import count_working_days
 import uuid
 
 User = get_user_model()
@@ -52,6 +53,53 @@ class LeaveBalance(TimeStampedModel):
         db_table = 'leaves_leave_balance'
         unique_together = ['employee', 'leave_type', 'year']
 
+class LeaveLedgerEntry(TimeStampedModel):
+    """
+    Append-only movement on a leave balance; the balance columns hold the running totals
+    """
+    ENTRY_TYPE_CHOICES = [
+        ('OPENING', 'Opening Balance'),
+        ('ACCRUAL', 'Accrual'),
+        ('CONSUMPTION', 'Consumption'),
+        ('REVERSAL', 'Reversal'),
+        ('CARRY_FORWARD', 'Carry Forward'),
+    ]
+    
+    # Lookups by balance use leave_ledger_balance_idx
+    balance = models.ForeignKey(
+        LeaveBalance, on_delete=models.CASCADE, related_name='ledger_entries', db_index=False
+    )
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+    days = models.DecimalField(max_digits=5, decimal_places=2)
+    leave_request = models.ForeignKey(
+        'LeaveRequest', on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries'
+    )
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    note = models.CharField(max_length=200, blank=True)
+    
+    # Balance after this entry, for point-in-time reads
+    total_days_after = models.DecimalField(max_digits=5, decimal_places=2)
+    used_days_after = models.DecimalField(max_digits=5, decimal_places=2)
+    carry_forward_days_after = models.DecimalField(max_digits=5, decimal_places=2)
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Leave ledger entries are append-only")
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError("Leave ledger entries are append-only")
+    
+    def __str__(self):
+        return f"{self.get_entry_type_display()} {self.days} - {self.balance}"
+    
+    class Meta:
+        db_table = 'leaves_leave_ledger_entry'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['balance', 'created_at'], name='leave_ledger_balance_idx'),
+        ]
+
 class LeaveRequest(TimeStampedModel):
     """
     Employee leave requests
@@ -86,16 +134,32 @@ class LeaveRequest(TimeStampedModel):
     def __str__(self):
         return f"{self.employee.full_name} - {self.leave_type.name} ({self.start_date} to {self.end_date})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so transitions can adjust inbox counters
+        deferred = instance.get_deferred_fields()
+        if 'status' not in deferred:
+            instance._loaded_status = instance.status
+        if not deferred.intersection(['start_date', 'end_date']):
+            instance._loaded_dates = (instance.start_date, instance.end_date)
+        return instance
+    
     def save(self, *args, **kwargs):
-        # Calculate days requested
-        if self.start_date and self.end_date:
-            delta = self.end_date - self.start_date
-            self.days_requested = delta.days + 1
+        # Working days requested. Once reviewed the count is what the ledger
+        # debited, so a later holiday only changes it if the dates change
+        dates = (self.start_date, self.end_date)
+        if all(dates) and (self.status == 'PENDING' or getattr(self, '_loaded_dates', None) != dates):
+            self.days_requested = count_working_days(*dates)
         super().save(*args, **kwargs)
+        self._loaded_dates = dates
     
     class Meta:
         db_table = 'leaves_leave_request'
         ordering = ['-applied_date']
+        indexes = [
+            models.Index(fields=['status', 'employee'], name='leave_request_status_emp_idx'),
+        ]
 
 from django.db import models
 
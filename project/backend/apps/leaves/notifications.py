@@ -0,0 +1,32 @@
+"""
+Leave notifications
+In-app notifications for leave workflow events, written with one insert
+per batch of requests.
+"""
+from apps.core.models import Notification
+
+REVIEW_NOTIFICATIONS = {
+    'APPROVED': ('LEAVE_APPROVED', 'Leave approved'),
+    'REJECTED': ('LEAVE_REJECTED', 'Leave rejected'),
+}
+
+
+def notify_reviewed(leave_requests, reviewer):
+    """Tell each requester their leave was approved or rejected. Expects `employee` and `leave_type` loaded."""
+    notifications = []
+    for leave_request in leave_requests:
+        notification_type, title = REVIEW_NOTIFICATIONS[leave_request.status]
+        message = (
+            f"Your {leave_request.leave_type.name} request for {leave_request.start_date} "
+            f"to {leave_request.end_date} was {leave_request.status.lower()}."
+        )
+        if leave_request.status == 'REJECTED' and leave_request.rejection_reason:
+            message += f" Reason: {leave_request.rejection_reason}"
+        notifications.append(Notification(
+            recipient_id=leave_request.employee.user_id,
+            sender=reviewer,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+        ))
+    Notification.objects.bulk_create(notifications, batch_size=500)
@@ -0,0 +1,134 @@
+"""
+Team leave overlaps
+Who else in the same team (same manager) or department is out during a
+leave request, answered for a whole page of requests with one query.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.db.models import Q
+from apps.core.intervals import IntervalTree
+from .models import LeaveRequest
+from .working_days import get_working_day_calendar
+
+# Leave that takes (or may take) someone out
+BLOCKING_STATUSES = ['PENDING', 'APPROVED']
+
+OVERLAP_FIELDS = [
+    'id', 'employee_id', 'employee__employee_id', 'employee__user__first_name', 'employee__user__last_name',
+    'employee__manager_id', 'employee__department_id', 'leave_type__name', 'start_date', 'end_date', 'status',
+]
+
+
+def _as_overlap(row):
+    return {
+        'id': row['id'],
+        'employee_id': row['employee_id'],
+        'employee_code': row['employee__employee_id'],
+        'employee_name': f"{row['employee__user__first_name']} {row['employee__user__last_name']}".strip(),
+        'leave_type': row['leave_type__name'],
+        'start_date': row['start_date'],
+        'end_date': row['end_date'],
+        'status': row['status'],
+    }
+
+
+class LeaveOverlapIndex:
+    """
+    Interval trees of blocking leave per manager and per department,
+    loaded for a date window in a single query.
+    """
+
+    def __init__(self, rows):
+        by_manager, by_department = defaultdict(list), defaultdict(list)
+        for row in rows:
+            interval = (row['start_date'], row['end_date'], row)
+            if row['employee__manager_id']:
+                by_manager[row['employee__manager_id']].append(interval)
+            if row['employee__department_id']:
+                by_department[row['employee__department_id']].append(interval)
+        self.by_manager = {key: IntervalTree(intervals) for key, intervals in by_manager.items()}
+        self.by_department = {key: IntervalTree(intervals) for key, intervals in by_department.items()}
+
+    @classmethod
+    def load(cls, start_date, end_date, manager_ids=(), department_ids=()):
+        scope = Q(employee__manager_id__in=[pk for pk in manager_ids if pk])
+        scope |= Q(employee__department_id__in=[pk for pk in department_ids if pk])
+        rows = LeaveRequest.objects.filter(
+            scope, status__in=BLOCKING_STATUSES, start_date__lte=end_date, end_date__gte=start_date,
+        ).values(*OVERLAP_FIELDS)
+        return cls(rows)
+
+    def overlapping(self, employee, start_date, end_date):
+        """Other employees' blocking leave overlapping the range, flagged by relation"""
+        matches = {}
+        for relation, trees, key in [
+            ('same_team', self.by_manager, employee.manager_id),
+            ('same_department', self.by_department, employee.department_id),
+        ]:
+            tree = trees.get(key) if key else None
+            if tree is None:
+                continue
+            for row in tree.overlapping(start_date, end_date):
+                if row['employee_id'] == employee.id:
+                    continue
+                match = matches.get(row['id'])
+                if match is None:
+                    match = matches[row['id']] = dict(_as_overlap(row), same_team=False, same_department=False)
+                match[relation] = True
+        return sorted(matches.values(), key=lambda match: (match['start_date'], match['employee_name']))
+
+
+def find_overlaps(leave_requests):
+    """
+    Map each request id to the other blocking leave overlapping it in the
+    requester's team or department. Expects `employee` to be loaded.
+    """
+    leave_requests = list(leave_requests)
+    if not leave_requests:
+        return {}
+    index = LeaveOverlapIndex.load(
+        min(request.start_date for request in leave_requests),
+        max(request.end_date for request in leave_requests),
+        manager_ids={request.employee.manager_id for request in leave_requests},
+        department_ids={request.employee.department_id for request in leave_requests},
+    )
+    return {
+        request.id: index.overlapping(request.employee, request.start_date, request.end_date)
+        for request in leave_requests
+    }
+
+
+def team_coverage(employees, start_date, end_date):
+    """
+    Day-by-day count of `employees` out on blocking leave between two dates,
+    plus the leave itself. `employees` is a queryset of the team.
+    """
+    team_size = employees.count()
+    rows = list(LeaveRequest.objects.filter(
+        employee__in=employees.values('id'), status__in=BLOCKING_STATUSES,
+        start_date__lte=end_date, end_date__gte=start_date,
+    ).values(*OVERLAP_FIELDS).order_by('start_date'))
+    tree = IntervalTree((row['start_date'], row['end_date'], row) for row in rows)
+    calendar = get_working_day_calendar()
+
+    days = []
+    day = start_date
+    while day <= end_date:
+        out = tree.overlapping(day, day)
+        approved = {row['employee_id'] for row in out if row['status'] == 'APPROVED'}
+        pending = {row['employee_id'] for row in out} - approved
+        days.append({
+            'date': day,
+            'is_working_day': calendar.is_working_day(day),
+            'on_leave': len(approved),
+            'pending': len(pending),
+            'available': team_size - len(approved),
+        })
+        day += timedelta(days=1)
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'team_size': team_size,
+        'days': days,
+        'leaves': [_as_overlap(row) for row in rows],
+    }
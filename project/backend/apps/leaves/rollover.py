@@ -0,0 +1,158 @@
+"""
+Leave year rollover
+Creates next-year LeaveBalance rows for every active employee and leave
+type, applying carry-forward policy with a handful of set-based statements.
+"""
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from apps.employees.models import Employee
+from .models import LeaveBalance, LeaveLedgerEntry, LeaveType
+
+# Per-vendor SQL for a new UUID primary key (in the column format Django
+# stores it in) and for two-argument min/max
+VENDOR_SQL = {
+    'sqlite': {'uuid': 'lower(hex(randomblob(16)))', 'least': 'min', 'greatest': 'max'},
+    'postgresql': {'uuid': 'gen_random_uuid()', 'least': 'LEAST', 'greatest': 'GREATEST'},
+    'mysql': {'uuid': "REPLACE(UUID(), '-', '')", 'least': 'LEAST', 'greatest': 'GREATEST'},
+}
+
+
+def _tables():
+    quote = connection.ops.quote_name
+    return {
+        'balance': quote(LeaveBalance._meta.db_table),
+        'entry': quote(LeaveLedgerEntry._meta.db_table),
+        'employee': quote(Employee._meta.db_table),
+        'leave_type': quote(LeaveType._meta.db_table),
+    }
+
+
+def _rollover_sql():
+    sql = dict(_tables(), **VENDOR_SQL[connection.vendor])
+    entry_columns = (
+        "id, created_at, updated_at, balance_id, entry_type, days, note, "
+        "total_days_after, used_days_after, carry_forward_days_after"
+    )
+    carry = (
+        f"{sql['least']}({sql['greatest']}(pb.total_days - pb.used_days, 0), lt.max_carry_forward_days)"
+    )
+    return [
+        # 1. Missing next-year balances: yearly allowance plus the capped carry
+        f"INSERT INTO {sql['balance']} (id, created_at, updated_at, employee_id, leave_type_id, year, "
+        f"total_days, used_days, carry_forward_days) "
+        f"SELECT {sql['uuid']}, %(opened_at)s, %(opened_at)s, x.employee_id, x.leave_type_id, %(next_year)s, "
+        f"x.allowance + x.carry, 0, x.carry "
+        f"FROM (SELECT e.id AS employee_id, lt.id AS leave_type_id, lt.days_allowed_per_year AS allowance, "
+        f"CASE WHEN lt.carry_forward_allowed = %(true)s AND pb.id IS NOT NULL THEN {carry} ELSE 0 END AS carry "
+        f"FROM {sql['employee']} e CROSS JOIN {sql['leave_type']} lt "
+        f"LEFT JOIN {sql['balance']} pb ON pb.employee_id = e.id "
+        f"AND pb.leave_type_id = lt.id AND pb.year = %(year)s "
+        f"WHERE e.employment_status = 'ACTIVE' AND lt.is_active = %(true)s "
+        f"AND NOT EXISTS (SELECT 1 FROM {sql['balance']} nb WHERE nb.employee_id = e.id "
+        f"AND nb.leave_type_id = lt.id AND nb.year = %(next_year)s)) x",
+
+        # 2. ACCRUAL entries for the balances opened by statement 1
+        f"INSERT INTO {sql['entry']} ({entry_columns}) "
+        f"SELECT {sql['uuid']}, %(opened_at)s, %(opened_at)s, b.id, 'ACCRUAL', "
+        f"b.total_days - b.carry_forward_days, 'Yearly allowance', b.total_days - b.carry_forward_days, 0, 0 "
+        f"FROM {sql['balance']} b "
+        f"WHERE b.year = %(next_year)s AND b.created_at = %(opened_at)s "
+        f"AND b.total_days - b.carry_forward_days > 0",
+
+        # 3. CARRY_FORWARD entries for the balances opened by statement 1
+        f"INSERT INTO {sql['entry']} ({entry_columns}) "
+        f"SELECT {sql['uuid']}, %(carried_at)s, %(carried_at)s, b.id, 'CARRY_FORWARD', b.carry_forward_days, "
+        f"%(carry_note)s, b.total_days, 0, b.carry_forward_days "
+        f"FROM {sql['balance']} b "
+        f"WHERE b.year = %(next_year)s AND b.created_at = %(opened_at)s AND b.carry_forward_days > 0",
+
+        # 4. CARRY_FORWARD entries for next-year balances opened earlier (e.g. by
+        #    approving leave in advance) that have not been carried yet
+        f"INSERT INTO {sql['entry']} ({entry_columns}) "
+        f"SELECT {sql['uuid']}, %(adjusted_at)s, %(adjusted_at)s, x.id, 'CARRY_FORWARD', x.carry, "
+        f"%(carry_note)s, x.total_days + x.carry, x.used_days, x.carry_forward_days + x.carry "
+        f"FROM (SELECT nb.id, nb.total_days, nb.used_days, nb.carry_forward_days, {carry} AS carry "
+        f"FROM {sql['balance']} nb "
+        f"JOIN {sql['balance']} pb ON pb.employee_id = nb.employee_id "
+        f"AND pb.leave_type_id = nb.leave_type_id AND pb.year = %(year)s "
+        f"JOIN {sql['leave_type']} lt ON lt.id = nb.leave_type_id "
+        f"WHERE nb.year = %(next_year)s AND nb.created_at <> %(opened_at)s "
+        f"AND lt.carry_forward_allowed = %(true)s "
+        f"AND NOT EXISTS (SELECT 1 FROM {sql['entry']} l WHERE l.balance_id = nb.id "
+        f"AND l.entry_type = 'CARRY_FORWARD')) x "
+        f"WHERE x.carry > 0",
+
+        # 5. Apply the entries written by statement 4 to those balances
+        f"UPDATE {sql['balance']} SET "
+        f"total_days = total_days + (SELECT l.days FROM {sql['entry']} l WHERE l.balance_id = {sql['balance']}.id "
+        f"AND l.entry_type = 'CARRY_FORWARD' AND l.created_at = %(adjusted_at)s), "
+        f"carry_forward_days = carry_forward_days + (SELECT l.days FROM {sql['entry']} l "
+        f"WHERE l.balance_id = {sql['balance']}.id AND l.entry_type = 'CARRY_FORWARD' "
+        f"AND l.created_at = %(adjusted_at)s), "
+        f"updated_at = %(adjusted_at)s "
+        f"WHERE id IN (SELECT l.balance_id FROM {sql['entry']} l WHERE l.entry_type = 'CARRY_FORWARD' "
+        f"AND l.created_at = %(adjusted_at)s)",
+    ]
+
+
+def rollover_leave_year(year, dry_run=False):
+    """
+    Open `year + 1` balances from `year`. Safe to re-run: existing balances
+    and already carried balances are left alone. Returns a report of what
+    changed; with dry_run the changes are rolled back after reporting.
+    """
+    if connection.vendor not in VENDOR_SQL:
+        raise NotImplementedError(f"Leave rollover is not implemented for {connection.vendor}")
+
+    # Distinct timestamps identify this run's rows and keep ledger order
+    opened_at = timezone.now()
+    carried_at = opened_at + timedelta(microseconds=1)
+    adjusted_at = opened_at + timedelta(microseconds=2)
+    adapt = connection.ops.adapt_datetimefield_value
+    params = {
+        'year': year,
+        'next_year': year + 1,
+        'opened_at': adapt(opened_at),
+        'carried_at': adapt(carried_at),
+        'adjusted_at': adapt(adjusted_at),
+        'carry_note': f'Carried forward from {year}',
+        'true': True,
+    }
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            counts = []
+            for statement in _rollover_sql():
+                cursor.execute(statement, params)
+                counts.append(cursor.rowcount)
+
+        opened = dict(LeaveBalance.objects.filter(
+            year=year + 1, created_at=opened_at
+        ).values_list('leave_type__code').annotate(count=Count('id')).order_by())
+        carried = {
+            row['balance__leave_type__code']: row
+            for row in LeaveLedgerEntry.objects.filter(
+                entry_type='CARRY_FORWARD', created_at__in=[carried_at, adjusted_at]
+            ).values('balance__leave_type__code').annotate(count=Count('id'), days=Sum('days')).order_by()
+        }
+        report = {
+            'year': year + 1,
+            'dry_run': dry_run,
+            'balances_created': counts[0],
+            'balances_carried_forward': counts[2] + counts[3],
+            'days_carried_forward': sum((row['days'] for row in carried.values()), 0),
+            'leave_types': [
+                {
+                    'code': code,
+                    'balances_created': opened.get(code, 0),
+                    'balances_carried_forward': carried[code]['count'] if code in carried else 0,
+                    'days_carried_forward': carried[code]['days'] if code in carried else 0,
+                }
+                for code in sorted(set(opened) | set(carried))
+            ],
+        }
+        if dry_run:
+            transaction.set_rollback(True)
+    return report
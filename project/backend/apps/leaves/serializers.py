@@ -2,8 +2,10 @@
 Leave management serializers
 """
 from rest_framework import serializers
-from .models import LeaveType, LeaveBalance, LeaveRequest, Holiday, LeaveRequestComment
+from .models import LeaveType, LeaveBalance, LeaveRequest, Holiday, LeaveRequestComment, LeaveLedgerEntry
+from .working_days import count_working_days
 from apps.employees.serializers import EmployeeListSerializer
+from apps.core.reference_data import ReferenceField
 from datetime import datetime
 
 class LeaveTypeSerializer(serializers.ModelSerializer):
@@ -14,7 +16,7 @@ class LeaveTypeSerializer(serializers.ModelSerializer):
 
 class LeaveBalanceSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
-    leave_type_name = serializers.CharField(source='leave_type.name', read_only=True)
+    leave_type_name = ReferenceField(LeaveType, 'name', source='leave_type_id')
     available_days = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
     
     class Meta:
@@ -22,9 +24,21 @@ class LeaveBalanceSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+class LeaveLedgerEntrySerializer(serializers.ModelSerializer):
+    created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
+    
+    class Meta:
+        model = LeaveLedgerEntry
+        fields = [
+            'id', 'created_at', 'entry_type', 'days', 'leave_request', 'created_by',
+            'created_by_name', 'note', 'total_days_after', 'used_days_after',
+            'carry_forward_days_after'
+        ]
+        read_only_fields = fields
+
 class LeaveRequestSerializer(serializers.ModelSerializer):
     employee_name = serializers.CharField(source='employee.full_name', read_only=True)
-    leave_type_name = serializers.CharField(source='leave_type.name', read_only=True)
+    leave_type_name = ReferenceField(LeaveType, 'name', source='leave_type_id')
     approved_by_name = serializers.CharField(source='approved_by.get_full_name', read_only=True)
     handover_to_name = serializers.CharField(source='handover_to.full_name', read_only=True)
     
@@ -33,7 +47,7 @@ class LeaveRequestSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = [
             'id', 'created_at', 'updated_at', 'employee', 'days_requested',
-            'applied_date', 'approved_by', 'approved_date'
+            'applied_date', 'approved_by', 'approved_date', 'status', 'rejection_reason'
         ]
     
     def validate(self, attrs):
@@ -43,11 +57,21 @@ class LeaveRequestSerializer(serializers.ModelSerializer):
         if start_date and end_date and start_date > end_date:
             raise serializers.ValidationError("Start date must be before end date")
         
+        if start_date and end_date and count_working_days(start_date, end_date) == 0:
+            raise serializers.ValidationError("The selected dates contain no working days")
+        
         if start_date and start_date < datetime.now().date():
             raise serializers.ValidationError("Cannot apply for past dates")
         
         return attrs
 
+class PendingLeaveRequestSerializer(LeaveRequestSerializer):
+    """Pending request plus overlapping team/department leave from context['overlaps']"""
+    overlaps = serializers.SerializerMethodField()
+    
+    def get_overlaps(self, obj):
+        return self.context.get('overlaps', {}).get(obj.id, [])
+
 class LeaveRequestCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = LeaveRequest
@@ -56,6 +80,18 @@ class LeaveRequestCreateSerializer(serializers.ModelSerializer):
             'handover_to', 'handover_notes'
         ]
     
+    def validate(self, attrs):
+        start_date = attrs.get('start_date')
+        end_date = attrs.get('end_date')
+        
+        if start_date and end_date:
+            if start_date > end_date:
+                raise serializers.ValidationError("Start date must be before end date")
+            if count_working_days(start_date, end_date) == 0:
+                raise serializers.ValidationError("The selected dates contain no working days")
+        
+        return attrs
+    
     def create(self, validated_data):
         request = self.context['request']
         employee = request.user.employee_profile
@@ -68,6 +104,14 @@ class HolidaySerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+class LeaveBulkReviewSerializer(serializers.Serializer):
+    """Ids of leave requests to approve or reject in one call"""
+    ids = serializers.ListField(
+        child=serializers.UUIDField(), allow_empty=False, max_length=1000
+    )
+    rejection_reason = serializers.CharField(required=False, allow_blank=True, default='')
+    comment = serializers.CharField(required=False, allow_blank=True, default='')
+
 class LeaveRequestCommentSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     
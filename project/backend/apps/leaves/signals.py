@@ -0,0 +1,35 @@
+"""
+Leave signal handlers
+"""
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .inbox import adjust_pending_counts, approver_ids
+from .models import Holiday, LeaveRequest
+from .working_days import invalidate_working_day_calendar
+
+
+@receiver([post_save, post_delete], sender=Holiday)
+def holiday_changed(sender, **kwargs):
+    invalidate_working_day_calendar()
+
+
+@receiver(post_save, sender=LeaveRequest)
+def leave_request_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created and not hasattr(instance, '_loaded_status'):
+        return
+    was_pending = not created and instance._loaded_status == 'PENDING'
+    is_pending = instance.status == 'PENDING'
+    instance._loaded_status = instance.status
+    if was_pending != is_pending:
+        approvers = approver_ids([instance.employee_id])[instance.employee_id]
+        adjust_pending_counts([(approvers, 1 if is_pending else -1)])
+
+
+@receiver(pre_delete, sender=LeaveRequest)
+def leave_request_deleted(sender, instance, **kwargs):
+    # Check the stored status: the instance being deleted may be stale
+    if LeaveRequest.objects.filter(pk=instance.pk, status='PENDING').exists():
+        approvers = approver_ids([instance.employee_id])[instance.employee_id]
+        adjust_pending_counts([(approvers, -1)])
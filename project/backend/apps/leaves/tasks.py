@@ -0,0 +1,17 @@
+"""
+Leave background tasks
+"""
+from celery import shared_task
+from django.utils import timezone
+from .rollover import rollover_leave_year
+
+
+@shared_task
+def rollover_leave_year_task(year=None):
+    """Open next-year leave balances; defaults to rolling over last year"""
+    year = year or timezone.localdate().year - 1
+    report = rollover_leave_year(year)
+    report['days_carried_forward'] = str(report['days_carried_forward'])
+    for row in report['leave_types']:
+        row['days_carried_forward'] = str(row['days_carried_forward'])
+    return report
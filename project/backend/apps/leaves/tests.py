@@ -0,0 +1,534 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from importlib import import_module
+import random
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.core.cache import bump_version
+from apps.core.models import Department, Notification, Organization
+from apps.employees.models import Employee
+from .ledger import (
+    ENTRY_EFFECTS, InsufficientLeaveBalance, LeaveActionRejected, approve_leave, balance_as_of,
+    cancel_leave, post_entry,
+)
+from .inbox import ALL_REQUESTS, BADGE_KEY, inbox_queryset, pending_count
+from .models import Holiday, LeaveBalance, LeaveLedgerEntry, LeaveRequest, LeaveRequestComment, LeaveType
+from .overlaps import find_overlaps, team_coverage
+from .rollover import rollover_leave_year
+from .serializers import LeaveRequestSerializer
+from .working_days import WorkingDayCalendar
+
+# Monday; requests from here to Wednesday are three working days
+MONDAY = date(2030, 3, 4)
+
+
+def create_employee(code, role='EMPLOYEE', manager=None):
+    user = User.objects.create_user(
+        email=f'{code.lower()}@example.com', username=code.lower(), password='secret',
+        first_name='Test', last_name=code, role=role,
+    )
+    return Employee.objects.create(user=user, employee_id=code, date_of_joining=date(2020, 1, 1), manager=manager)
+
+
+def create_request(employee, leave_type, start_date=MONDAY, days=3):
+    return LeaveRequest.objects.create(
+        employee=employee, leave_type=leave_type, start_date=start_date,
+        end_date=start_date + timedelta(days=days - 1), days_requested=0, reason='Holiday',
+    )
+
+
+class LedgerReplayMixin:
+
+    def assert_ledger_matches(self, balance):
+        """Replaying the ledger gives every entry's running totals and the balance columns"""
+        totals = (Decimal('0'),) * 3
+        for entry in balance.ledger_entries.order_by('created_at'):
+            after = (entry.total_days_after, entry.used_days_after, entry.carry_forward_days_after)
+            if entry.entry_type == 'OPENING':
+                totals = after
+            effects = ENTRY_EFFECTS[entry.entry_type]
+            totals = tuple(
+                total + effects.get(field, 0) * entry.days
+                for total, field in zip(totals, ['total_days', 'used_days', 'carry_forward_days'])
+            )
+            self.assertEqual(totals, after, entry)
+        balance.refresh_from_db()
+        self.assertEqual(totals, (balance.total_days, balance.used_days, balance.carry_forward_days))
+
+
+class LeaveLedgerTests(LedgerReplayMixin, TestCase):
+
+    def setUp(self):
+        self.lead = create_employee('LEAD100', role='TEAM_LEAD')
+        self.employee = create_employee('EMP100', manager=self.lead)
+        self.leave_type = LeaveType.objects.create(name='Casual Leave', code='CL', days_allowed_per_year=12)
+
+    def balance(self):
+        return LeaveBalance.objects.get(employee=self.employee, leave_type=self.leave_type, year=MONDAY.year)
+
+    def test_approve_and_cancel_post_entries(self):
+        leave_request = create_request(self.employee, self.leave_type)
+        approve_leave(leave_request, self.lead.user)
+
+        balance = self.balance()
+        self.assertEqual((balance.total_days, balance.used_days), (Decimal('12'), Decimal('3')))
+        self.assertEqual(
+            list(balance.ledger_entries.values_list('entry_type', 'days', 'leave_request_id')),
+            [('ACCRUAL', Decimal('12'), None), ('CONSUMPTION', Decimal('3'), leave_request.pk)],
+        )
+        self.assert_ledger_matches(balance)
+
+        cancel_leave(leave_request, self.lead.user)
+        balance.refresh_from_db()
+        self.assertEqual(balance.used_days, Decimal('0'))
+        self.assertEqual(balance.ledger_entries.last().entry_type, 'REVERSAL')
+        self.assert_ledger_matches(balance)
+        with self.assertRaises(LeaveActionRejected):
+            cancel_leave(leave_request, self.lead.user)
+        self.assertEqual(balance.ledger_entries.count(), 3)
+
+    def test_overdraft_leaves_request_and_balance_untouched(self):
+        # Two weeks are ten working days, leaving two of the twelve
+        approve_leave(create_request(self.employee, self.leave_type, days=14), self.lead.user)
+        leave_request = create_request(self.employee, self.leave_type, start_date=MONDAY + timedelta(days=21))
+        with self.assertRaises(InsufficientLeaveBalance):
+            approve_leave(leave_request, self.lead.user)
+
+        leave_request.refresh_from_db()
+        self.assertEqual(leave_request.status, 'PENDING')
+        balance = self.balance()
+        self.assertEqual(balance.used_days, Decimal('10'))
+        self.assertFalse(balance.ledger_entries.filter(leave_request=leave_request).exists())
+        self.assert_ledger_matches(balance)
+
+    def test_stale_balances_do_not_lose_updates(self):
+        balance = LeaveBalance.objects.create(employee=self.employee, leave_type=self.leave_type, year=MONDAY.year)
+        stale = LeaveBalance.objects.get(pk=balance.pk)
+        post_entry(balance, 'ACCRUAL', Decimal('12'))
+        entry = post_entry(stale, 'CARRY_FORWARD', Decimal('2.5'))
+
+        self.assertEqual((entry.total_days_after, entry.carry_forward_days_after), (Decimal('14.5'), Decimal('2.5')))
+        self.assert_ledger_matches(balance)
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+    def test_opening_entries_match_existing_balances(self):
+        balance = LeaveBalance.objects.create(
+            employee=self.employee, leave_type=self.leave_type, year=MONDAY.year,
+            total_days=Decimal('14'), used_days=Decimal('4'), carry_forward_days=Decimal('2'),
+        )
+        migration = import_module('apps.leaves.migrations.0003_leaveledgerentry')
+        migration.open_existing_balances(django_apps, None)
+
+        entry = balance.ledger_entries.get()
+        self.assertEqual(entry.entry_type, 'OPENING')
+        self.assertEqual(
+            (entry.total_days_after, entry.used_days_after, entry.carry_forward_days_after),
+            (Decimal('14'), Decimal('4'), Decimal('2')),
+        )
+        # Later movements build on the opening totals
+        approve_leave(create_request(self.employee, self.leave_type), self.lead.user)
+        self.assert_ledger_matches(balance)
+        self.assertEqual(self.balance().used_days, Decimal('7'))
+
+    def test_balance_as_of_reads_the_ledger(self):
+        leave_request = create_request(self.employee, self.leave_type)
+        approve_leave(leave_request, self.lead.user)
+        cancel_leave(leave_request, self.lead.user)
+        balance = self.balance()
+        # Spread the entries over three days
+        days = [timezone.make_aware(datetime(2030, 1, day, 12)) for day in (1, 2, 3)]
+        for entry, moment in zip(balance.ledger_entries.order_by('created_at'), days):
+            LeaveLedgerEntry.objects.filter(pk=entry.pk).update(created_at=moment)
+
+        self.assertEqual(balance_as_of(balance, days[0] - timedelta(hours=1))['total_days'], Decimal('0'))
+        self.assertEqual(balance_as_of(balance, days[1])['used_days'], Decimal('3'))
+        self.assertEqual(balance_as_of(balance, days[2])['used_days'], Decimal('0'))
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.employee.user)
+        LeaveBalance.objects.filter(pk=balance.pk).update(year=timezone.now().year)
+        response = client.get(f'/api/v1/leaves/balances/{balance.pk}/ledger/', {'as_of': '2030-01-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(
+            (response.data['as_of']['total_days'], response.data['as_of']['used_days']),
+            (Decimal('12'), Decimal('3')),
+        )
+        response = client.get(f'/api/v1/leaves/balances/{balance.pk}/ledger/', {'as_of': '2030-13-02'})
+        self.assertEqual(response.status_code, 400)
+
+
+class LeaveRolloverTests(LedgerReplayMixin, TestCase):
+    YEAR = MONDAY.year - 1
+
+    def setUp(self):
+        self.lead = create_employee('LEAD200', role='TEAM_LEAD')
+        self.saver = create_employee('EMP200', manager=self.lead)
+        self.spender = create_employee('EMP201', manager=self.lead)
+        self.new_hire = create_employee('EMP202', manager=self.lead)
+        self.leaver = create_employee('EMP203')
+        Employee.objects.filter(pk=self.leaver.pk).update(employment_status='TERMINATED')
+        self.casual = LeaveType.objects.create(
+            name='Casual Leave', code='CL', days_allowed_per_year=12,
+            carry_forward_allowed=True, max_carry_forward_days=5,
+        )
+        self.sick = LeaveType.objects.create(name='Sick Leave', code='SL', days_allowed_per_year=10)
+        LeaveType.objects.create(name='Retired Leave', code='RL', days_allowed_per_year=3, is_active=False)
+        for employee, leave_type, used in [
+            (self.saver, self.casual, 4), (self.saver, self.sick, 2),
+            (self.spender, self.casual, 14), (self.leaver, self.casual, 0),
+        ]:
+            LeaveBalance.objects.create(
+                employee=employee, leave_type=leave_type, year=self.YEAR,
+                total_days=leave_type.days_allowed_per_year, used_days=used,
+            )
+
+    def balances(self):
+        return {
+            (balance.employee.employee_id, balance.leave_type.code): (
+                balance.total_days, balance.used_days, balance.carry_forward_days
+            )
+            for balance in LeaveBalance.objects.filter(year=self.YEAR + 1).select_related('employee', 'leave_type')
+        }
+
+    def test_carry_forward_is_capped_on_a_fresh_allowance(self):
+        report = rollover_leave_year(self.YEAR)
+
+        # 8 unused days are capped at 5, an overdrawn balance carries
+        # nothing and neither does a type without carry-forward
+        self.assertEqual(self.balances(), {
+            ('EMP200', 'CL'): (Decimal('17'), Decimal('0'), Decimal('5')),
+            ('EMP200', 'SL'): (Decimal('10'), Decimal('0'), Decimal('0')),
+            ('EMP201', 'CL'): (Decimal('12'), Decimal('0'), Decimal('0')),
+            ('EMP201', 'SL'): (Decimal('10'), Decimal('0'), Decimal('0')),
+            ('EMP202', 'CL'): (Decimal('12'), Decimal('0'), Decimal('0')),
+            ('EMP202', 'SL'): (Decimal('10'), Decimal('0'), Decimal('0')),
+            ('LEAD200', 'CL'): (Decimal('12'), Decimal('0'), Decimal('0')),
+            ('LEAD200', 'SL'): (Decimal('10'), Decimal('0'), Decimal('0')),
+        })
+        self.assertEqual(
+            (report['balances_created'], report['balances_carried_forward'], report['days_carried_forward']),
+            (8, 1, Decimal('5')),
+        )
+        carried = LeaveBalance.objects.get(employee=self.saver, leave_type=self.casual, year=self.YEAR + 1)
+        self.assertEqual(
+            list(carried.ledger_entries.values_list('entry_type', 'days')),
+            [('ACCRUAL', Decimal('12')), ('CARRY_FORWARD', Decimal('5'))],
+        )
+        for balance in LeaveBalance.objects.filter(year=self.YEAR + 1):
+            self.assert_ledger_matches(balance)
+
+    def test_rerun_changes_nothing(self):
+        rollover_leave_year(self.YEAR)
+        balances = self.balances()
+        entries = LeaveLedgerEntry.objects.count()
+
+        report = rollover_leave_year(self.YEAR)
+        self.assertEqual((report['balances_created'], report['balances_carried_forward']), (0, 0))
+        self.assertEqual(self.balances(), balances)
+        self.assertEqual(LeaveLedgerEntry.objects.count(), entries)
+
+    def test_balance_opened_in_advance_is_carried_once(self):
+        # Leave approved before the rollover opens the balance early
+        approve_leave(create_request(self.saver, self.casual), self.lead.user)
+        rollover_leave_year(self.YEAR)
+        rollover_leave_year(self.YEAR)
+
+        balance = LeaveBalance.objects.get(employee=self.saver, leave_type=self.casual, year=self.YEAR + 1)
+        self.assertEqual(
+            (balance.total_days, balance.used_days, balance.carry_forward_days),
+            (Decimal('17'), Decimal('3'), Decimal('5')),
+        )
+        self.assertEqual(balance.ledger_entries.filter(entry_type='CARRY_FORWARD').count(), 1)
+        self.assert_ledger_matches(balance)
+
+    def test_dry_run_saves_nothing(self):
+        report = rollover_leave_year(self.YEAR, dry_run=True)
+        self.assertEqual(report['balances_created'], 8)
+        self.assertFalse(LeaveBalance.objects.filter(year=self.YEAR + 1).exists())
+        self.assertFalse(LeaveLedgerEntry.objects.exists())
+
+
+class BulkReviewTests(LedgerReplayMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.lead = create_employee('LEAD300', role='TEAM_LEAD')
+        self.hr = create_employee('HR300', role='HR_MANAGER')
+        self.first = create_employee('EMP300', manager=self.lead)
+        self.second = create_employee('EMP301', manager=self.lead)
+        self.leave_type = LeaveType.objects.create(name='Casual Leave', code='CL', days_allowed_per_year=12)
+        # Ten working days, then three more that no longer fit in the twelve
+        self.long = create_request(self.first, self.leave_type, days=14)
+        self.over = create_request(self.first, self.leave_type, start_date=MONDAY + timedelta(days=21))
+        self.short = create_request(self.second, self.leave_type)
+        self.rejected = create_request(self.second, self.leave_type, start_date=MONDAY + timedelta(days=7))
+        self.rejected.status = 'REJECTED'
+        self.rejected.save()
+        # A reason left from an edit must not be copied to other rows
+        LeaveRequest.objects.filter(pk=self.long.pk).update(rejection_reason='Stale reason')
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.lead.user)
+
+    def review(self, action, ids, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/v1/leaves/requests/{action}/', dict(data, ids=[str(pk) for pk in ids]), format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_bulk_approve_debits_balances_and_skips_overdrafts(self):
+        unknown = '00000000-0000-0000-0000-000000000000'
+        data = self.review(
+            'bulk_approve', [self.long.pk, self.over.pk, self.short.pk, self.rejected.pk, unknown],
+            comment='Enjoy',
+        )
+        self.assertEqual(data['summary'], {'approved': 2, 'rejected': 0, 'skipped': 2, 'not_found': 1})
+        self.assertIn('Insufficient', data['results'][1]['detail'])
+
+        statuses = dict(LeaveRequest.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[pk] for pk in (self.long.pk, self.over.pk, self.short.pk, self.rejected.pk)],
+            ['APPROVED', 'PENDING', 'APPROVED', 'REJECTED'],
+        )
+        approved = LeaveRequest.objects.filter(status='APPROVED')
+        self.assertEqual(set(approved.values_list('rejection_reason', flat=True)), {''})
+        self.assertEqual(set(approved.values_list('approved_by', flat=True)), {self.lead.user.pk})
+        self.assertEqual(LeaveRequestComment.objects.filter(comment='Enjoy').count(), 2)
+
+        for employee, used in [(self.first, Decimal('10')), (self.second, Decimal('3'))]:
+            balance = LeaveBalance.objects.get(employee=employee, leave_type=self.leave_type)
+            self.assertEqual(balance.used_days, used)
+            self.assert_ledger_matches(balance)
+
+    def test_bulk_reject_writes_the_given_reason(self):
+        data = self.review('bulk_reject', [self.long.pk, self.short.pk], rejection_reason='Release week')
+        self.assertEqual(data['summary']['rejected'], 2)
+        self.assertEqual(
+            list(LeaveRequest.objects.filter(pk__in=[self.long.pk, self.short.pk]).values_list(
+                'status', 'rejection_reason'
+            )),
+            [('REJECTED', 'Release week')] * 2,
+        )
+        self.assertFalse(LeaveBalance.objects.exists())
+        self.assertEqual(
+            Notification.objects.filter(notification_type='LEAVE_REJECTED', message__endswith='Release week').count(),
+            2,
+        )
+
+    def test_badges_follow_bulk_reviews(self):
+        self.assertEqual((pending_count(self.lead.user), pending_count(self.hr.user)), (3, 3))
+        self.review('bulk_approve', [self.long.pk, self.over.pk, self.short.pk])
+
+        # The cached counters were adjusted, not dropped and recounted
+        self.assertEqual(cache.get(BADGE_KEY.format(self.lead.user.id)), 1)
+        self.assertEqual(cache.get(BADGE_KEY.format(ALL_REQUESTS)), 1)
+        self.assertEqual(pending_count(self.lead.user), inbox_queryset(self.lead.user).count())
+
+
+class LeaveOverlapTests(TestCase):
+
+    def setUp(self):
+        organization = Organization.objects.create(name='Acme', code='ACME')
+        department = Department.objects.create(name='Support', code='SUP', organization=organization)
+        self.lead = create_employee('LEAD500', role='TEAM_LEAD')
+        self.first = create_employee('EMP500', manager=self.lead)
+        self.second = create_employee('EMP501', manager=self.lead)
+        self.colleague = create_employee('EMP502')
+        self.outsider = create_employee('EMP503')
+        Employee.objects.filter(pk__in=[self.first.pk, self.second.pk, self.colleague.pk]).update(
+            department=department
+        )
+        self.leave_type = LeaveType.objects.create(name='Casual Leave', code='CL', days_allowed_per_year=12)
+
+        self.first_request = create_request(self.first, self.leave_type)
+        self.second_request = create_request(self.second, self.leave_type, start_date=MONDAY + timedelta(days=2))
+        self.colleague_request = create_request(
+            self.colleague, self.leave_type, start_date=MONDAY + timedelta(days=1), days=1
+        )
+        create_request(self.outsider, self.leave_type)
+        rejected = create_request(self.second, self.leave_type, start_date=MONDAY, days=2)
+        LeaveRequest.objects.filter(pk=self.second_request.pk).update(status='APPROVED')
+        LeaveRequest.objects.filter(pk=rejected.pk).update(status='REJECTED')
+
+    def test_overlaps_are_flagged_by_team_and_department(self):
+        requests = LeaveRequest.objects.filter(
+            pk__in=[self.first_request.pk, self.second_request.pk]
+        ).select_related('employee')
+        overlaps = find_overlaps(requests)
+        self.assertEqual(
+            [(match['id'], match['same_team'], match['same_department']) for match in overlaps[self.first_request.pk]],
+            [(self.colleague_request.pk, False, True), (self.second_request.pk, True, True)],
+        )
+        self.assertEqual(
+            [(match['id'], match['status']) for match in overlaps[self.second_request.pk]],
+            [(self.first_request.pk, 'PENDING')],
+        )
+        self.assertEqual(find_overlaps([]), {})
+
+    def test_team_coverage_counts_each_day(self):
+        coverage = team_coverage(
+            Employee.objects.filter(manager=self.lead), MONDAY, MONDAY + timedelta(days=5)
+        )
+        self.assertEqual(coverage['team_size'], 2)
+        self.assertEqual(
+            [(day['on_leave'], day['pending'], day['available'], day['is_working_day']) for day in coverage['days']],
+            [(0, 1, 2, True), (0, 1, 2, True), (1, 1, 1, True), (1, 0, 1, True), (1, 0, 1, True), (0, 0, 2, False)],
+        )
+        self.assertEqual(
+            [row['id'] for row in coverage['leaves']], [self.first_request.pk, self.second_request.pk]
+        )
+
+    def test_pending_requests_carry_their_overlaps(self):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.lead.user)
+        response = client.get('/api/v1/leaves/requests/pending/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data], [str(self.first_request.pk)])
+        self.assertEqual(
+            [(match['employee_code'], match['same_team']) for match in response.data[0]['overlaps']],
+            [('EMP502', False), ('EMP501', True)],
+        )
+
+        # The inbox pages through the same requests
+        response = client.get('/api/v1/leaves/requests/inbox/')
+        self.assertEqual(
+            [match['employee_code'] for match in response.data['results'][0]['overlaps']], ['EMP502', 'EMP501']
+        )
+
+
+class InboxScopeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.head = create_employee('LEAD400', role='TEAM_LEAD')
+        self.lead = create_employee('LEAD401', role='TEAM_LEAD', manager=self.head)
+        self.employee = create_employee('EMP400', manager=self.lead)
+        self.leave_type = LeaveType.objects.create(name='Casual Leave', code='CL', days_allowed_per_year=12)
+        self.requests = {
+            employee.employee_id: create_request(employee, self.leave_type)
+            for employee in (self.head, self.lead, self.employee)
+        }
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def inbox(self, lead):
+        self.client.force_authenticate(lead.user)
+        inbox = self.client.get('/api/v1/leaves/requests/inbox/').data
+        pending = self.client.get('/api/v1/leaves/requests/pending/').data
+        self.assertEqual({row['id'] for row in inbox['results']}, {row['id'] for row in pending})
+        self.assertEqual(inbox['count'], len(inbox['results']))
+        return sorted(row['employee_name'].split()[-1] for row in inbox['results'])
+
+    def test_skip_level_leads_share_the_inbox(self):
+        self.assertEqual(self.inbox(self.head), ['EMP400', 'LEAD401'])
+        self.assertEqual(self.inbox(self.lead), ['EMP400'])
+
+        # The skip-level lead approves; both badges drop
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f"/api/v1/leaves/requests/{self.requests['EMP400'].pk}/approve/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cache.get(BADGE_KEY.format(self.head.user.id)), 1)
+        self.assertEqual(cache.get(BADGE_KEY.format(self.lead.user.id)), 0)
+        self.assertEqual(self.inbox(self.lead), [])
+
+        # Leads see their own request but do not review it
+        response = self.client.post(f"/api/v1/leaves/requests/{self.requests['LEAD401'].pk}/approve/")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(f"/api/v1/leaves/requests/{self.requests['LEAD401'].pk}/")
+        self.assertEqual(response.status_code, 200)
+
+
+class WorkingDayCalendarTests(SimpleTestCase):
+
+    def test_counts_match_a_day_by_day_scan(self):
+        rng = random.Random(16)
+        start = date(2027, 1, 1)
+        holidays = {start + timedelta(days=rng.randrange(3 * 366)) for _ in range(40)}
+        working_day_calendar = WorkingDayCalendar(holidays, [5, 6])
+
+        def scan(first, last):
+            days = (first + timedelta(days=n) for n in range((last - first).days + 1))
+            return sum(1 for day in days if day.weekday() < 5 and day not in holidays)
+
+        # Ranges inside a year, across year ends and over the 2028 leap day
+        for _ in range(300):
+            first = start + timedelta(days=rng.randrange(3 * 366 - 40))
+            last = first + timedelta(days=rng.randrange(400))
+            self.assertEqual(working_day_calendar.count(first, last), scan(first, last), (first, last))
+        self.assertEqual(working_day_calendar.count_in_month(2028, 2), scan(date(2028, 2, 1), date(2028, 2, 29)))
+        self.assertEqual(working_day_calendar.count(date(2027, 5, 2), date(2027, 5, 1)), 0)
+
+    def test_weekends_and_holidays_are_not_working_days(self):
+        saturday = MONDAY - timedelta(days=2)
+        working_day_calendar = WorkingDayCalendar([MONDAY], [5, 6])
+        self.assertEqual(
+            [working_day_calendar.is_working_day(saturday + timedelta(days=n)) for n in range(4)],
+            [False, False, False, True]
+        )
+        self.assertEqual(working_day_calendar.count(saturday, MONDAY), 0)
+        # Fridays off instead
+        self.assertEqual(WorkingDayCalendar([], [4]).count(saturday, saturday + timedelta(days=6)), 6)
+
+
+class LeaveRequestDaysTests(TestCase):
+
+    def setUp(self):
+        self.employee = create_employee('EMP130')
+        self.leave_type = LeaveType.objects.create(name='Casual Leave', code='CL', days_allowed_per_year=12)
+
+    def add_holiday(self, day, is_optional=False):
+        # The rolled-back holidays must not stay in this process's calendar
+        self.addCleanup(bump_version, 'leaves.working_days')
+        with self.captureOnCommitCallbacks(execute=True):
+            Holiday.objects.create(name='Founders Day', date=day, is_optional=is_optional)
+
+    def test_reviewed_requests_keep_the_days_they_were_approved_for(self):
+        approved = create_request(self.employee, self.leave_type)
+        approve_leave(approved, self.employee.user)
+        pending = create_request(self.employee, self.leave_type, start_date=MONDAY + timedelta(days=7))
+        self.add_holiday(MONDAY + timedelta(days=1))
+        self.add_holiday(MONDAY + timedelta(days=8))
+        self.add_holiday(MONDAY + timedelta(days=9), is_optional=True)
+
+        approved = LeaveRequest.objects.get(pk=approved.pk)
+        approved.handover_notes = 'Ask the lead'
+        approved.save()
+        pending.refresh_from_db()
+        pending.save()
+        self.assertEqual(LeaveRequest.objects.get(pk=approved.pk).days_requested, 3)
+        self.assertEqual(LeaveRequest.objects.get(pk=pending.pk).days_requested, 2)
+
+        # New dates are counted again
+        approved.end_date = MONDAY + timedelta(days=3)
+        approved.save()
+        self.assertEqual(LeaveRequest.objects.get(pk=approved.pk).days_requested, 3)
+
+    def test_ranges_without_working_days_are_rejected(self):
+        saturday = MONDAY + timedelta(days=5)
+        self.add_holiday(MONDAY + timedelta(days=7))
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.employee.user)
+        response = client.post('/api/v1/leaves/requests/', {
+            'leave_type': self.leave_type.pk, 'start_date': saturday,
+            'end_date': saturday + timedelta(days=2), 'reason': 'Long weekend',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('no working days', str(response.data))
+
+        leave_request = create_request(self.employee, self.leave_type)
+        serializer = LeaveRequestSerializer(leave_request, data={
+            'start_date': saturday, 'end_date': saturday + timedelta(days=1),
+        }, partial=True)
+        self.assertFalse(serializer.is_valid())
+        serializer = LeaveRequestSerializer(leave_request, data={
+            'start_date': saturday, 'end_date': saturday + timedelta(days=3),
+        }, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
@@ -5,26 +5,43 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
+from django.db import transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
+from rest_framework.exceptions import ValidationError
 from .models import LeaveType, LeaveBalance, LeaveRequest, Holiday, LeaveRequestComment
 from .serializers import (
     LeaveTypeSerializer, LeaveBalanceSerializer, LeaveRequestSerializer,
-    LeaveRequestCreateSerializer, HolidaySerializer, LeaveRequestCommentSerializer
+    LeaveRequestCreateSerializer, HolidaySerializer, LeaveRequestCommentSerializer,
+    LeaveLedgerEntrySerializer, PendingLeaveRequestSerializer, LeaveBulkReviewSerializer
+)
+from .overlaps import find_overlaps, team_coverage
+from .inbox import inbox_queryset, pending_count
+from apps.core.pagination import KeysetPagination
+from apps.core.reference_data import ReferenceListMixin, reference_rows
+from apps.employees.models import Employee
+from apps.employees.hierarchy import in_reporting_tree
+from .ledger import (
+    LeaveActionRejected, approve_leave, reject_leave, cancel_leave, balance_as_of, review_leave_requests
 )
 from apps.accounts.permissions import IsSuperAdminOrHRManager
 
-class LeaveTypeViewSet(viewsets.ModelViewSet):
+class LeaveTypeViewSet(ReferenceListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing leave types
     """
     queryset = LeaveType.objects.filter(is_active=True)  # Add queryset attribute
     serializer_class = LeaveTypeSerializer
+    reference_model = LeaveType
     
     def get_queryset(self):
         """Return active leave types for all users"""
         return LeaveType.objects.filter(is_active=True)
     
+    def reference_rows(self):
+        return reference_rows(LeaveType, is_active=True)
+    
     def get_permissions(self):
         """
         Set permissions based on action:
@@ -53,9 +70,9 @@ class LeaveBalanceViewSet(viewsets.ReadOnlyModelViewSet):
         if user.role in ['SUPER_ADMIN', 'HR_MANAGER']:
             return LeaveBalance.objects.filter(year=current_year)
         elif user.role == 'TEAM_LEAD':
-            # Team leads can see their team members' balances
+            # Team leads can see balances across their reporting tree
             return LeaveBalance.objects.filter(
-                Q(employee__user=user) | Q(employee__manager__user=user),
+                in_reporting_tree(user),
                 year=current_year
             )
         else:
@@ -66,6 +83,30 @@ class LeaveBalanceViewSet(viewsets.ReadOnlyModelViewSet):
                     year=current_year
                 )
             return LeaveBalance.objects.none()
+    
+    @action(detail=True, methods=['get'])
+    def ledger(self, request, pk=None):
+        """Ledger entries of a balance; ?as_of=YYYY-MM-DD adds the balance at the end of that day"""
+        balance = self.get_object()
+        as_of = request.query_params.get('as_of')
+        if as_of:
+            try:
+                day = parse_date(as_of)
+            except ValueError:
+                day = None
+            if day is None:
+                return Response(
+                    {'error': 'as_of must be in YYYY-MM-DD format'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        entries = balance.ledger_entries.select_related('created_by').order_by('created_at')
+        page = self.paginate_queryset(entries)
+        response = self.get_paginated_response(LeaveLedgerEntrySerializer(page, many=True).data)
+        if as_of:
+            moment = timezone.make_aware(datetime.combine(day, time.max))
+            response.data['as_of'] = dict(balance_as_of(balance, moment), date=day)
+        return response
 
 class LeaveRequestViewSet(viewsets.ModelViewSet):
     """
@@ -73,6 +114,7 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     """
     queryset = LeaveRequest.objects.all()  # Add queryset
     permission_classes = [IsAuthenticated]
+    review_actions = ['approve', 'reject', 'bulk_approve', 'bulk_reject', 'pending']
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -82,17 +124,22 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         
+        queryset = LeaveRequest.objects.select_related(
+            'employee__user', 'leave_type', 'approved_by', 'handover_to__user'
+        )
+        
         if user.role in ['SUPER_ADMIN', 'HR_MANAGER']:
-            return LeaveRequest.objects.all()
+            return queryset
         elif user.role == 'TEAM_LEAD':
-            # Team leads can see their team members' requests
-            return LeaveRequest.objects.filter(
-                Q(employee__user=user) | Q(employee__manager__user=user)
+            # Team leads can see requests across their reporting tree and
+            # review those below them, as their inbox lists them
+            return queryset.filter(
+                in_reporting_tree(user, include_self=self.action not in self.review_actions)
             )
         else:
             # Employees can only see their own requests
             if hasattr(user, 'employee_profile'):
-                return LeaveRequest.objects.filter(employee__user=user)
+                return queryset.filter(employee__user=user)
             return LeaveRequest.objects.none()
     
     def perform_create(self, serializer):
@@ -103,6 +150,17 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("Employee profile not found")
     
+    def perform_update(self, serializer):
+        """Reviewed requests are only changed through approve/reject/cancel"""
+        if serializer.instance.status != 'PENDING':
+            raise ValidationError('Only pending requests can be edited')
+        serializer.save()
+    
+    def perform_destroy(self, instance):
+        if instance.status != 'PENDING':
+            raise ValidationError('Only pending requests can be deleted; cancel approved requests instead')
+        instance.delete()
+    
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve leave request"""
@@ -113,17 +171,14 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
             )
         
         leave_request = self.get_object()
-        if leave_request.status != 'PENDING':
+        try:
+            approve_leave(leave_request, request.user)
+        except LeaveActionRejected as e:
             return Response(
-                {'error': 'Only pending requests can be approved'}, 
+                {'error': str(e)}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        leave_request.status = 'APPROVED'
-        leave_request.approved_by = request.user
-        leave_request.approved_date = timezone.now()
-        leave_request.save()
-        
         return Response({'status': 'Leave request approved'})
     
     @action(detail=True, methods=['post'])
@@ -136,21 +191,80 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
             )
         
         leave_request = self.get_object()
-        if leave_request.status != 'PENDING':
+        rejection_reason = request.data.get('reason', '')
+        try:
+            reject_leave(leave_request, request.user, rejection_reason)
+        except LeaveActionRejected as e:
             return Response(
-                {'error': 'Only pending requests can be rejected'}, 
+                {'error': str(e)}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        rejection_reason = request.data.get('reason', '')
-        leave_request.status = 'REJECTED'
-        leave_request.approved_by = request.user
-        leave_request.approved_date = timezone.now()
-        leave_request.rejection_reason = rejection_reason
-        leave_request.save()
-        
         return Response({'status': 'Leave request rejected'})
     
+    @action(detail=False, methods=['post'])
+    def bulk_approve(self, request):
+        """Approve many pending requests in one transaction"""
+        return self.bulk_review(request, approve=True)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_reject(self, request):
+        """Reject many pending requests in one transaction"""
+        return self.bulk_review(request, approve=False)
+    
+    def bulk_review(self, request, approve):
+        if request.user.role not in ['SUPER_ADMIN', 'HR_MANAGER', 'TEAM_LEAD']:
+            return Response(
+                {'error': 'Permission denied'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = LeaveBulkReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        with transaction.atomic():
+            results = review_leave_requests(
+                self.get_queryset(), serializer.validated_data['ids'], request.user, approve,
+                rejection_reason=serializer.validated_data['rejection_reason'],
+                comment=serializer.validated_data['comment'],
+            )
+        
+        summary = {'approved': 0, 'rejected': 0, 'skipped': 0, 'not_found': 0}
+        for result in results:
+            summary[result['status']] += 1
+        
+        return Response({
+            'summary': summary,
+            'results': results
+        })
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancel a pending or approved leave request, crediting back approved days"""
+        leave_request = self.get_object()
+        is_approver = request.user.role in ['SUPER_ADMIN', 'HR_MANAGER', 'TEAM_LEAD']
+        is_owner = leave_request.employee.user_id == request.user.id
+        if not is_approver and not is_owner:
+            return Response(
+                {'error': 'Permission denied'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if not is_approver and leave_request.status == 'APPROVED' and leave_request.start_date <= timezone.localdate():
+            return Response(
+                {'error': 'Approved leave that has already started can only be cancelled by an approver'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            cancel_leave(leave_request, request.user)
+        except LeaveActionRejected as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({'status': 'Leave request cancelled'})
+    
     @action(detail=False, methods=['get'])
     def pending(self, request):
         """Get pending leave requests for approval"""
@@ -160,21 +274,91 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        pending_requests = self.get_queryset().filter(status='PENDING')
-        serializer = self.get_serializer(pending_requests, many=True)
+        pending_requests = list(self.get_queryset().filter(status='PENDING'))
+        serializer = PendingLeaveRequestSerializer(
+            pending_requests, many=True,
+            context=dict(self.get_serializer_context(), overlaps=find_overlaps(pending_requests))
+        )
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def inbox(self, request):
+        """Cursor-paginated requests awaiting the user's approval, oldest first"""
+        if request.user.role not in ['SUPER_ADMIN', 'HR_MANAGER', 'TEAM_LEAD']:
+            return Response(
+                {'error': 'Permission denied'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        queryset = inbox_queryset(request.user).select_related(
+            'employee__user', 'leave_type', 'approved_by', 'handover_to__user'
+        )
+        paginator = KeysetPagination(ordering=('applied_date', 'id'))
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = PendingLeaveRequestSerializer(
+            page, many=True,
+            context=dict(self.get_serializer_context(), overlaps=find_overlaps(page))
+        )
+        response = paginator.get_paginated_response(serializer.data)
+        response.data['count'] = pending_count(request.user)
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def pending_count(self, request):
+        """Cached number of requests awaiting the user's approval"""
+        return Response({'count': pending_count(request.user)})
+    
+    @action(detail=False, methods=['get'])
+    def team_coverage(self, request):
+        """Per-day leave coverage of the approver's team (or ?department= for HR)"""
+        user = request.user
+        if user.role not in ['SUPER_ADMIN', 'HR_MANAGER', 'TEAM_LEAD']:
+            return Response(
+                {'error': 'Permission denied'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            start_date = parse_date(request.query_params.get('start_date', '')) or timezone.localdate()
+            end_date = parse_date(request.query_params.get('end_date', '')) or start_date + timedelta(days=30)
+        except ValueError:
+            start_date = end_date = None
+        if start_date is None or end_date is None or end_date < start_date:
+            return Response(
+                {'error': 'start_date and end_date must be valid dates (YYYY-MM-DD), start first'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (end_date - start_date).days > 366:
+            return Response(
+                {'error': 'Date range cannot exceed one year'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        employees = Employee.objects.filter(employment_status='ACTIVE')
+        department = request.query_params.get('department')
+        if user.role == 'TEAM_LEAD':
+            employees = employees.filter(in_reporting_tree(user, field=None, include_self=False))
+        elif department:
+            employees = employees.filter(department_id=department)
+        
+        return Response(team_coverage(employees, start_date, end_date))
 
-class HolidayViewSet(viewsets.ModelViewSet):
+class HolidayViewSet(ReferenceListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing holidays
     """
     queryset = Holiday.objects.all()  # Add queryset
     serializer_class = HolidaySerializer
+    reference_model = Holiday
     
     def get_queryset(self):
         current_year = timezone.now().year
         return Holiday.objects.filter(date__year=current_year)
     
+    def reference_rows(self):
+        current_year = timezone.now().year
+        return [holiday for holiday in reference_rows(Holiday) if holiday.date.year == current_year]
+    
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             permission_classes = [IsSuperAdminOrHRManager]
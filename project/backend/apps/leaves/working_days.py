@@ -0,0 +1,79 @@
+"""
+Working-day calendar
+Per-year prefix sums of working days (weekends and non-optional holidays
+excluded), so counting the working days in any date range is two lookups.
+"""
+import calendar
+from datetime import date, timedelta
+from django.apps import apps
+from django.conf import settings
+from apps.core.cache import VersionedLocalCache
+
+
+class WorkingDayCalendar:
+    """
+    Working days for the company holiday calendar. Prefix arrays are built
+    lazily, one per year: prefix[n] is the number of working days among the
+    first n days of the year.
+    """
+
+    def __init__(self, holidays, weekend_days):
+        self.holidays = frozenset(holidays)
+        self.weekend_days = frozenset(weekend_days)
+        self._prefix = {}
+
+    @classmethod
+    def build(cls):
+        # Looked up by label: the leaves models import this module
+        holidays = apps.get_model('leaves', 'Holiday').objects.filter(is_optional=False).values_list('date', flat=True)
+        return cls(holidays, settings.WEEKEND_DAYS)
+
+    def is_working_day(self, day):
+        return day.weekday() not in self.weekend_days and day not in self.holidays
+
+    def prefix(self, year):
+        prefix = self._prefix.get(year)
+        if prefix is None:
+            prefix = [0]
+            day = date(year, 1, 1)
+            while day.year == year:
+                prefix.append(prefix[-1] + self.is_working_day(day))
+                day += timedelta(days=1)
+            self._prefix[year] = prefix
+        return prefix
+
+    def count(self, start_date, end_date):
+        """Working days between two dates, both inclusive"""
+        if end_date < start_date:
+            return 0
+        total = 0
+        for year in range(start_date.year, end_date.year + 1):
+            prefix = self.prefix(year)
+            first = start_date.timetuple().tm_yday - 1 if year == start_date.year else 0
+            last = end_date.timetuple().tm_yday if year == end_date.year else len(prefix) - 1
+            total += prefix[last] - prefix[first]
+        return total
+
+    def count_in_month(self, year, month):
+        last_day = calendar.monthrange(year, month)[1]
+        return self.count(date(year, month, 1), date(year, month, last_day))
+
+
+_working_day_calendar = VersionedLocalCache('leaves.working_days', WorkingDayCalendar.build)
+
+
+def get_working_day_calendar():
+    return _working_day_calendar.get()
+
+
+def count_working_days(start_date, end_date):
+    """Working days between two dates, both inclusive"""
+    return get_working_day_calendar().count(start_date, end_date)
+
+
+def is_working_day(day):
+    return get_working_day_calendar().is_working_day(day)
+
+
+def invalidate_working_day_calendar():
+    _working_day_calendar.invalidate()
@@ -5,7 +5,10 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from apps.core.models import TimeStampedModel
 from apps.employees.models import Employee
+from apps.leaves.working_days import count_working_days
 from decimal import Decimal
+import calendar
+from datetime import date
 
 User = get_user_model()
 
@@ -84,6 +87,16 @@ class PayrollRun(TimeStampedModel):
     def __str__(self):
         return f"Payroll {self.month}/{self.year}"
     
+    def working_days_for(self, employee):
+        """Working days in the run's month within the employee's employment dates"""
+        start_date = date(self.year, self.month, 1)
+        end_date = date(self.year, self.month, calendar.monthrange(self.year, self.month)[1])
+        if employee.date_of_joining and employee.date_of_joining > start_date:
+            start_date = employee.date_of_joining
+        if employee.date_of_leaving and employee.date_of_leaving < end_date:
+            end_date = employee.date_of_leaving
+        return count_working_days(start_date, end_date)
+    
     class Meta:
         db_table = 'payroll_payroll_run'
         unique_together = ['month', 'year']
@@ -107,6 +120,11 @@ class Payslip(TimeStampedModel):
     def __str__(self):
         return f"{self.employee.full_name} - {self.payroll_run.month}/{self.payroll_run.year}"
     
+    def save(self, *args, **kwargs):
+        if not self.working_days:
+            self.working_days = self.payroll_run.working_days_for(self.employee)
+        super().save(*args, **kwargs)
+    
     class Meta:
         db_table = 'payroll_payslip'
         unique_together = ['payroll_run', 'employee']
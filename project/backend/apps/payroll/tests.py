@@ -0,0 +1,34 @@
+from datetime import date
+from django.test import TestCase
+from apps.accounts.models import User
+from apps.core.cache import bump_version
+from apps.employees.models import Employee
+from apps.leaves.models import Holiday
+from .models import PayrollRun, Payslip
+
+
+class PayslipWorkingDaysTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(email='emp300@example.com', username='emp300', password='secret')
+        # Joined on Wednesday 13 March 2030, which leaves 13 weekdays in the month
+        self.employee = Employee.objects.create(user=user, employee_id='EMP300', date_of_joining=date(2030, 3, 13))
+        self.payroll_run = PayrollRun.objects.create(name='March 2030', month=3, year=2030)
+        # The rolled-back holidays must not stay in this process's calendar
+        self.addCleanup(bump_version, 'leaves.working_days')
+        with self.captureOnCommitCallbacks(execute=True):
+            Holiday.objects.create(name='Founders Day', date=date(2030, 3, 18))
+            Holiday.objects.create(name='Spring Festival', date=date(2030, 3, 20), is_optional=True)
+            Holiday.objects.create(name='Before joining', date=date(2030, 3, 5))
+
+    def test_working_days_are_counted_within_employment(self):
+        payslip = Payslip.objects.create(payroll_run=self.payroll_run, employee=self.employee)
+        # Optional holidays are still working days
+        self.assertEqual(payslip.working_days, 12)
+
+        self.employee.date_of_leaving = date(2030, 3, 22)
+        self.assertEqual(self.payroll_run.working_days_for(self.employee), 7)
+
+    def test_given_working_days_are_kept(self):
+        payslip = Payslip.objects.create(payroll_run=self.payroll_run, employee=self.employee, working_days=20)
+        self.assertEqual(Payslip.objects.get(pk=payslip.pk).working_days, 20)
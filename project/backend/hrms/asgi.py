@@ -0,0 +1,10 @@
+"""
+ASGI config for HRMS project.
+Serves the API and the long-lived server-sent event streams.
+"""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hrms.settings')
+
+application = get_asgi_application()
@@ -3,6 +3,7 @@ HRMS Django Settings
 Production-ready configuration with environment-based setup
 """
 from decouple import config
+from celery.schedules import crontab
 from datetime import timedelta
 import os
 
@@ -85,6 +86,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'hrms.wsgi.application'
+ASGI_APPLICATION = 'hrms.asgi.application'
 
 # Database
 # DATABASES = {
@@ -101,6 +103,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # File-backed test database so concurrent tests wait on locks instead
+        # of failing on the shared in-memory cache
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
     }
 }
 # Custom User Model
@@ -164,9 +169,49 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Cache
+# Process-local caches (e.g. the shift index) are invalidated through version
+# counters kept here, so use a shared backend such as
+# django.core.cache.backends.redis.RedisCache when running several workers
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='hrms-cache'),
+    }
+}
+
+# Event hub used for live (server-sent event) feeds; the local backend only
+# reaches subscribers in the same process
+EVENT_HUB_BACKEND = config('EVENT_HUB_BACKEND', default='apps.core.events.LocalBackend')
+
 # Celery Configuration
 CELERY_BROKER_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('REDIS_URL', default='redis://localhost:6379/0')
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'auto-mark-attendance': {
+        'task': 'apps.attendance.tasks.auto_mark_attendance_task',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    'build-overtime-rollups': {
+        'task': 'apps.attendance.tasks.build_overtime_rollups_task',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    'rollover-leave-year': {
+        'task': 'apps.leaves.tasks.rollover_leave_year_task',
+        'schedule': crontab(month_of_year=1, day_of_month=1, hour=0, minute=15),
+    },
+}
+
+# Attendance
+WEEKEND_DAYS = [5, 6]  # Saturday, Sunday (Monday is 0)
+# Closed months older than this are moved to the columnar archive
+ATTENDANCE_HOT_MONTHS = config('ATTENDANCE_HOT_MONTHS', default=13, cast=int)
+ATTENDANCE_ARCHIVE_DIR = config('ATTENDANCE_ARCHIVE_DIR', default=os.path.join(BASE_DIR, 'archive', 'attendance'))
+
+# Viewset actions over their query budget fail instead of only logging;
+# the tests that check budgets turn it on with override_settings
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -204,6 +249,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'hrms.query_budget': {
+            'handlers': ['file'],
+            'level': 'WARNING',
+            'propagate': True,
+        },
     },
 }
 STATICFILES_DIRS = [
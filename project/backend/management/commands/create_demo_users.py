@@ -2,10 +2,12 @@
 Management command to create demo users
 """
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.contrib.auth import get_user_model
 from apps.employees.models import Employee
 from apps.core.models import Organization, Department, JobTitle
-from apps.leaves.models import LeaveType, LeaveBalance
+from apps.leaves.models import LeaveType
+from apps.leaves.ledger import lock_balance
 from datetime import date
 
 User = get_user_model()
@@ -183,16 +185,8 @@ class Command(BaseCommand):
         
         for employee in Employee.objects.all():
             for leave_type in leave_types:
-                LeaveBalance.objects.get_or_create(
-                    employee=employee,
-                    leave_type=leave_type,
-                    year=current_year,
-                    defaults={
-                        'total_days': leave_type.days_allowed_per_year,
-                        'used_days': 0,
-                        'carry_forward_days': 0
-                    }
-                )
+                with transaction.atomic():
+                    lock_balance(employee.id, leave_type, current_year)
 
         self.stdout.write(
             self.style.SUCCESS('Successfully created demo users and employees!')
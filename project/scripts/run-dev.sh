@@ -11,7 +11,8 @@ run_backend() {
     echo "Starting Django backend server..."
     cd backend
     source venv/bin/activate
-    python manage.py runserver
+    # ASGI, so the server-sent event streams are not buffered
+    uvicorn hrms.asgi:application --reload
 }
 
 # Function to run frontend
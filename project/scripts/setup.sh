@@ -68,7 +68,7 @@ echo ""
 echo "🎉 Setup complete! You can now run the application:"
 echo ""
 echo "Backend (Django):"
-echo "  cd backend && source venv/bin/activate && python manage.py runserver"
+echo "  cd backend && source venv/bin/activate && uvicorn hrms.asgi:application --reload"
 echo ""
 echo "Frontend (React):"
 echo "  npm run dev"